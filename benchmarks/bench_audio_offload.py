@@ -0,0 +1,90 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+import argparse
+import webrtcvad
+import numpy as np
+
+from garvis.audio_source import StreamSource
+from garvis.audio_offload import AudioOffload
+from garvis.features import FrameFeatureExtractor
+from garvis.config import *
+
+# Frame analysis throughput of many sessions in one server process, with the analysis in
+# that process (as AudioProcessor.analyze_frame does it) or in an AudioOffload pool of one
+# worker per core. Every session feeds its audio a second at a time, unpaced, and reads it
+# back with features. Reports frames per second and the server process' own CPU per frame.
+#
+#     python benchmarks/bench_audio_offload.py [--cores 1 4 16] [--sessions 64] [--seconds 10]
+
+FEED_MS = 20  # audio per feed, like a network client message
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Frame analysis throughput with and without AudioOffload")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 16], help="CPUs to pin to, one run each")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio per session")
+    return parser.parse_args()
+
+
+def make_audio(seconds):
+    # Alternating half seconds of quiet and loud noise, so the energy gate lets about half the frames reach the VAD
+    rng = np.random.default_rng(0)
+    half = SAMPLE_RATE // 2
+    blocks = [rng.normal(0, 3000 if i % 2 else 20, half) for i in range(int(2 * seconds))]
+    return np.concatenate(blocks).astype(np.int16).tobytes()
+
+
+async def session(audio, offload, extractor):
+    source = StreamSource(offload=offload)
+    source.start()
+    piece = SAMPLE_RATE * FEED_MS // 1000 * 2
+    frames = 0
+    for start in range(0, len(audio), SAMPLE_RATE * 2):
+        second = audio[start:start + SAMPLE_RATE * 2]
+        for i in range(0, len(second), piece):
+            source.feed(second[i:i + piece])
+        while len(source.frames):
+            frame = await source.read_frame()
+            if source.frame_features() is None:
+                extractor.extract(frame)  # in the server process, as AudioProcessor.analyze_frame does
+            frames += 1
+    source.close()
+    return frames
+
+
+async def run(audio, sessions, offload):
+    extractor = FrameFeatureExtractor(webrtcvad.Vad(1))
+    if offload is not None:
+        await session(audio[:SAMPLE_RATE * 2], offload, extractor)  # start the workers
+    cpu, wall = time.process_time(), time.perf_counter()
+    frames = sum(await asyncio.gather(*(session(audio, offload, extractor) for _ in range(sessions))))
+    return frames, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main(args):
+    audio = make_audio(args.seconds)
+    available = sorted(os.sched_getaffinity(0))
+    print(f"{args.sessions} sessions x {args.seconds:.0f} s of audio")
+    print(f"{'cores':>5} {'analysis':>10} {'frames/s':>10} {'server CPU/frame':>17} {'round trip p95':>15}")
+    for cores in args.cores:
+        if cores > len(available):
+            print(f"{cores:5d}  skipped: only {len(available)} CPU(s) available")
+            continue
+        os.sched_setaffinity(0, available[:cores])
+        for name in ("in-process", "offload"):
+            offload = AudioOffload(processes=cores) if name == "offload" else None
+            try:
+                frames, wall, cpu = asyncio.run(run(audio, args.sessions, offload))
+                round_trip = f"{offload.stats()['round_trip_p95_ms']:12.1f} ms" if offload else f"{'':>15}"
+            finally:
+                if offload:
+                    offload.close()
+            print(f"{cores:5d} {name:>10} {frames / wall:10.0f} {1e6 * cpu / frames:14.1f} us {round_trip}")
+    os.sched_setaffinity(0, available)
+
+
+if __name__ == "__main__":
+    main(parse_args())
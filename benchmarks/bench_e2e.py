@@ -0,0 +1,219 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import json
+import wave
+import glob
+import asyncio
+import argparse
+import resource
+import tempfile
+import multiprocessing
+import numpy as np
+
+# Drives full Garvis sessions, one per WAV file of a corpus, against local stand-ins for
+# the Groq transcription API, an OpenAI-compatible chat API and the ElevenLabs websocket:
+#
+#     python benchmarks/bench_e2e.py [--corpus DIR] [--out results.json] [--compare baseline.json]
+#
+# A corpus is a directory of 16 kHz mono 16-bit WAV files, each with a .txt file of the
+# same name holding its transcript (what the transcription stand-in answers). Without
+# one, a synthetic corpus is generated. The stand-ins run in a child process, so the CPU
+# time reported per session is Garvis' own.
+
+# Clients read these when they are created; everything talks to the local stand-ins
+os.environ.setdefault("OPENAI_API_KEY", "standin")
+os.environ.setdefault("GROQ_API_KEY", "standin")
+
+SYNTHETIC_CORPUS = [
+    ("What's the weather like in Paris today?", 1.6),
+    ("Set a timer for ten minutes.", 1.2),
+    ("Tell me a fun fact about octopuses.", 1.5),
+    ("How far away is the moon?", 1.3),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline end-to-end Garvis benchmark")
+    parser.add_argument("--corpus", help="directory of WAV files with .txt transcripts (default: synthetic)")
+    parser.add_argument("--repeat", type=int, default=2, help="sessions per corpus file")
+    parser.add_argument("--stt-latency", type=float, default=0.25)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tts-latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.05, help="extra random delay, up to this many seconds, on every stand-in")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--reply", default="Sure. Here is a short answer to your question, spoken by the stand-in.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a session's reply")
+    parser.add_argument("--out", default="e2e-results.json", help="machine-readable results")
+    parser.add_argument("--compare", help="earlier results file to compare stage percentiles with")
+    return parser.parse_args()
+
+
+def synthetic_corpus(directory):
+    # Voiced-sounding audio: harmonics of a 140 Hz pitch with noise, at syllable rate. No
+    # leading silence, which would end the default listening strategy's turn before speech.
+    rng = np.random.default_rng(0)
+    for i, (transcript, seconds) in enumerate(SYNTHETIC_CORPUS):
+        t = np.arange(int(16000 * seconds)) / 16000
+        voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6)) + 0.3 * rng.normal(size=len(t))
+        envelope = 0.7 + 0.3 * np.sin(2 * np.pi * 4 * t)
+        samples = (4000 * voice * envelope).astype(np.int16)
+        path = os.path.join(directory, f"utterance{i}.wav")
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(samples.tobytes())
+        with open(path[:-4] + ".txt", "w") as f:
+            f.write(transcript)
+    return directory
+
+
+def serve_standins(conn, options):
+    # Child process: the three stand-ins, controlled over `conn`
+    from standin_servers import TranscriptionStandin, ChatStandin, TTSStandin
+    servers = {
+        "stt": TranscriptionStandin(segments=[""], segment_delay=0.0, latency=options["stt_latency"], jitter=options["jitter"]),
+        "llm": ChatStandin(reply=options["reply"], token_delay=options["token_delay"], latency=options["llm_latency"],
+                           jitter=options["jitter"], connect_latency=0.0),
+        "tts": TTSStandin(handshake_latency=0.05, bytes_per_char=320, latency=options["tts_latency"], jitter=options["jitter"]),
+    }
+    for server in servers.values():
+        server.start()
+    conn.send({"stt": servers["stt"].url, "llm": servers["llm"].base_url, "tts": servers["tts"].ws_url()})
+    while True:
+        command, argument = conn.recv()
+        if command == "transcript":
+            servers["stt"].segments = [argument]
+            conn.send(None)
+        elif command == "calls":
+            conn.send({f"{name}.{endpoint}": count for name, server in servers.items() for endpoint, count in server.calls.items()})
+        elif command == "stop":
+            for server in servers.values():
+                server.stop()
+            conn.send(None)
+            return
+
+
+class Standins:
+    def __init__(self, options):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context("spawn").Process(target=serve_standins, args=(child, options), daemon=True)
+
+    def __enter__(self):
+        self.process.start()
+        self.urls = self.conn.recv()
+        return self
+
+    def request(self, command, argument=None):
+        self.conn.send((command, argument))
+        return self.conn.recv()
+
+    def __exit__(self, *exc):
+        self.request("stop")
+        self.process.join()
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+async def run_session(path, standins, timeout):
+    from garvis import Garvis
+    from garvis.llm import AsyncOllama
+    from garvis.tts import TTSConnectionManager
+    from garvis.playback import HeadlessPlayer
+    from garvis.audio_source import WavFileSource
+
+    with open(path[:-4] + ".txt") as f:
+        standins.request("transcript", f.read().strip())
+    calls_before = standins.request("calls")
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+
+    llm = AsyncOllama(model="standin")
+    llm.client.base_url = standins.urls["llm"]
+    garvis = Garvis(llm=llm, transcriptor="groq", audio_source=WavFileSource(path, realtime=True, tail_silence=1.0),
+                    tts_manager=TTSConnectionManager(uri=standins.urls["tts"]), player=HeadlessPlayer())
+    traced = asyncio.get_running_loop().create_future()
+    garvis.events.subscribe(lambda event: traced.done() or traced.set_result(event.args[0]),
+                            events=["turn_trace"], loop=asyncio.get_running_loop())
+    try:
+        await garvis.listen()
+        record = await asyncio.wait_for(traced, timeout)
+    except asyncio.TimeoutError:
+        record = None
+    finally:
+        await garvis.close()
+
+    calls_after = standins.request("calls")
+    return {
+        "file": os.path.basename(path),
+        "completed": record is not None,
+        "stages_ms": record["stages_ms"] if record else {},
+        "wall_s": time.perf_counter() - wall_start,
+        "cpu_s": time.process_time() - cpu_start,
+        "rss_mb": rss_mb(),
+        "calls": {name: calls_after.get(name, 0) - calls_before.get(name, 0) for name in calls_after},
+    }
+
+
+def summarize(sessions):
+    from garvis.tracing import STAGES
+    from garvis.metrics import latency_summary
+    stages = {}
+    for stage in STAGES:
+        values = [s["stages_ms"][stage] / 1000 for s in sessions if stage in s["stages_ms"]]
+        if values and stage != "speech_end":
+            stages[stage] = latency_summary(values)
+    calls = {}
+    for session in sessions:
+        for name, count in session["calls"].items():
+            calls[name] = calls.get(name, 0) + count
+    return {
+        "sessions": len(sessions),
+        "completed": sum(s["completed"] for s in sessions),
+        "stages": stages,
+        "calls": calls,
+        "cpu_s_per_session": float(np.mean([s["cpu_s"] for s in sessions])),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def report(summary, baseline=None):
+    print(f"{summary['completed']}/{summary['sessions']} sessions completed; "
+          f"{summary['cpu_s_per_session'] * 1000:.0f} ms CPU per session, peak RSS {summary['peak_rss_mb']:.0f} MB")
+    print(f"API calls: {summary['calls']}")
+    print(f"{'stage (from end of speech)':>28} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, values in summary["stages"].items():
+        line = f"{stage:>28} {values['p50_ms']:8.1f} {values['p95_ms']:8.1f} {values['p99_ms']:8.1f}"
+        before = baseline["stages"].get(stage) if baseline else None
+        if before:
+            line += f"   p50 {values['p50_ms'] - before['p50_ms']:+7.1f}, p95 {values['p95_ms'] - before['p95_ms']:+7.1f} vs baseline"
+        print(line)
+
+
+async def main(args):
+    corpus = args.corpus or synthetic_corpus(tempfile.mkdtemp())
+    files = sorted(path for path in glob.glob(os.path.join(corpus, "*.wav")) if os.path.exists(path[:-4] + ".txt"))
+    options = {name: getattr(args, name) for name in ("stt_latency", "llm_latency", "tts_latency", "jitter", "token_delay", "reply")}
+    with Standins(options) as standins:
+        os.environ["GROQ_BASE_URL"] = standins.urls["stt"].rstrip("/")
+        sessions = []
+        for _ in range(args.repeat):
+            for path in files:
+                sessions.append(await run_session(path, standins, args.timeout))
+
+    summary = summarize(sessions)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["summary"]
+    report(summary, baseline)
+    with open(args.out, "w") as f:
+        json.dump({"options": options, "corpus": corpus, "summary": summary, "sessions": sessions}, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
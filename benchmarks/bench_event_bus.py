@@ -0,0 +1,72 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+
+from garvis.events import EventBus
+from garvis.config import EVENT_COALESCE, FRAME_DURATION_MS
+from garvis.metrics import latency_summary
+
+SECONDS = 3.0
+TOKEN_INTERVAL = 0.02  # LLM tokens arrive every 20 ms while the user is still being metered
+HANDLER_SECONDS = 0.012  # a UI redraw per callback
+
+
+def ui_handler(*args):
+    time.sleep(HANDLER_SECONDS)
+
+
+async def capture(publish):
+    # The listening loop: one frame every FRAME_DURATION_MS, metered as it is read
+    frame = FRAME_DURATION_MS / 1000
+    lateness = []
+    start = time.perf_counter()
+    for i in range(int(SECONDS / frame)):
+        due = start + i * frame
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        lateness.append(time.perf_counter() - due)
+        publish("audio_power", i / 100)
+    return lateness
+
+
+async def tokens(publish):
+    lateness = []
+    start = time.perf_counter()
+    for i in range(int(SECONDS / TOKEN_INTERVAL)):
+        due = start + i * TOKEN_INTERVAL
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        lateness.append(time.perf_counter() - due)
+        publish("llm_update", f"token{i} ")
+    return lateness
+
+
+async def run(publish):
+    frames, words = await asyncio.gather(capture(publish), tokens(publish))
+    return frames, words
+
+
+def report(name, frames, words, calls):
+    f, t = latency_summary(frames), latency_summary(words)
+    print(f"{name:>18}: capture frames late p95 {f['p95_ms']:7.1f} ms, max {f['max_ms']:7.1f} ms; "
+          f"tokens late p95 {t['p95_ms']:7.1f} ms; {calls} handler calls")
+
+
+if __name__ == "__main__":
+    calls = [0]
+
+    def direct(name, *args):
+        # The on_* attributes today: the producer runs the handler itself
+        calls[0] += 1
+        ui_handler(*args)
+
+    report("direct callbacks", *asyncio.run(run(direct)), calls[0])
+
+    bus = EventBus()
+    subscription = bus.subscribe(lambda event: ui_handler(*event.args), coalesce=EVENT_COALESCE, name="ui")
+    frames, words = asyncio.run(run(bus.publish))
+    time.sleep(0.2)
+    report("event bus", frames, words, subscription.delivered)
+    stats = subscription.stats()
+    print(f"{'':>18}  {stats['coalesced']} events coalesced, {stats['dropped']} dropped, "
+          f"delivery lag p95 {stats['lag_p95_ms']:.1f} ms, max {stats['lag_max_ms']:.1f} ms")
+    bus.close()
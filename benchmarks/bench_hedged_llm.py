@@ -0,0 +1,59 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+
+from openai import AsyncOpenAI as AsyncOpenAII
+from standin_servers import ChatStandin
+from garvis.llm import AsyncOpenAI
+from garvis.hedged_llm import HedgedLLM
+from garvis.metrics import latency_summary
+
+REQUESTS = 100
+MESSAGES = [{"role": "user", "content": "What is the capital of France?"}]
+
+
+def backend(server, model):
+    llm = AsyncOpenAI(model=model)
+    # No client retries: a 429 surfaces at once instead of after a backoff
+    llm.client = AsyncOpenAII(base_url=server.base_url, api_key="standin", max_retries=0)
+    return llm
+
+
+async def run(llm):
+    latencies, failures = [], 0
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        try:
+            stream = await llm.acompletion(messages=MESSAGES)
+            first_token = None
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and first_token is None:
+                    first_token = time.perf_counter() - start
+            latencies.append(first_token)
+        except Exception:
+            failures += 1
+    return latencies, failures
+
+
+def report(name, latencies, failures):
+    summary = latency_summary(latencies)
+    print(f"{name:>22}: TTFT p50 {summary['p50_ms']:7.1f} ms, p95 {summary['p95_ms']:7.1f} ms, "
+          f"p99 {summary['p99_ms']:7.1f} ms, max {summary['max_ms']:7.1f} ms, {failures} failed requests")
+
+
+async def main():
+    # Primary: fast, but rate limited 5% of the time and stalling another 5%. Secondary: slower, steady.
+    with ChatStandin(latency=0.12, jitter=0.06, token_delay=0.01, error_rate=0.05, stall_rate=0.05, stall=1.5, seed=1) as primary_server, \
+         ChatStandin(latency=0.25, jitter=0.06, token_delay=0.01, seed=2) as secondary_server:
+        report("primary only", *await run(backend(primary_server, "primary")))
+        for hedge_delay in (0.3, 0.5):
+            hedged = HedgedLLM(backend(primary_server, "primary"), backend(secondary_server, "secondary"), hedge_delay=hedge_delay)
+            report(f"hedged after {1000 * hedge_delay:.0f} ms", *await run(hedged))
+            stats = hedged.stats()
+            print(f"{'':>22}  {stats['hedged']} hedged, {stats['fallbacks']} fallbacks after an error, "
+                  f"{stats['secondary_wins']} answered by the secondary")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+import threading
+import numpy as np
+
+from openai import OpenAI as OpenAII, AsyncOpenAI as AsyncOpenAII
+from standin_servers import ChatStandin
+from garvis.llm import OpenAI, AsyncOpenAI
+from garvis.intent import IntentEvaluator, last_sentences
+
+# Transcribed chunks of a few turns: (seconds after the previous chunk, text)
+TURNS = [
+    [(0.0, "So I was looking at the"), (0.6, "flights to Lisbon and"), (0.05, "the prices went up."), (0.7, "Can you check them again?")],
+    [(0.0, "Okay."), (0.8, "What's the weather tomorrow?")],
+    [(0.0, "I need a recipe"), (0.5, "for dinner tonight."), (0.1, "Something with chicken, maybe"), (0.6, "rice or noodles.")],
+    [(0.0, "Remind me to call"), (0.05, "my sister"), (0.05, "at six."), (0.9, "Thanks!")],
+    [(0.0, "Tell me about the"), (0.5, "history of Rome.")],
+]
+
+
+class IntentStandin(ChatStandin):
+    # Answers like the intent model would, after `latency`
+    def tokens(self, body):
+        query = body["messages"][-1]["content"].rsplit("Query:\n", 1)[-1].strip()
+        label = "QUESTION" if query.endswith("?") or query.lower().startswith(("tell me", "i need")) and query.endswith(".") else "PARTIAL"
+        return ['{"class": "' + label + '"}']
+
+
+def blocking_turns(llm):
+    # The old stop_criteria: intentify on the transcription thread, for every chunk
+    results = []
+    for chunks in TURNS:
+        transcript, blocked, decided = [], 0.0, None
+        arrival = time.perf_counter()
+        for delay, text in chunks:
+            arrival += delay  # when transcription delivered it; a blocked thread only sees it later
+            time.sleep(max(0.0, arrival - time.perf_counter()))
+            transcript.append(text)
+            start = time.perf_counter()
+            intent = llm.intentify(last_sentences(" ".join(transcript)))
+            blocked += time.perf_counter() - start
+            if intent == "QUESTION":
+                decided = time.perf_counter() - arrival
+        results.append((blocked, decided, len(chunks)))
+    return results
+
+
+async def evaluator_turns(llm):
+    loop = asyncio.get_running_loop()
+    evaluator = IntentEvaluator(llm)
+    results = []
+    for chunks in TURNS:
+        done = threading.Event()
+        state = {}
+
+        def on_intent(text, intent):
+            state["decided"] = time.perf_counter() - state["arrival"]
+            done.set()
+
+        def transcription_thread():
+            transcript, blocked = [], 0.0
+            arrival = time.perf_counter()
+            for delay, text in chunks:
+                arrival += delay
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                transcript.append(text)
+                state["arrival"] = arrival
+                start = time.perf_counter()
+                evaluator.submit(last_sentences(" ".join(transcript)), loop, on_intent)
+                blocked += time.perf_counter() - start
+            return blocked
+
+        blocked = await asyncio.to_thread(transcription_thread)
+        await asyncio.to_thread(done.wait, 2.0)
+        results.append((blocked, state.get("decided"), len(chunks)))
+    return results, evaluator
+
+
+def report(name, results, calls):
+    blocked = [r[0] for r in results]
+    decided = [r[1] for r in results if r[1] is not None]
+    print(f"{name:>22}: transcription thread blocked {1000 * np.mean(blocked):6.1f} ms per turn, "
+          f"decision {1000 * np.mean(decided):6.1f} ms after the last chunk, {calls} LLM calls")
+
+
+if __name__ == "__main__":
+    with IntentStandin(latency=0.3, jitter=0.05, token_delay=0.0, connect_latency=0.0) as server:
+        llm = OpenAI(model="standin")
+        llm.client = OpenAII(base_url=server.base_url, api_key="standin", max_retries=0)
+        report("blocking intentify", blocking_turns(llm), server.calls["chat.completions"])
+
+        calls = server.calls["chat.completions"]
+        llm = AsyncOpenAI(model="standin")
+        llm.client = AsyncOpenAII(base_url=server.base_url, api_key="standin", max_retries=0)
+        results, evaluator = asyncio.run(evaluator_turns(llm))
+        report("IntentEvaluator", results, server.calls["chat.completions"] - calls)
+        print(f"evaluator stats: {evaluator.stats()}")
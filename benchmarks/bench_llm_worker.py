@@ -0,0 +1,70 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+import threading
+import numpy as np
+
+from openai import AsyncOpenAI as AsyncOpenAII
+from standin_servers import ChatStandin
+from garvis.llm import AsyncOpenAI
+from garvis.worker import ResponseWorker
+
+TURNS = 10
+MESSAGES = [{"role": "user", "content": "What is the capital of France?"}]
+
+
+async def turn(llm):
+    start = time.perf_counter()
+    stream = await llm.acompletion(messages=MESSAGES)
+    first_token = None
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content and first_token is None:
+            first_token = time.perf_counter() - start
+    return first_token
+
+
+def thread_per_turn(llm):
+    # The old Garvis.get_llm_response: a new thread and a new event loop every turn
+    result = {}
+
+    def run():
+        try:
+            result["ttft"] = asyncio.run(turn(llm))
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result
+
+
+def worker_loop(worker, llm):
+    try:
+        return {"ttft": worker.submit(turn, llm).result()}
+    except Exception as e:
+        return {"error": e}
+
+
+def report(name, results, server):
+    ttfts = [r["ttft"] for r in results[1:] if "ttft" in r]
+    errors = [r["error"] for r in results if "error" in r]
+    median = f"{1000 * np.median(ttfts):6.1f} ms" if ttfts else "   n/a   "
+    print(f"{name:>16}: first turn {1000 * results[0].get('ttft', float('nan')):6.1f} ms, later turns median {median}, "
+          f"{server.connections} connections opened, {len(errors)} failed turns"
+          + (f" (e.g. {type(errors[0]).__name__}: {errors[0]})" if errors else ""))
+
+
+if __name__ == "__main__":
+    for name in ("thread per turn", "worker loop"):
+        with ChatStandin(latency=0.15, connect_latency=0.1) as server:
+            llm = AsyncOpenAI(model="standin")
+            llm.client = AsyncOpenAII(base_url=server.base_url, api_key="standin", max_retries=0)
+            if name == "worker loop":
+                worker = ResponseWorker()
+                results = [worker_loop(worker, llm) for _ in range(TURNS)]
+                worker.stop()
+            else:
+                results = [thread_per_turn(llm) for _ in range(TURNS)]
+            report(name, results, server)
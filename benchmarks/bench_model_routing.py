@@ -0,0 +1,66 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import asyncio
+import numpy as np
+
+from openai import AsyncOpenAI as AsyncOpenAII
+from standin_servers import ChatStandin
+from garvis.llm import AsyncOpenAI
+from garvis.model_router import RoutedLLM
+from garvis.config import LLM_FAST_MODEL, LLM_STRONG_MODEL
+
+# Voice turns in the proportions we see: mostly small talk and short requests
+TURNS = [
+    "Hi Garvis", "What time is it?", "Thanks!", "Set a timer for ten minutes", "How are you today?",
+    "What's the weather like?", "Okay, cool", "Tell me a joke", "Who wrote Hamlet?", "Play some music",
+    "Why does the moon look bigger near the horizon?",
+    "Can you explain the difference between a Roth IRA and a traditional IRA and which one I should pick?",
+    "Write a short email to my landlord asking to fix the heating before Friday",
+    "If I invest 500 dollars a month at 7 percent for 20 years how much will I have?",
+    "Compare the pros and cons of electric and hybrid cars for a family of four",
+    "Yes", "Good night", "What's two plus two?", "Remind me to call mom", "Sure, go ahead",
+]
+
+
+async def run(llm, model=None):
+    history, latencies = [], []
+    for text in TURNS:
+        history.append({"role": "user", "content": text})
+        start = time.perf_counter()
+        stream = await llm.acompletion(messages=history, **({"model": model} if model else {}))
+        first_token, reply = None, ""
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                first_token = first_token or time.perf_counter() - start
+                reply += chunk.choices[0].delta.content
+        history.append({"role": "assistant", "content": reply})
+        latencies.append(first_token)
+    return latencies
+
+
+def report(name, latencies):
+    print(f"{name:>14}: TTFT mean {1000 * np.mean(latencies):6.1f} ms, p95 {1000 * np.percentile(latencies, 95):6.1f} ms")
+
+
+async def main():
+    # Stand-in for Groq: the 70B model takes about three times as long to start answering
+    with ChatStandin(latency=0.1, jitter=0.03, model_latency={LLM_FAST_MODEL: 0.1, LLM_STRONG_MODEL: 0.35}) as server:
+        llm = AsyncOpenAI(model=LLM_FAST_MODEL)
+        llm.client = AsyncOpenAII(base_url=server.base_url, api_key="standin", max_retries=0)
+        await run(llm)  # warm the connection
+        report("always 8B", await run(llm, LLM_FAST_MODEL))
+        report("always 70B", await run(llm, LLM_STRONG_MODEL))
+        routed = RoutedLLM(llm)
+        report("routed", await run(routed))
+        stats = routed.stats()
+        print(f"routed {stats['strong_requests']} of {len(TURNS)} turns to the strong model, "
+              f"classifier {stats['avg_classify_us']:.1f} us per turn")
+        for text in TURNS:
+            route, score, _ = routed.route([{"role": "user", "content": text}])
+            if route == "strong":
+                print(f"  {score:.2f} {text}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
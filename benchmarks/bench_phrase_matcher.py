@@ -0,0 +1,54 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import tempfile
+import numpy as np
+
+from openai import OpenAI
+from standin_servers import EmbeddingsStandin
+from garvis.phrase_matcher import PhraseMatcher, HashingEncoder, OpenAIEmbeddingEncoder
+from garvis.router import routes
+
+QUERIES = ["Garvis, stop!", "okay stop please", "hold on a sec", "what's the weather in Paris",
+           "garvis stop talking now", "please stahp", "wait a moment please", "tell me a joke",
+           "can I say something", "Jarvis, hold on", "and then what happened?", "let me speak"]
+REPEATS = 5
+
+
+def measure(match):
+    latencies = []
+    for _ in range(REPEATS):
+        for query in QUERIES:
+            start = time.perf_counter()
+            match(query)
+            latencies.append(time.perf_counter() - start)
+    return 1000 * np.median(latencies), 1000 * np.percentile(latencies, 95)
+
+
+def report(name, result):
+    print(f"{name:>28}: median {result[0]:8.3f} ms, p95 {result[1]:8.3f} ms per query")
+
+
+if __name__ == "__main__":
+    cache_dir = tempfile.mkdtemp()
+
+    # The current router.py path: a remote embedding request per query, then cosine against the routes
+    with EmbeddingsStandin(latency=0.12, jitter=0.05) as server:
+        client = OpenAI(base_url=server.base_url, api_key="standin")
+        remote = PhraseMatcher(routes, encoder_factory=lambda: OpenAIEmbeddingEncoder(client=client), cache_dir=cache_dir)
+        remote.load_vectors()
+        report("remote embedding per query", measure(remote.match_embeddings))
+
+    report("local keyword index", measure(PhraseMatcher(routes).match_keywords))
+
+    start = time.perf_counter()
+    PhraseMatcher(routes, encoder_factory=HashingEncoder, cache_dir=cache_dir).load_vectors()
+    built = time.perf_counter() - start
+    local = PhraseMatcher(routes, encoder_factory=HashingEncoder, cache_dir=cache_dir)
+    start = time.perf_counter()
+    local.load_vectors()
+    loaded = time.perf_counter() - start
+    report("local embedding stage only", measure(local.match_embeddings))
+    report("local keyword + embedding", measure(local))
+    print(f"utterance index: built in {1000 * built:.2f} ms, loaded from disk in {1000 * loaded:.2f} ms")
+    print(f"local matcher stats: {local.stats()}")
@@ -0,0 +1,230 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import json
+import wave
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import websockets
+
+from bench_e2e import Standins, synthetic_corpus
+from garvis.config import SAMPLE_RATE
+from garvis.metrics import latency_summary
+
+# Load generator for the websocket server (garvis/server.py). For each --cores value, starts
+# the server pinned to that many CPUs and backed by the local stand-ins, then runs rounds of
+# N concurrent clients (1, 2, 4, ... up to --max-sessions). With --backend reuseport the
+# server runs one process per core sharing the port; with --backend offload it is one
+# process whose frame analysis and chunk encoding go to an AudioOffload pool of one
+# worker per core (--processes and --audio-offload override either count). Values above
+# the CPUs available here are skipped. Each client streams a synthetic utterance at real time, like a
+# microphone, followed by silence, for --turns turns, and measures the time from the end of
+# its speech to the first byte of reply audio. The ceiling is the largest round whose p95
+# stays within --slo-ms with every turn answered; divided by the cores it gives the
+# sessions-per-core figure.
+#
+#     python benchmarks/bench_server_load.py [--cores 1 4 16] [--backend offload] [--slo-ms 1500] [--out load.json]
+
+CHUNK_MS = 20  # audio per client message, like a microphone callback
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sessions-per-core ceiling of the Garvis websocket server")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 16], help="CPUs the server is pinned to, one run each")
+    parser.add_argument("--backend", choices=["reuseport", "offload"], default="reuseport",
+                        help="use the cores for server processes or for an audio offload pool")
+    parser.add_argument("--processes", type=int, help="server processes (default: one per core, or 1 with offload)")
+    parser.add_argument("--audio-offload", type=int, help="offload pool processes (default: one per core with offload, else 0)")
+    parser.add_argument("--max-sessions", type=int, default=128)
+    parser.add_argument("--turns", type=int, default=2, help="turns per client and round")
+    parser.add_argument("--slo-ms", type=float, default=1500.0, help="p95 end of speech to first reply audio")
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds a client waits for a reply")
+    parser.add_argument("--stt-latency", type=float, default=0.25)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tts-latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--out", help="write the rounds as JSON here")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(urls, port, cpus, processes, offload):
+    env = {**os.environ, "GROQ_API_KEY": "standin", "OPENAI_API_KEY": "standin", "GROQ_BASE_URL": urls["stt"].rstrip("/")}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "garvis.server", "--port", str(port), "--processes", str(processes), "--audio-offload", str(offload), "--max-sessions", "1024",
+         "--transcriptor", "groq", "--llm", "ollama", "--model", "standin", "--llm-base-url", urls["llm"], "--tts-uri", urls["tts"]],
+        cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), env=env,
+        preexec_fn=lambda: os.sched_setaffinity(0, cpus), stdout=subprocess.PIPE, text=True)
+    ready = threading.Event()
+
+    def drain():
+        # Waits for every process to listen, then keeps the pipe empty
+        serving = 0
+        for line in process.stdout:
+            serving += line.startswith("Serving")
+            if serving == processes:
+                ready.set()
+
+    threading.Thread(target=drain, daemon=True).start()
+    ready.wait()
+    return process
+
+
+def process_tree_usage(pid):
+    # CPU seconds and RSS (MB) of a process and all its descendants, from /proc
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    stats[int(entry)] = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                pass
+    tree = {pid}
+    while True:
+        children = {p for p, fields in stats.items() if int(fields[1]) in tree} - tree
+        if not children:
+            break
+        tree |= children
+    fields = [stats[p] for p in tree if p in stats]
+    cpu = sum(int(f[11]) + int(f[12]) for f in fields) / os.sysconf("SC_CLK_TCK")
+    rss = sum(int(f[21]) for f in fields) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    return cpu, rss
+
+
+async def client(url, speech, turns, timeout, latencies, delay):
+    await asyncio.sleep(delay)
+    chunk = SAMPLE_RATE * CHUNK_MS // 1000 * 2
+    silence = bytes(chunk)
+    async with websockets.connect(url, compression=None, max_size=None) as ws:
+        await ws.recv()  # session
+        state = {"speech_end": None, "first_audio": None}
+        replied = asyncio.Event()
+
+        async def receive():
+            async for message in ws:
+                if isinstance(message, bytes):
+                    if state["speech_end"] is not None and state["first_audio"] is None:
+                        state["first_audio"] = time.perf_counter()
+                elif json.loads(message)["type"] == "turn_trace":
+                    replied.set()
+
+        receiver = asyncio.create_task(receive())
+        start = time.perf_counter()
+        sent = 0
+
+        async def send(data):
+            # Paced at real time, like a microphone
+            nonlocal sent
+            await ws.send(data)
+            sent += 1
+            await asyncio.sleep(max(0.0, start + sent * CHUNK_MS / 1000 - time.perf_counter()))
+
+        try:
+            for _ in range(turns):
+                state["speech_end"] = state["first_audio"] = None
+                replied.clear()
+                for i in range(0, len(speech), chunk):
+                    await send(speech[i:i + chunk])
+                state["speech_end"] = time.perf_counter()
+                deadline = state["speech_end"] + timeout
+                while not replied.is_set() and time.perf_counter() < deadline:
+                    await send(silence)
+                for _ in range(250 // CHUNK_MS):
+                    await send(silence)  # a pause before the next turn
+                first_audio = state["first_audio"]
+                latencies.append(first_audio - state["speech_end"] if first_audio else None)
+        finally:
+            receiver.cancel()
+
+
+async def run_round(url, server, sessions, speech, args):
+    cpu_before, _ = process_tree_usage(server.pid)
+    latencies = []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client(url, speech, args.turns, args.timeout, latencies, 1.0 * i / sessions)
+                                     for i in range(sessions)), return_exceptions=True)
+    wall = time.perf_counter() - started
+    cpu_after, rss = process_tree_usage(server.pid)
+    answered = [latency for latency in latencies if latency is not None]
+    return {
+        "sessions": sessions,
+        "turns": sessions * args.turns,
+        "answered": len(answered),
+        "client_errors": sum(isinstance(result, Exception) for result in results),
+        "server_cpu": (cpu_after - cpu_before) / wall,
+        "server_rss_mb": rss,
+        "wall_s": wall,
+        **latency_summary(answered),
+    }
+
+
+async def sweep(urls, cores, speech, args):
+    cpus = set(sorted(os.sched_getaffinity(0))[:cores])
+    processes = args.processes or (1 if args.backend == "offload" else cores)
+    offload = args.audio_offload if args.audio_offload is not None else (cores if args.backend == "offload" else 0)
+    port = free_port()
+    server = start_server(urls, port, cpus, processes, offload)
+    url = f"ws://127.0.0.1:{port}"
+    rounds = []
+    try:
+        print(f"{cores} core(s), {processes} server process(es), {offload} offload process(es); SLO p95 <= {args.slo_ms:.0f} ms from end of speech to first audio")
+        print(f"{'sessions':>8} {'answered':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'server CPU':>11} {'RSS MB':>7}")
+        sessions = 1
+        while sessions <= args.max_sessions:
+            result = await run_round(url, server, sessions, speech, args)
+            rounds.append(result)
+            print(f"{sessions:8d} {result['answered']:>4}/{result['turns']:<4} {result['p50_ms']:8.0f} {result['p95_ms']:8.0f} "
+                  f"{result['p99_ms']:8.0f} {100 * result['server_cpu']:10.0f}% {result['server_rss_mb']:7.0f}")
+            if result["answered"] < result["turns"] or result["p95_ms"] > args.slo_ms:
+                break
+            sessions *= 2
+    finally:
+        server.terminate()
+        server.wait()
+    within = [r["sessions"] for r in rounds if r["answered"] == r["turns"] and r["p95_ms"] <= args.slo_ms]
+    ceiling = max(within, default=0)
+    return {"cores": cores, "processes": processes, "offload": offload, "rounds": rounds, "ceiling": ceiling, "sessions_per_core": ceiling / cores}
+
+
+async def main(args):
+    corpus = synthetic_corpus(tempfile.mkdtemp())
+    with wave.open(os.path.join(corpus, "utterance0.wav"), "rb") as wf:
+        speech = wf.readframes(wf.getnframes())
+    with open(os.path.join(corpus, "utterance0.txt")) as f:
+        transcript = f.read()
+
+    options = {"stt_latency": args.stt_latency, "llm_latency": args.llm_latency, "tts_latency": args.tts_latency,
+               "jitter": args.jitter, "token_delay": 0.02, "reply": "Sure. Here is a short answer to your question."}
+    # More cores than this machine has would only time-share its CPUs, which says nothing about scaling
+    available = len(os.sched_getaffinity(0))
+    skipped = [cores for cores in args.cores if cores > available]
+    if skipped:
+        print(f"Only {available} CPU(s) available: skipping --cores {' '.join(map(str, skipped))}\n")
+    runs = []
+    with Standins(options) as standins:
+        standins.request("transcript", transcript)
+        for cores in args.cores:
+            if cores <= available:
+                runs.append(await sweep(standins.urls, cores, speech, args))
+                print()
+
+    # Rounds double the sessions, so each true ceiling lies below twice the one shown
+    print(f"{'cores':>5} {'processes':>9} {'offload':>7} {'ceiling':>8} {'sessions/core':>14}")
+    for run in runs:
+        print(f"{run['cores']:5d} {run['processes']:9d} {run['offload']:7d} {run['ceiling']:8d} {run['sessions_per_core']:14.0f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"options": vars(args), "available_cpus": available, "runs": runs}, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
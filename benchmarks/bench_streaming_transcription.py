@@ -0,0 +1,54 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import numpy as np
+
+from standin_servers import TranscriptionStandin
+from garvis.audio_processor_async import AudioProcessor
+from garvis.audio_source import IteratorSource
+from garvis.encoders import WavEncoder
+from garvis.listening_strategy import RealTimeWithSilenceStrategy
+
+SEGMENTS = ["What is the weather", "like in Paris", "this weekend?"]
+REPEATS = 5
+
+
+class TimingGarvis:
+    # Just enough of Garvis to record when partial and final text reach it.
+    def __init__(self):
+        self.start = None
+        self.first_partial = None
+
+    def log(self, message):
+        pass
+
+    def transcription_update(self, index, text, final=True):
+        if not final and self.first_partial is None:
+            self.first_partial = time.perf_counter() - self.start
+
+
+def run(transcriptor, chunk):
+    garvis = TimingGarvis()
+    audio_processor = AudioProcessor(garvis, RealTimeWithSilenceStrategy(), transcriptor=transcriptor, source=IteratorSource([]))
+    audio_processor.listening = True
+    garvis.start = time.perf_counter()
+    text = audio_processor.transcribe_audio(chunk, index=1)
+    total = time.perf_counter() - garvis.start
+    return text, garvis.first_partial, total
+
+
+if __name__ == "__main__":
+    with TranscriptionStandin(segments=SEGMENTS, latency=0.3, segment_delay=0.2) as server:
+        os.environ["COLAB_URL"] = server.url
+        samples = np.zeros(16000 * 2, dtype=np.int16)
+        encoder = WavEncoder()
+
+        for transcriptor in ("colab", "colab_stream"):
+            firsts, totals = [], []
+            for _ in range(REPEATS):
+                text, first, total = run(transcriptor, encoder.encode(samples))
+                firsts.append(first if first is not None else total)
+                totals.append(total)
+            print(f"{transcriptor:>13}: first text {1000 * np.median(firsts):6.0f} ms, "
+                  f"final text {1000 * np.median(totals):6.0f} ms  ({text!r})")
+        print(f"stand-in calls: {dict(server.calls)}")
@@ -0,0 +1,77 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import time
+import asyncio
+import numpy as np
+
+from standin_servers import TTSStandin
+from garvis.chunking import CHUNKING_POLICIES, create_chunking_policy
+from garvis.tts import TTSConnectionManager
+from garvis.utils import websocker_text_iterator
+
+REPEATS = 3
+
+# Token timings recorded from a streamed chat completion: (seconds since the previous token, text).
+# Note the stall in the middle, as when the provider hiccups. Pass a JSON file of the same shape to replay your own.
+TRACE = [(0.42, "Sure"), (0.03, ","), (0.02, " the"), (0.02, " weather"), (0.03, " in"), (0.02, " Paris"),
+         (0.02, " this"), (0.03, " weekend"), (0.02, " looks"), (0.02, " mostly"), (0.03, " sunny"), (0.02, ","),
+         (0.02, " with"), (0.02, " highs"), (0.03, " around"), (0.02, " 24"), (0.02, " degrees"), (0.02, "."),
+         (0.65, " Saturday"), (0.03, " evening"), (0.02, " might"), (0.02, " bring"), (0.03, " a"), (0.02, " light"),
+         (0.02, " shower"), (0.02, ","), (0.03, " so"), (0.02, " pack"), (0.02, " an"), (0.02, " umbrella"),
+         (0.03, " just"), (0.02, " in"), (0.02, " case"), (0.02, "."), (0.03, " Anything"), (0.02, " else"),
+         (0.02, " I"), (0.03, " can"), (0.02, " help"), (0.02, " with"), (0.02, "?")]
+
+
+async def replay(trace):
+    for delay, text in trace:
+        await asyncio.sleep(delay)
+        yield text
+
+
+async def turn(manager, policy, trace):
+    connection = await manager.acquire()
+    start = time.perf_counter()
+    messages = []
+
+    async def receive():
+        first_audio = None
+        while True:
+            data = json.loads(await connection.recv())
+            if data.get("audio") and first_audio is None:
+                first_audio = time.perf_counter() - start
+            if data.get("isFinal"):
+                return first_audio, time.perf_counter() - start
+
+    receiver = asyncio.create_task(receive())
+    async for text in websocker_text_iterator(replay(trace), policy):
+        messages.append(text)
+        await connection.send({"text": text, "try_trigger_generation": True})
+    await connection.send({"text": ""})
+    first_audio, last_audio = await receiver
+    await connection.close()
+    return first_audio, last_audio, messages
+
+
+async def run(server, name, trace):
+    manager = TTSConnectionManager(uri=server.ws_url(), api_key="standin")
+    manager.prewarm()
+    results = [await turn(manager, create_chunking_policy(name), trace) for _ in range(REPEATS)]
+    await manager.close()
+    return results
+
+
+if __name__ == "__main__":
+    trace = TRACE
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            trace = [tuple(token) for token in json.load(f)]
+
+    with TTSStandin(handshake_latency=0.05, latency=0.08) as server:
+        for name in CHUNKING_POLICIES:
+            results = asyncio.run(run(server, name, trace))
+            firsts = [first for first, _, _ in results]
+            lasts = [last for _, last, _ in results]
+            messages = results[-1][2]
+            print(f"{name:>9}: first audio {1000 * np.median(firsts):6.0f} ms, last audio {1000 * np.median(lasts):6.0f} ms, "
+                  f"{len(messages):3d} messages, {np.mean([len(m) for m in messages]):5.1f} chars/message")
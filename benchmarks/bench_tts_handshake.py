@@ -0,0 +1,49 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import time
+import asyncio
+import numpy as np
+
+from standin_servers import TTSStandin
+from garvis.tts import TTSConnectionManager
+
+TURNS = 10
+HANDSHAKE_LATENCY = 0.15  # stand-in for DNS + TCP + TLS + websocket upgrade to the TTS service
+LLM_FIRST_TOKEN = 0.3  # time the LLM takes to the first token, which the warm path overlaps with
+TEXT = "Sure, here is a short answer. "
+
+
+async def turn(manager, prewarm):
+    if prewarm:
+        manager.prewarm()  # Garvis does this when the LLM request goes out
+    await asyncio.sleep(LLM_FIRST_TOKEN)
+
+    first_text = time.perf_counter()
+    connection = await manager.acquire()
+    await connection.send({"text": TEXT, "try_trigger_generation": True})
+    first_audio = None
+    await connection.send({"text": ""})
+    while True:
+        data = json.loads(await connection.recv())
+        if data.get("audio") and first_audio is None:
+            first_audio = time.perf_counter()
+        if data.get("isFinal"):
+            break
+    await connection.close()
+    return first_audio - first_text
+
+
+async def run(server, prewarm):
+    manager = TTSConnectionManager(uri=server.ws_url(), api_key="standin", prewarm=prewarm)
+    latencies = [await turn(manager, prewarm) for _ in range(TURNS)]
+    await manager.close()
+    return latencies, manager.stats()
+
+
+if __name__ == "__main__":
+    with TTSStandin(handshake_latency=HANDSHAKE_LATENCY, latency=0.05) as server:
+        for name, prewarm in (("new socket per turn", False), ("warm socket manager", True)):
+            latencies, stats = asyncio.run(run(server, prewarm))
+            print(f"{name:>20}: first text -> first audio median {1000 * np.median(latencies):6.1f} ms, "
+                  f"max {1000 * max(latencies):6.1f} ms  {stats}")
@@ -0,0 +1,117 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import io
+import time
+import wave
+import tempfile
+import tracemalloc
+import webrtcvad
+import numpy as np
+
+from garvis.audio_processor_async import UtteranceBuffer
+from garvis.features import FrameFeatureExtractor
+from garvis.config import *
+
+try:
+    import memray  # optional: counts the allocations of each path
+except ImportError:
+    memray = None
+
+SECONDS = 10
+CHUNK_SECONDS = 1.0  # a chunk boundary every second, like fast real-time chunking
+REPEATS = 200
+
+
+def make_frames(seconds=SECONDS):
+    rng = np.random.default_rng(0)
+    n_frames = int(seconds * 1000 / FRAME_DURATION_MS)
+    return [rng.integers(-3000, 3000, FRAME_SIZE, dtype=np.int16).tobytes() for _ in range(n_frames)]
+
+
+def encode_wav(data):
+    in_memory_file = io.BytesIO()
+    wf = wave.open(in_memory_file, 'wb')
+    wf.setnchannels(1)
+    wf.setsampwidth(2)
+    wf.setframerate(SAMPLE_RATE)
+    wf.writeframes(data)
+    wf.close()
+    return in_memory_file
+
+
+def list_of_bytes_path(frames, frames_per_chunk):
+    # The previous path: list append, copy() per chunk, join for has_speech, join again for WAV.
+    audio_frames = []
+    for i, frame in enumerate(frames, 1):
+        audio_frames.append(frame)
+        if i % frames_per_chunk == 0:
+            chunk = audio_frames.copy()
+            audio_frames = []
+            audio_array = np.frombuffer(b''.join(chunk), dtype=np.int16)
+            if np.max(np.abs(audio_array)) > SPEECH_THRESHOLD:
+                encode_wav(b''.join(chunk))
+
+
+def utterance_buffer_path(frames, frames_per_chunk, features=None):
+    # With `features`, as the strategies append (the frame analysis runs anyway, for
+    # power metering and the VAD), the speech check reads the peak from them
+    audio_frames = UtteranceBuffer()
+    for i, (frame, frame_features) in enumerate(zip(frames, features or [None] * len(frames)), 1):
+        audio_frames.append(frame, frame_features)
+        if i % frames_per_chunk == 0:
+            chunk = audio_frames.detach()
+            if chunk.max_peak > SPEECH_THRESHOLD:
+                encode_wav(chunk.samples)
+
+
+def measure(fn, frames, frames_per_chunk):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(frames, frames_per_chunk)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    fn(frames, frames_per_chunk)
+    blocks_after = sys.getallocatedblocks()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": 1000 * sorted(timings)[len(timings) // 2],
+        "peak_kb": peak / 1024,
+        "retained_blocks": blocks_after - blocks_before,
+        "allocations": count_allocations(fn, frames, frames_per_chunk),
+    }
+
+
+def count_allocations(fn, frames, frames_per_chunk):
+    # Calls into the system allocator (malloc, realloc, ...) during one run: every buffer over 512 bytes,
+    # numpy arrays and list growth. Python's small-object allocator serves the rest from its arenas.
+    if memray is None:
+        return None
+    path = os.path.join(tempfile.mkdtemp(), "allocations.bin")
+    with memray.Tracker(path):
+        fn(frames, frames_per_chunk)
+    records = memray.FileReader(path).get_allocation_records()
+    released = {memray.AllocatorType.FREE, memray.AllocatorType.MUNMAP, memray.AllocatorType.PYMALLOC_FREE}
+    count = sum(1 for record in records if memray.AllocatorType(record.allocator) not in released)
+    os.remove(path)
+    return count
+
+
+if __name__ == "__main__":
+    frames = make_frames()
+    frames_per_chunk = int(CHUNK_SECONDS * 1000 / FRAME_DURATION_MS)
+    print(f"{SECONDS} s of audio, {len(frames)} frames, chunk every {frames_per_chunk} frames, {REPEATS} repeats")
+    extractor = FrameFeatureExtractor(webrtcvad.Vad(1))
+    features = [extractor.extract(frame) for frame in frames]
+    paths = (("list-of-bytes", list_of_bytes_path),
+             ("UtteranceBuffer", utterance_buffer_path),
+             ("  with features", lambda frames, frames_per_chunk: utterance_buffer_path(frames, frames_per_chunk, features)))
+    for name, fn in paths:
+        result = measure(fn, frames, frames_per_chunk)
+        allocations = result["allocations"] if result["allocations"] is not None else "n/a (pip install memray)"
+        print(f"{name:>16}: {result['median_ms']:7.2f} ms / {SECONDS} s audio, "
+              f"peak traced {result['peak_kb']:8.1f} KiB, retained blocks {result['retained_blocks']}, "
+              f"allocations {allocations} / {SECONDS} s audio")
@@ -0,0 +1,313 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import base64
+import random
+import zlib
+import numpy as np
+import asyncio
+import threading
+
+from collections import Counter
+from aiohttp import web, WSMsgType
+
+
+class StandinServer:
+    """
+    Local stand-in for a remote API, served by aiohttp on a background thread so
+    garvis can be exercised without network access or API quota. `latency` is the
+    delay before the first byte of each response and `jitter` adds up to that many
+    extra seconds at random. `calls` counts requests per endpoint.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def routes(self, app):
+        pass
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    async def delay(self, seconds=None):
+        seconds = self.latency if seconds is None else seconds
+        if self.jitter:
+            seconds += self.random.uniform(0, self.jitter)
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def _serve(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.routes(app)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+        self._started.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self._runner.cleanup())
+        self.loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class TranscriptionStandin(StandinServer):
+    """
+    Serves the Colab server's `transcribe` (one JSON document) and `transcribe_stream`
+    (one JSON segment per line) endpoints. Segments become available `segment_delay`
+    seconds apart after the initial latency, as with a real streaming decoder.
+    The Whisper-compatible `audio/transcriptions` endpoint (what the Groq client
+    calls, with GROQ_BASE_URL pointing here) answers with all segments at once.
+    """
+    def __init__(self, segments=("Hello there.", "How are you doing today?"), segment_delay=0.15, **kwargs):
+        super().__init__(**kwargs)
+        self.segments = list(segments)
+        self.segment_delay = segment_delay
+        self.bytes_received = 0
+
+    def routes(self, app):
+        app.router.add_post("/transcribe", self.transcribe)
+        app.router.add_post("/transcribe_stream", self.transcribe_stream)
+        app.router.add_post("/openai/v1/audio/transcriptions", self.transcriptions)
+        app.router.add_post("/v1/audio/transcriptions", self.transcriptions)
+
+    async def transcribe(self, request):
+        self.calls["transcribe"] += 1
+        self.bytes_received += len(await request.read())
+        await self.delay()
+        await asyncio.sleep(self.segment_delay * len(self.segments))
+        return web.json_response({"segments": [{"text": text} for text in self.segments]})
+
+    async def transcriptions(self, request):
+        self.calls["audio.transcriptions"] += 1
+        self.bytes_received += len(await request.read())
+        await self.delay()
+        await asyncio.sleep(self.segment_delay * len(self.segments))
+        return web.json_response({"text": " ".join(self.segments)})
+
+    async def transcribe_stream(self, request):
+        self.calls["transcribe_stream"] += 1
+        self.bytes_received += len(await request.read())
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        await self.delay()
+        for text in self.segments:
+            await asyncio.sleep(self.segment_delay)
+            await response.write((json.dumps({"text": text}) + "\n").encode())
+        await response.write_eof()
+        return response
+
+
+class TTSStandin(StandinServer):
+    """
+    ElevenLabs-style `stream-input` websocket. `handshake_latency` delays the upgrade
+    (standing in for DNS, TCP and TLS setup), `latency` delays the first audio of each
+    generation, and idle sockets are closed after `inactivity_timeout` seconds like the
+    real service. Audio is silent 16-bit PCM, `bytes_per_char` bytes per character,
+    sent with a character alignment so callers can map audio back to text.
+    """
+    def __init__(self, handshake_latency=0.1, bytes_per_char=1600, inactivity_timeout=20.0, **kwargs):
+        super().__init__(**kwargs)
+        self.handshake_latency = handshake_latency
+        self.bytes_per_char = bytes_per_char
+        self.inactivity_timeout = inactivity_timeout
+        self.sessions = 0
+        self.messages_received = 0
+
+    def ws_url(self, voice_id="standin-voice", model_id="standin-model"):
+        return f"ws://{self.host}:{self.port}/v1/text-to-speech/{voice_id}/stream-input?model_id={model_id}"
+
+    def routes(self, app):
+        app.router.add_get("/v1/text-to-speech/{voice_id}/stream-input", self.stream_input)
+
+    async def generate(self, ws, text):
+        await self.delay()
+        audio = bytes(self.bytes_per_char * len(text))
+        await ws.send_json({
+            "audio": base64.b64encode(audio).decode(),
+            "isFinal": None,
+            "alignment": {
+                "chars": list(text),
+                "charStartTimesMs": [50 * i for i in range(len(text))],
+                "charDurationsMs": [50] * len(text),
+            },
+        })
+
+    async def stream_input(self, request):
+        self.calls["stream-input"] += 1
+        await asyncio.sleep(self.handshake_latency)
+        ws = web.WebSocketResponse()
+        try:
+            await ws.prepare(request)
+        except ConnectionResetError:
+            return web.Response(status=499)  # Client gave up during the handshake
+        self.sessions += 1
+
+        buffer = ""
+        while True:
+            try:
+                msg = await asyncio.wait_for(ws.receive(), timeout=self.inactivity_timeout)
+            except asyncio.TimeoutError:
+                break
+            if msg.type != WSMsgType.TEXT:
+                break
+            self.messages_received += 1
+            data = json.loads(msg.data)
+            text = data.get("text")
+            if text == "":
+                if buffer.strip():
+                    await self.generate(ws, buffer)
+                await ws.send_json({"isFinal": True})
+                break
+            if text and text != " ":
+                buffer += text
+                if data.get("try_trigger_generation") or data.get("flush"):
+                    await self.generate(ws, buffer)
+                    buffer = ""
+        await ws.close()
+        return ws
+
+
+class EmbeddingsStandin(StandinServer):
+    """
+    OpenAI-compatible `/v1/embeddings`. Vectors are deterministic pseudo-random unit
+    vectors seeded by the input text, so equal texts embed equally.
+    """
+    def __init__(self, dim=1536, **kwargs):
+        super().__init__(**kwargs)
+        self.dim = dim
+
+    @property
+    def base_url(self):
+        return f"{self.url}v1"
+
+    def routes(self, app):
+        app.router.add_post("/v1/embeddings", self.embeddings)
+
+    def embed(self, text):
+        vector = np.random.default_rng(zlib.crc32(text.encode())).normal(size=self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    async def embeddings(self, request):
+        self.calls["embeddings"] += 1
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await self.delay()
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": self.embed(text)} for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+
+class ChatStandin(StandinServer):
+    """
+    OpenAI-compatible `/v1/chat/completions`, streamed (server-sent events) or not.
+    The reply is `reply` split into word tokens, `token_delay` seconds apart after
+    `latency`. The first request on each new TCP connection waits `connect_latency`
+    more, standing in for the TLS handshake a pooled connection avoids; `connections`
+    counts them. `error_rate` of the requests are refused with 429 like a rate limited
+    API, and `stall_rate` wait `stall` extra seconds before the first token.
+    `model_latency` maps model names to their own `latency`.
+    """
+    def __init__(self, reply="Sure, here is a short answer to your question.", token_delay=0.02,
+                 connect_latency=0.1, error_rate=0.0, stall_rate=0.0, stall=2.0, model_latency=None, **kwargs):
+        super().__init__(**kwargs)
+        self.model_latency = model_latency or {}
+        self.reply = reply
+        self.token_delay = token_delay
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.connections = 0
+        self.requests = []
+        self._transports = set()
+
+    @property
+    def base_url(self):
+        return f"{self.url}v1"
+
+    def routes(self, app):
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+
+    def tokens(self, body):
+        return [word + " " for word in self.reply.split()]
+
+    def chunk(self, model, content=None, finish_reason=None):
+        return {
+            "id": "chatcmpl-standin", "object": "chat.completion.chunk", "created": 0, "model": model,
+            "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}],
+        }
+
+    async def chat_completions(self, request):
+        self.calls["chat.completions"] += 1
+        if id(request.transport) not in self._transports:
+            self._transports.add(id(request.transport))
+            self.connections += 1
+            await asyncio.sleep(self.connect_latency)
+        body = await request.json()
+        self.requests.append(body)
+        model = body.get("model", "standin")
+        tokens = self.tokens(body)
+        if self.random.random() < self.error_rate:
+            self.calls["rate_limited"] += 1
+            return web.json_response({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded",
+                                                "code": "rate_limit_exceeded"}}, status=429)
+        if self.random.random() < self.stall_rate:
+            self.calls["stalled"] += 1
+            await asyncio.sleep(self.stall)
+        await self.delay(self.model_latency.get(model))
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.token_delay * len(tokens))
+            return web.json_response({
+                "id": "chatcmpl-standin", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await response.prepare(request)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(self.token_delay)
+                await response.write(f"data: {json.dumps(self.chunk(model, token))}\n\n".encode())
+            await response.write(f"data: {json.dumps(self.chunk(model, finish_reason='stop'))}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Client went away mid-stream, e.g. its event loop was closed
+        return response
@@ -0,0 +1,231 @@
+import io
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+from .config import *
+from .ring_buffer import FrameRingBuffer
+from .features import FrameFeatureExtractor
+from .encoders import ChunkEncoder, create_encoder
+from .metrics import latency_summary
+
+# State of a pool worker process: its feature extractor, encoders and the frame rings it has mapped
+_worker = {}
+
+
+def _init_worker(vad_mode, energy_gate):
+    import webrtcvad
+    _worker["extractor"] = FrameFeatureExtractor(webrtcvad.Vad(vad_mode), energy_gate=energy_gate)
+    _worker["encoders"] = {}
+    _worker["rings"] = OrderedDict()
+
+
+def _attach(name):
+    # Rings stay mapped from one job to the next; the least recently used are let go beyond AUDIO_OFFLOAD_ATTACHED
+    rings = _worker["rings"]
+    if name in rings:
+        rings.move_to_end(name)
+        return rings[name]
+    segment = shared_memory.SharedMemory(name=name)
+    rings[name] = segment
+    while len(rings) > AUDIO_OFFLOAD_ATTACHED:
+        rings.popitem(last=False)[1].close()
+    return segment
+
+
+def _analyze(requests):
+    # Each request is (ring segment, ring capacity, first frame, frame count); the frames are read in place
+    results = []
+    for name, capacity, first, count in requests:
+        try:
+            segment = _attach(name)
+        except FileNotFoundError:
+            results.append(None)  # The session closed its ring meanwhile
+            continue
+        ring = np.ndarray((capacity, FRAME_SIZE), dtype=np.int16, buffer=segment.buf)
+        frames = ring.take(np.arange(first, first + count), axis=0, mode="wrap")
+        del ring
+        results.append(_worker["extractor"].extract_many(frames))
+    return results
+
+
+def _encode(encoder, name, n_samples, sample_rate, sample_width):
+    encoders = _worker["encoders"]
+    if encoder not in encoders:
+        encoders[encoder] = create_encoder(encoder)
+    segment = shared_memory.SharedMemory(name=name)
+    samples = np.ndarray(n_samples, dtype=np.int16, buffer=segment.buf)
+    try:
+        in_memory_file = io.BytesIO()
+        encoders[encoder].write(in_memory_file, samples, sample_rate, sample_width)
+        return in_memory_file.getvalue()
+    finally:
+        del samples
+        segment.close()
+
+
+def _resolve(outcomes):
+    # On the loop of the futures: (future, result, error) each
+    for future, result, error in outcomes:
+        if future.done():
+            continue
+        if isinstance(error, concurrent.futures.CancelledError):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+class SharedFrameRing(FrameRingBuffer):
+    """FrameRingBuffer kept in a shared memory segment, so pool workers read its frames in place."""
+    def __init__(self, frame_size=FRAME_SIZE, capacity=FRAME_BUFFER_CAPACITY):
+        self.segment = shared_memory.SharedMemory(create=True, size=capacity * frame_size * 2)
+        super().__init__(frame_size, capacity, buffer=self.segment.buf)
+
+    def close(self):
+        self._frames = None
+        self.segment.close()
+        self.segment.unlink()
+
+
+class AudioOffload:
+    """
+    Process pool for the CPU-bound audio stages of many sessions, so they run
+    outside the GIL of the process serving the sessions: frame analysis (energy,
+    peak and VAD) and chunk encoding.
+
+    Audio never travels as pickled bytes. A StreamSource built with this offload
+    keeps its frames in a SharedFrameRing (`frame_ring()`), and `analyze()` sends
+    only the ring's name and a frame range. Requests of all sessions are gathered
+    for `batch_ms` and go out as one job per worker, so a round trip to the pool
+    is paid per batch, not per frame. Each result comes back as a future on the
+    loop of the session that asked for it. `encoder(name)` returns a ChunkEncoder
+    that encodes in the pool, the samples handed over in a shared block.
+
+    The base64 decoding of TTS audio stays in the session: its input is the text
+    of a websocket message, which would have to be copied out to a worker whole.
+    """
+    def __init__(self, processes=None, batch_ms=AUDIO_OFFLOAD_BATCH_MS, vad_mode=1, energy_gate=VAD_ENERGY_GATE):
+        self.processes = processes or os.cpu_count()
+        self.batch_seconds = batch_ms / 1000
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"),
+                                                           initializer=_init_worker, initargs=(vad_mode, energy_gate))
+        self._pending = []  # (loop, future, request) waiting for the next batch
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+
+        self.batches = 0
+        self.frames = 0
+        self.encodes = 0
+        self.failures = 0
+        self.round_trip_seconds = deque(maxlen=1000)
+
+    def frame_ring(self, capacity=FRAME_BUFFER_CAPACITY):
+        return SharedFrameRing(FRAME_SIZE, capacity)
+
+    def encoder(self, encoder=CHUNK_ENCODER):
+        return OffloadEncoder(self, encoder)
+
+    def analyze(self, ring, first, count):
+        # Future, on the running loop, of the FEATURES_DTYPE records of frames first..first+count-1 of `ring`
+        # (None if the ring was closed first). The frames must stay in the ring until it is done.
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._pending.append((loop, future, (ring.segment.name, ring.capacity, first, count)))
+            schedule, self._flush_scheduled = not self._flush_scheduled, True
+        if schedule:
+            loop.call_later(self.batch_seconds, self._flush)
+        return future
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._flush_scheduled = False
+        for i in range(min(self.processes, len(pending))):
+            batch = pending[i::self.processes]
+            submitted = time.perf_counter()
+            try:
+                job = self.pool.submit(_analyze, [request for _, _, request in batch])
+            except RuntimeError as error:
+                # The pool was shut down
+                self._deliver_all(batch, None, error)
+                continue
+            job.add_done_callback(lambda job, batch=batch, submitted=submitted: self._deliver(job, batch, submitted))
+            self.batches += 1
+
+    def _deliver(self, job, batch, submitted):
+        # Runs on the pool's result thread
+        self.round_trip_seconds.append(time.perf_counter() - submitted)
+        if job.cancelled():
+            self._deliver_all(batch, None, concurrent.futures.CancelledError())
+            return
+        error = job.exception()
+        if error is not None:
+            self.failures += 1
+            self._deliver_all(batch, None, error)
+            return
+        self.frames += sum(request[3] for _, _, request in batch)
+        self._resolve_soon(batch, job.result(), None)
+
+    def _deliver_all(self, batch, result, error):
+        self._resolve_soon(batch, [result] * len(batch), error)
+
+    def _resolve_soon(self, batch, results, error):
+        # One wake-up per event loop, however many of its sessions are in the batch
+        outcomes = {}
+        for (loop, future, _), result in zip(batch, results):
+            outcomes.setdefault(loop, []).append((future, result, error))
+        for loop, loop_outcomes in outcomes.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, loop_outcomes)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+    def encode(self, encoder, samples, sample_rate=SAMPLE_RATE, sample_width=2):
+        # Blocking, so call it from a thread (the transcription executor's)
+        segment = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+        try:
+            np.ndarray(len(samples), dtype=np.int16, buffer=segment.buf)[:] = samples
+            data = self.pool.submit(_encode, encoder, segment.name, len(samples), sample_rate, sample_width).result()
+        finally:
+            segment.close()
+            segment.unlink()
+        with self._lock:
+            self.encodes += 1
+        return data
+
+    def close(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        self._deliver_all(pending, None, concurrent.futures.CancelledError())
+        self.pool.shutdown(cancel_futures=True)
+
+    def stats(self):
+        return {
+            "processes": self.processes,
+            "batches": self.batches,
+            "frames": self.frames,
+            "encodes": self.encodes,
+            "failures": self.failures,
+            **latency_summary(list(self.round_trip_seconds), "round_trip_"),
+        }
+
+
+class OffloadEncoder(ChunkEncoder):
+    """A ChunkEncoder (by name) that writes its uploads in an AudioOffload pool."""
+    def __init__(self, offload, encoder=CHUNK_ENCODER):
+        super().__init__()
+        template = create_encoder(encoder)
+        self.name, self.extension, self.mime_type = template.name, template.extension, template.mime_type
+        self.offload = offload
+
+    def write(self, in_memory_file, samples, sample_rate, sample_width):
+        in_memory_file.write(self.offload.encode(self.name, samples, sample_rate, sample_width))
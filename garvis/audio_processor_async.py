@@ -1,34 +1,102 @@
 from groq import Groq
-import pyaudio
-import wave
 import webrtcvad
 import numpy as np
-import io
 import time
+import asyncio
+from operator import attrgetter
 from .utils import *
 from .config import *
 from .listening_strategy import *
+from .audio_source import AudioSource, MicrophoneSource
+from .features import FrameFeatureExtractor, FEATURES_DTYPE
+from .transcription import TranscriptionExecutor
+from .encoders import ChunkEncoder, create_encoder
+
+
+class UtteranceBuffer:
+    """
+    The frames of the utterance being captured, with their features.
+
+    `append()` only puts the frame and its features on two lists: no copy and no
+    per-frame arithmetic on the capture loop. `detach()` hands both lists to the
+    returned chunk and starts this buffer over on new ones, so nothing is copied
+    at a chunk boundary either. A chunk's frames are joined once, when `samples`
+    is first read (by the encoder, on the transcription thread). The speech check
+    takes the peak from the frames' features, or from one pass over the samples
+    when some frames came without them.
+    """
+    def __init__(self):
+        self._frames = []
+        self._features = []  # FrameFeatures per frame, None for a frame appended without
+        self._samples = None
+        self._joined = 0  # frames in _samples
+
+    def __len__(self):
+        return sum(map(len, self._frames)) // 2
+
+    @property
+    def samples(self):
+        if self._samples is None or self._joined != len(self._frames):
+            self._samples = np.frombuffer(b"".join(self._frames), dtype=np.int16)
+            self._joined = len(self._frames)
+        return self._samples
+
+    @property
+    def features(self):
+        return np.array([features for features in self._features if features is not None], dtype=FEATURES_DTYPE)
+
+    @property
+    def duration(self):
+        return len(self) / SAMPLE_RATE
+
+    @property
+    def max_peak(self):
+        if None not in self._features:
+            return max(map(attrgetter("peak"), self._features), default=0)
+        samples = self.samples
+        return max(int(samples.max()), -int(samples.min())) if len(samples) else 0
+
+    def append(self, frame, features=None):
+        self._frames.append(frame)
+        self._features.append(features)
+
+    def detach(self):
+        chunk = UtteranceBuffer.__new__(UtteranceBuffer)
+        chunk._frames, chunk._features = self._frames, self._features
+        chunk._samples, chunk._joined = None, 0
+        self._frames, self._features = [], []
+        self._samples, self._joined = None, 0
+        return chunk
+
+    def clear(self):
+        self._frames.clear()
+        self._features.clear()
+        self._samples, self._joined = None, 0
 
 
 class AudioProcessor:
-    def __init__(self, garvis, strategy, transcriptor=DEFAULT_TRANSCRIPTOR, verbose=False):
+    def __init__(self, garvis, strategy, transcriptor=DEFAULT_TRANSCRIPTOR, verbose=False, source: AudioSource = None,
+                 transcription_executor: TranscriptionExecutor = None, encoder=CHUNK_ENCODER):
         assert garvis is not None, "Garvis instance is required."
         assert strategy is not None, "Listening strategy is required."
         self.garvis = garvis
         self.strategy = strategy
-        self.audio_frames = []
+        self.audio_frames = UtteranceBuffer()
         self.chunk_index = 0
         self.vad = webrtcvad.Vad(1)
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(format=pyaudio.paInt16,
-                                      channels=1,
-                                      rate=SAMPLE_RATE,
-                                      input=True,
-                                      frames_per_buffer=FRAME_SIZE)
+        self.features = FrameFeatureExtractor(self.vad)
+        self.voiced_run = 0
+        self.last_voiced_at = None
+        self.source = source or MicrophoneSource()
+        self.source.analyzer = self.features
+        self.frames_read = 0
+        self.loop = None
         self.listening = False
         self.on_audio_power = None
         
         self.transcriptor = transcriptor
+        self.transcription_executor = transcription_executor or TranscriptionExecutor(log=self.log)
+        self.encoder: ChunkEncoder = create_encoder(encoder)
         
         self.FRAME_SIZE = FRAME_SIZE
         self.SAMPLE_RATE = SAMPLE_RATE
@@ -68,50 +136,94 @@ class AudioProcessor:
         if self.listening:
             self.log("Stopping listening. Waiting for the last chunk to process...")
             self.listening = False
-            self.stream.stop_stream()
+            self.source.stop()
+            stats = self.capture_stats()
+            if stats.get("dropped_frames") or stats.get("input_overflows"):
+                self.log(f"Capture loss: {stats.get('dropped_frames', 0)} frames dropped, {stats.get('input_overflows', 0)} input overflows.")
             # if self.audio_frames:
             #     await self.process_audio(self.chunk_index + 1, self.audio_frames.copy())
             self.log("Stopped listening.")
             self.garvis.transcription_stop()
         else:
+            self.loop = asyncio.get_running_loop()
             self.listening = True
             self.garvis.transcription_start()
-            self.stream.start_stream()
+            self.source.start()
             self.log("Started listening.")
             await self.strategy.listen(self)
 
-    def on_audio_power(self, power):
-        if self.on_audio_power:
-            self.on_audio_power(power)
+    @property
+    def audio_time(self):
+        # Seconds of audio consumed so far. Strategies time silences against this clock
+        # so replayed audio behaves the same whether it is paced or unthrottled.
+        return self.frames_read * FRAME_DURATION_MS / 1000
+
+    async def read_frame(self):
+        # Returns the next captured frame, or None once listening has stopped.
+        if not self.listening:
+            return None
+        data = await self.source.read_frame()
+        if data is None:
+            if self.source.exhausted and self.listening:
+                self.log("Audio source exhausted. Stopping listening.")
+                await self.toggle_listen()
+            return None
+        self.frames_read += 1
+        return data
+
+    def analyze_frame(self, data):
+        features = self.source.frame_features() or self.features.extract(data)
+        self.voiced_run = self.voiced_run + 1 if features.voiced else 0
+        if features.voiced:
+            self.last_voiced_at = time.perf_counter()
+        if self.voiced_run == SPECULATION_CANCEL_FRAMES:
+            self.garvis.speech_resumed()
+        return features
+
+    def capture_stats(self):
+        return self.source.stats()
+
+    def audio_power(self, power):
+        # Published, not called: `on_audio_power` runs on the event bus, off the listening loop
+        self.garvis.events.publish("audio_power", power)
+
+    async def process_audio(self, index, audio_frames, stop_listening=False, callback=None):
+        tracer = self.garvis.tracer
+        turn_id = tracer.turn_id  # the transcript may come back after the next turn began
+        if self.last_voiced_at is not None:
+            tracer.mark("speech_end", self.last_voiced_at, turn_id=turn_id)
+        tracer.mark("chunk_dispatch", turn_id=turn_id)
 
-    def process_audio(self, index, audio_frames, stop_listening=False, callback=None):
         def process():
             if not self.listening:
                 self.log(f"Skipping chunk {index} processing. Not listening.")
-                return
+                return None
                 
             if not self.has_speech(audio_frames):
                 self.log(f"No significant speech detected in chunk {index}. Skipping transcription.")
-                return
+                return None
 
-            in_memory_file = io.BytesIO()
-            wf = wave.open(in_memory_file, 'wb')
-            wf.setnchannels(1)
-            wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(SAMPLE_RATE)
-            wf.writeframes(b''.join(audio_frames))
-            wf.close()
+            chunk = self.encoder.encode(audio_frames.samples, SAMPLE_RATE, self.source.sample_width)
+            self.log(f"Chunk {index} encoded as {self.encoder.name}: {audio_frames.samples.nbytes} -> {chunk.file.getbuffer().nbytes} bytes.")
 
-            self.log("Audio saved to in-memory file.")
-
-            text = self.transcribe_audio(in_memory_file)
+            text = self.transcribe_audio(chunk, index)
             # text = "Why sky is blue?"
             if text.lower().strip(' .') == "thank you":
                 # Get length of aufio binarydata
-                audio_length = len(in_memory_file.getvalue())
+                audio_length = len(chunk.file.getvalue())
                 print("\n\r AUDIO length: " + str(audio_length) + "\n\r")
+                return None
+            return text
+
+        def deliver(text):
+            # Called by the executor in chunk order, on a worker thread.
+            if text is None:
+                if stop_listening and self.listening:
+                    # The closing chunk held no speech: end the capture anyway, so the turn does not hang
+                    asyncio.run_coroutine_threadsafe(self.toggle_listen(), self.loop)
                 return
-            
+
+            tracer.mark("transcript", turn_id=turn_id)
             self.garvis.transcription_update(index, text)
 
             if callback:
@@ -119,41 +231,48 @@ class AudioProcessor:
                     return 
             
             if stop_listening:
-                asyncio.run_coroutine_threadsafe(self.toggle_listen(), self.garvis.loop)
+                asyncio.run_coroutine_threadsafe(self.toggle_listen(), self.loop)
 
-        threading.Thread(target=process).start()
-            # await self.toggle_listen()
+        await self.transcription_executor.submit(process, deliver)
 
     def has_speech(self, audio_frames):
-        audio_data = b''.join(audio_frames)
-        audio_array = np.frombuffer(audio_data, dtype=np.int16)
-        return np.max(np.abs(audio_array)) > SPEECH_THRESHOLD
+        return audio_frames.max_peak > SPEECH_THRESHOLD
 
-    def transcribe_audio(self, in_memory_file):
+    def transcribe_audio(self, chunk, index=None):
         if self.transcriptor == "groq":
-            return self.transcribe_audio_groq(in_memory_file)
+            return self.transcribe_audio_groq(chunk)
         elif self.transcriptor == "colab":
-            return self.transcribe_audio_colab(in_memory_file)
+            return self.transcribe_audio_colab(chunk)
+        elif self.transcriptor == "colab_stream":
+            return self.transcribe_audio_colab_stream(chunk, index)
         
-    def transcribe_audio_groq(self, in_memory_file):
-        client = Groq()
+    def transcribe_audio_groq(self, chunk):
+        client = self.transcription_executor.client("groq", Groq)
         transcription = ""
 
-        in_memory_file.seek(0)
+        chunk.file.seek(0)
         start = time.time()
         transcription = client.audio.transcriptions.create(
-            file=("in_memory_audio.wav", in_memory_file.read()),
+            file=(chunk.filename, chunk.file.read()),
             model="whisper-large-v3",
         )
         end = time.time()
         self.log(f"Transcription time: {end - start:.2f} seconds")
         return transcription.text
 
-    def transcribe_audio_colab(self, in_memory_file):
-        in_memory_file.seek(0)
+    def create_http_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.transcription_executor.max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def transcribe_audio_colab(self, chunk):
+        chunk.file.seek(0)
         start = time.time()
         
-        full_result = call_transcribe(in_memory_file)
+        session = self.transcription_executor.client("colab", self.create_http_session)
+        full_result = call_transcribe(chunk.file, session=session, filename=chunk.filename, mime_type=chunk.mime_type)
         text = [segment["text"] for segment in full_result["segments"]]
         text = " ".join(text)
         
@@ -161,3 +280,23 @@ class AudioProcessor:
         self.log(f"Transcription time: {end - start:.2f} seconds")
         return text
 
+    def transcribe_audio_colab_stream(self, chunk, index):
+        # Reads segments as the server produces them and reports the growing text as partial updates.
+        chunk.file.seek(0)
+        start = time.time()
+
+        session = self.transcription_executor.client("colab", self.create_http_session)
+        segments = []
+        for line in call_transcribe_stream(chunk.file, session=session, filename=chunk.filename, mime_type=chunk.mime_type):
+            texts = parse_transcribe_stream_line(line)
+            if not texts:
+                continue
+            if not segments:
+                self.log(f"First segment of chunk {index} after {time.time() - start:.2f} seconds")
+            segments.extend(texts)
+            if self.listening:
+                self.garvis.transcription_update(index, " ".join(segments), final=False)
+
+        end = time.time()
+        self.log(f"Transcription time: {end - start:.2f} seconds")
+        return " ".join(segments)
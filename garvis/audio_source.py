@@ -0,0 +1,334 @@
+import asyncio
+import time
+import wave
+import numpy as np
+
+from abc import ABC, abstractmethod
+from collections import deque
+from .config import *
+from .ring_buffer import FrameRingBuffer
+from .features import FrameFeatures
+
+
+class AudioSource(ABC):
+    """
+    Where AudioProcessor gets its 16-bit mono frames from.
+
+    `read_frame` returns the next FRAME_SIZE-sample frame as bytes, or None once the
+    source is stopped or has run out of audio (`exhausted` tells the two apart).
+    AudioProcessor sets `analyzer` to its FrameFeatureExtractor; a source that gets
+    its audio in blocks may analyze a whole block at once and hand the result out
+    through `frame_features`.
+    """
+    sample_rate = SAMPLE_RATE
+    frame_size = FRAME_SIZE
+    sample_width = 2
+    exhausted = False
+    analyzer = None
+
+    @abstractmethod
+    def start(self):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    async def read_frame(self):
+        pass
+
+    def close(self):
+        pass
+
+    def frame_features(self):
+        # FrameFeatures of the frame `read_frame` returned last, if already known
+        return None
+
+    def stats(self):
+        return {}
+
+
+class MicrophoneSource(AudioSource):
+    def __init__(self, capacity=FRAME_BUFFER_CAPACITY):
+        import pyaudio
+        self._pyaudio = pyaudio
+        self.frames = FrameRingBuffer(FRAME_SIZE, capacity=capacity)
+        self.input_overflows = 0
+        self.active = False
+        self.loop = None
+        self._frame_ready = None
+        self.audio = pyaudio.PyAudio()
+        self.sample_width = self.audio.get_sample_size(pyaudio.paInt16)
+        self.stream = self.audio.open(format=pyaudio.paInt16,
+                                      channels=1,
+                                      rate=SAMPLE_RATE,
+                                      input=True,
+                                      frames_per_buffer=FRAME_SIZE,
+                                      start=False,
+                                      stream_callback=self._capture_callback)
+
+    def start(self):
+        if self.active:
+            return  # Already capturing, e.g. handed over from the barge-in monitor
+        self.loop = asyncio.get_running_loop()
+        self._frame_ready = asyncio.Event()
+        self.frames.clear()
+        self.active = True
+        self.stream.start_stream()
+
+    def stop(self):
+        self.active = False
+        self.stream.stop_stream()
+        if self._frame_ready:
+            self._frame_ready.set()
+
+    def close(self):
+        self.stream.close()
+        self.audio.terminate()
+
+    def _capture_callback(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread: copy the frame into the ring and wake the reader.
+        if status & self._pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        if self.active and self.frames.push(in_data):
+            try:
+                self.loop.call_soon_threadsafe(self._frame_ready.set)
+            except RuntimeError:
+                pass  # Event loop already closed
+        return (None, self._pyaudio.paContinue)
+
+    async def read_frame(self):
+        while self.active:
+            data = self.frames.pop()
+            if data is not None:
+                return data
+            self._frame_ready.clear()
+            if len(self.frames):
+                continue
+            await self._frame_ready.wait()
+        return None
+
+    def stats(self):
+        return {
+            "dropped_frames": self.frames.dropped_frames,
+            "input_overflows": self.input_overflows,
+            "buffered_frames": len(self.frames),
+        }
+
+
+class ReplaySource(AudioSource):
+    """
+    Base for sources that replay recorded audio, either paced at real time or as fast
+    as the consumer reads. `tail_silence` seconds of zeros are appended so the
+    listening strategies reach their own end-of-turn silence before the audio runs out.
+    With an `analyzer`, each block is analyzed in one vectorized pass as it is read.
+    """
+    def __init__(self, realtime=True, tail_silence=5.0):
+        self.realtime = realtime
+        self.tail_silence = tail_silence
+        self.active = False
+        self.exhausted = False
+        self.frames_read = 0
+        self._frames = None
+        self._features = None
+        self._started_at = None
+
+    @abstractmethod
+    def samples(self):
+        # Yields int16 numpy arrays of any length.
+        pass
+
+    def _blocks(self):
+        # The audio as (n_frames, FRAME_SIZE) blocks, the last one zero-padded, then the tail silence
+        pending = np.empty(0, dtype=np.int16)
+        for block in self.samples():
+            pending = np.concatenate((pending, np.asarray(block, dtype=np.int16).ravel()))
+            n_frames = len(pending) // FRAME_SIZE
+            if n_frames:
+                yield pending[:n_frames * FRAME_SIZE].reshape(n_frames, FRAME_SIZE)
+                pending = pending[n_frames * FRAME_SIZE:]
+        if len(pending):
+            yield np.pad(pending, (0, FRAME_SIZE - len(pending))).reshape(1, FRAME_SIZE)
+        n_frames = int(self.tail_silence * 1000 / FRAME_DURATION_MS)
+        if n_frames:
+            yield np.zeros((n_frames, FRAME_SIZE), dtype=np.int16)
+
+    def _frame_iterator(self):
+        for block in self._blocks():
+            features = [None] * len(block)
+            if self.analyzer is not None:
+                features = [FrameFeatures._make(record) for record in self.analyzer.extract_many(block).tolist()]
+            for frame, frame_features in zip(block, features):
+                yield frame.tobytes(), frame_features
+
+    def start(self):
+        if self._frames is None:
+            self._frames = self._frame_iterator()
+        self._started_at = time.monotonic() - self.frames_read * FRAME_DURATION_MS / 1000
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    async def read_frame(self):
+        if not self.active or self.exhausted:
+            return None
+
+        if self.realtime:
+            due = self._started_at + (self.frames_read + 1) * FRAME_DURATION_MS / 1000
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)  # Let other coroutines run between frames
+
+        data, self._features = next(self._frames, (None, None))
+        if data is None:
+            self.exhausted = True
+            return None
+        self.frames_read += 1
+        return data
+
+    def frame_features(self):
+        return self._features
+
+    def stats(self):
+        return {"frames_read": self.frames_read, "exhausted": self.exhausted}
+
+
+class WavFileSource(ReplaySource):
+    """Replays a 16 kHz mono 16-bit WAV file, or a headerless PCM file of the same format."""
+    def __init__(self, path, realtime=True, tail_silence=5.0, block_frames=100):
+        super().__init__(realtime=realtime, tail_silence=tail_silence)
+        self.path = path
+        self.block_frames = block_frames
+
+    def samples(self):
+        block_size = self.block_frames * FRAME_SIZE
+        if str(self.path).lower().endswith(".wav"):
+            with wave.open(str(self.path), 'rb') as wf:
+                if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+                    raise ValueError(f"{self.path} must be mono 16-bit PCM at {SAMPLE_RATE} Hz.")
+                while True:
+                    data = wf.readframes(block_size)
+                    if not data:
+                        break
+                    yield np.frombuffer(data, dtype=np.int16)
+        else:
+            with open(self.path, 'rb') as f:
+                while True:
+                    data = f.read(block_size * self.sample_width)
+                    if not data:
+                        break
+                    yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+
+class IteratorSource(ReplaySource):
+    """Replays int16 audio from any iterable of bytes or numpy arrays, re-framed to FRAME_SIZE."""
+    def __init__(self, blocks, realtime=False, tail_silence=5.0):
+        super().__init__(realtime=realtime, tail_silence=tail_silence)
+        self.blocks = blocks
+
+    def samples(self):
+        for block in self.blocks:
+            if isinstance(block, (bytes, bytearray, memoryview)):
+                block = np.frombuffer(block, dtype=np.int16)
+            yield block
+
+
+class StreamSource(AudioSource):
+    """
+    Audio pushed in by the caller, e.g. PCM received from a network client.
+
+    `feed(pcm)` takes 16-bit mono PCM at SAMPLE_RATE in pieces of any size and
+    re-frames it; `finish()` marks the end of the stream. Audio fed between turns,
+    while nobody reads, is kept up to `capacity` frames. Feed and read on the same
+    event loop.
+
+    With an AudioOffload, the frames are kept in shared memory and analyzed in its
+    process pool: `read_frame` asks for the features of every buffered frame at
+    once, and hands the frames out as those come back.
+    """
+    def __init__(self, capacity=FRAME_BUFFER_CAPACITY, offload=None):
+        self.offload = offload
+        self.frames = offload.frame_ring(capacity) if offload else FrameRingBuffer(FRAME_SIZE, capacity=capacity)
+        self.active = False
+        self.exhausted = False
+        self.finished = False
+        self.frames_fed = 0
+        self._pending = bytearray()
+        self._frame_ready = asyncio.Event()
+        self._analysis = None  # (frame count, future of their features) being worked on by the pool
+        self._analyzed = deque()  # FrameFeatures of the next buffered frames, in order
+        self._features = None
+
+    def feed(self, pcm):
+        self._pending += pcm
+        frame_bytes = FRAME_SIZE * self.sample_width
+        while len(self._pending) >= frame_bytes:
+            self.frames.push(bytes(self._pending[:frame_bytes]))
+            del self._pending[:frame_bytes]
+            self.frames_fed += 1
+        self._frame_ready.set()
+
+    def finish(self):
+        self.finished = True
+        self._frame_ready.set()
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+        self._frame_ready.set()
+
+    async def read_frame(self):
+        while self.active:
+            if len(self.frames):
+                if self.offload is not None:
+                    # A worker reads the frame from the ring: it may only leave once analyzed
+                    if not self._analyzed:
+                        await self._collect_analysis()
+                    self._features = self._analyzed.popleft()
+                return self.frames.pop()
+            if self.finished:
+                self.exhausted = True
+                return None
+            self._frame_ready.clear()
+            await self._frame_ready.wait()
+        return None
+
+    async def _collect_analysis(self):
+        if self._analysis is None:
+            count = len(self.frames)
+            self._analysis = (count, self.offload.analyze(self.frames, self.frames.written - count, count))
+        count, analysis = self._analysis
+        try:
+            records = analysis.result() if analysis.done() else await asyncio.shield(analysis)
+        except (Exception, asyncio.CancelledError):
+            if not analysis.done():
+                raise  # This read was cancelled, not the analysis
+            records = None
+        self._analysis = None
+        if records is None:
+            # Pool failed or closed: AudioProcessor analyzes these frames itself
+            self._analyzed.extend([None] * count)
+        else:
+            self._analyzed.extend(FrameFeatures._make(record) for record in records.tolist())
+
+    def frame_features(self):
+        return self._features
+
+    def close(self):
+        if self.offload is not None:
+            if self._analysis is not None:
+                self._analysis[1].cancel()
+            self.frames.close()
+
+    def stats(self):
+        return {
+            "frames_fed": self.frames_fed,
+            "dropped_frames": self.frames.dropped_frames,
+            "buffered_frames": len(self.frames),
+        }
@@ -0,0 +1,149 @@
+import re
+import time
+import asyncio
+import traceback
+
+from .config import *
+from .audio_processor_async import UtteranceBuffer
+from .router import is_call_garvis
+
+
+class BargeInMonitor:
+    """
+    Keeps listening while the assistant speaks, so the user can interrupt it.
+
+    Capture stays open during playback. A frame counts as the user only if it is
+    voiced and louder than `echo_gain` times the player's recent output RMS, which
+    rejects the assistant's own voice coming back through the mic. After
+    `min_frames` such frames the phrase is collected until `silence_frames` of
+    silence and transcribed; if it is an interruption phrase (a keyword, or a stop
+    route in router.py), or as soon as speech is heard with `require_phrase=False`,
+    playback is flushed, the rest of the response is cancelled and a new listen
+    turn starts.
+    """
+    def __init__(self, garvis, echo_gain=BARGE_IN_ECHO_GAIN, min_frames=BARGE_IN_MIN_FRAMES,
+                 silence_frames=BARGE_IN_SILENCE_FRAMES, max_frames=BARGE_IN_MAX_FRAMES,
+                 phrases=BARGE_IN_PHRASES, require_phrase=True):
+        self.garvis = garvis
+        self.echo_gain = echo_gain
+        self.min_frames = min_frames
+        self.silence_frames = silence_frames
+        self.max_frames = max_frames
+        self.phrases = tuple(phrases) + (garvis.assistant_name.lower(),)
+        self.require_phrase = require_phrase
+        self.active = False
+        self._task = None
+
+        self.interruptions = 0
+        self.ignored_phrases = 0
+        self.echo_rejected = 0
+        self.onset_to_flush = []
+        self.phrase_end_to_flush = []
+
+    def start(self):
+        # Called when playback starts, from whichever loop runs the TTS stream
+        loop = self.garvis.audio_processor.loop
+        if loop is None or self.active:
+            return
+        self.active = True
+        asyncio.run_coroutine_threadsafe(self._start(), loop)
+
+    async def _start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.active = False
+
+    def is_interruption(self, text):
+        words = " " + " ".join(re.findall(r"[\w']+", text.lower())) + " "
+        return any(f" {phrase} " in words for phrase in self.phrases) or is_call_garvis(text)
+
+    async def run(self):
+        audio_processor = self.garvis.audio_processor
+        source = audio_processor.source
+        player = self.garvis.player
+        phrase = UtteranceBuffer()
+        voiced_run = silent_run = 0
+        onset = None
+        handed_over = False
+        source.start()
+        try:
+            while self.active and not audio_processor.listening:
+                frame = await source.read_frame()
+                if frame is None:
+                    break
+                features = source.frame_features() or audio_processor.features.extract(frame)
+                user = features.voiced and features.rms > self.echo_gain * player.output_rms
+                if features.voiced and not user:
+                    self.echo_rejected += 1
+
+                if onset is None:
+                    if not user:
+                        voiced_run = 0
+                        phrase.clear()
+                        continue
+                    if voiced_run == 0:
+                        speech_start = time.perf_counter()
+                    voiced_run += 1
+                    phrase.append(frame, features)
+                    if voiced_run >= self.min_frames:
+                        onset = speech_start
+                        silent_run = 0
+                        if not self.require_phrase:
+                            self.interrupt(onset, time.perf_counter())
+                            handed_over = True
+                            return
+                    continue
+
+                phrase.append(frame, features)
+                silent_run = 0 if user else silent_run + 1
+                if silent_run < self.silence_frames and phrase.duration * 1000 < self.max_frames * FRAME_DURATION_MS:
+                    continue
+
+                phrase_end = time.perf_counter()
+                text = await asyncio.to_thread(self.transcribe, phrase.detach())
+                if text and self.is_interruption(text):
+                    self.garvis.log(f"Barge-in: {text!r}")
+                    self.interrupt(onset, phrase_end)
+                    handed_over = True
+                    return
+                self.ignored_phrases += 1
+                self.garvis.log(f"Ignored speech during playback: {text!r}")
+                onset = None
+                voiced_run = 0
+        except Exception:
+            self.garvis.log(f"Barge-in monitor failed:\n{traceback.format_exc()}")
+        finally:
+            self.active = False
+            # After an interruption the listen turn is only scheduled, so it has not
+            # started the source yet; it must find it still capturing
+            if not audio_processor.listening and not handed_over:
+                source.stop()
+
+    def transcribe(self, phrase):
+        audio_processor = self.garvis.audio_processor
+        chunk = audio_processor.encoder.encode(phrase.samples, SAMPLE_RATE, audio_processor.source.sample_width)
+        return audio_processor.transcribe_audio(chunk)
+
+    def interrupt(self, onset, phrase_end):
+        flushed_at = self.garvis.interrupt()
+        self.interruptions += 1
+        self.onset_to_flush.append(flushed_at - onset)
+        self.phrase_end_to_flush.append(flushed_at - phrase_end)
+        # run() leaves the source capturing, and MicrophoneSource.start keeps an active
+        # capture, so the new turn picks up the frames that follow the phrase
+        asyncio.create_task(self.garvis.listen())
+
+    def stats(self):
+        player = self.garvis.player.stats()
+        flush_ms = player["avg_flush_to_silence_ms"] or 0.0
+        average = lambda values: 1000 * sum(values) / len(values) + flush_ms if values else None
+        return {
+            "interruptions": self.interruptions,
+            "ignored_phrases": self.ignored_phrases,
+            "echo_rejected_frames": self.echo_rejected,
+            "avg_onset_to_silence_ms": average(self.onset_to_flush),
+            "avg_phrase_end_to_silence_ms": average(self.phrase_end_to_flush),
+            "avg_flush_to_silence_ms": player["avg_flush_to_silence_ms"],
+        }
@@ -0,0 +1,165 @@
+import re
+import time
+import asyncio
+
+from abc import ABC, abstractmethod
+from .config import *
+
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s')
+CLAUSE_END = re.compile(r'[.!?,;:—)\]]+["\')\]]*\s')
+WORD_END = re.compile(r'\s')
+SPLITTERS = re.compile(r'[.,?!;:—\-()\[\] ]')
+
+
+def last_end(pattern, text):
+    end = 0
+    for match in pattern.finditer(text):
+        end = match.end()
+    return end
+
+
+class ChunkingPolicy(ABC):
+    """
+    Decides how much of the buffered LLM text goes to the TTS socket in the next message.
+
+    `cut()` is called whenever a token arrives or a deadline passes, and returns how
+    many characters to send now (0 to keep waiting). `deadline()` says how long the
+    buffer may sit before `cut()` should be asked again without a new token, so a
+    stalled token stream still gets flushed.
+    """
+    name = None
+
+    @abstractmethod
+    def cut(self, buffer, waited, first):
+        pass
+
+    def deadline(self, first):
+        return None
+
+
+class SplitterPolicy(ChunkingPolicy):
+    """The original behaviour: send up to the last splitter character, spaces included."""
+    name = "splitter"
+
+    def cut(self, buffer, waited, first):
+        return last_end(SPLITTERS, buffer)
+
+
+class SentencePolicy(ChunkingPolicy):
+    """Whole sentences only, unless the stream stalls for `max_wait` seconds."""
+    name = "sentence"
+
+    def __init__(self, max_wait=TTS_MAX_CHUNK_WAIT):
+        self.max_wait = max_wait
+
+    def cut(self, buffer, waited, first):
+        sentence = last_end(SENTENCE_END, buffer)
+        if sentence:
+            return sentence
+        if waited >= self.max_wait:
+            return last_end(WORD_END, buffer)
+        return 0
+
+    def deadline(self, first):
+        return self.max_wait
+
+
+class LatencyAwarePolicy(ChunkingPolicy):
+    """
+    Sends a short first chunk, up to a word boundary, as soon as `first_chars` characters
+    or `first_wait` seconds have built up, so audio starts early, then batches whole sentences, or
+    clauses once `min_chars` are buffered, for better prosody and fewer messages.
+    Past `max_chars` or `max_wait` seconds it falls back to the last word boundary.
+    """
+    name = "latency"
+
+    def __init__(self, first_chars=TTS_FIRST_CHUNK_CHARS, first_wait=TTS_FIRST_CHUNK_WAIT,
+                 min_chars=TTS_MIN_CHUNK_CHARS, max_chars=TTS_MAX_CHUNK_CHARS, max_wait=TTS_MAX_CHUNK_WAIT):
+        self.first_chars = first_chars
+        self.first_wait = first_wait
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.max_wait = max_wait
+
+    def cut(self, buffer, waited, first):
+        sentence = last_end(SENTENCE_END, buffer)
+        if first:
+            if sentence:
+                return sentence
+            if len(buffer) >= self.first_chars:
+                return last_end(WORD_END, buffer)
+            if waited >= self.first_wait:
+                return last_end(WORD_END, buffer)
+            return 0
+
+        if sentence:
+            return sentence
+        if len(buffer) >= self.min_chars and last_end(CLAUSE_END, buffer):
+            return last_end(CLAUSE_END, buffer)
+        if len(buffer) >= self.max_chars or waited >= self.max_wait:
+            return last_end(WORD_END, buffer)
+        return 0
+
+    def deadline(self, first):
+        return self.first_wait if first else self.max_wait
+
+
+CHUNKING_POLICIES = {
+    "splitter": SplitterPolicy,
+    "sentence": SentencePolicy,
+    "latency": LatencyAwarePolicy,
+}
+
+
+def create_chunking_policy(policy):
+    if isinstance(policy, ChunkingPolicy):
+        return policy
+    if policy not in CHUNKING_POLICIES:
+        raise ValueError(f"Unknown chunking policy {policy!r}. Choose one of {list(CHUNKING_POLICIES)}.")
+    return CHUNKING_POLICIES[policy]()
+
+
+async def chunk_text(chunks, policy):
+    # Regroups streamed text per `policy`. Each chunk ends in a single space, as ElevenLabs expects.
+    buffer = ""
+    first = True
+    started = None
+    iterator = chunks.__aiter__()
+    pending = None
+    try:
+        while True:
+            timeout = None
+            deadline = policy.deadline(first)
+            if buffer and deadline is not None:
+                remaining = started + deadline - time.perf_counter()
+                # Once a deadline has passed and the policy still waits, only a new token can help
+                timeout = remaining if remaining > 0 else None
+
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if pending in done:
+                try:
+                    text = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+                if not text:
+                    continue
+                if not buffer.strip():
+                    started = time.perf_counter()
+                buffer += text
+
+            cut = policy.cut(buffer, time.perf_counter() - started, first)
+            if cut and buffer[:cut].strip():
+                yield buffer[:cut].strip() + " "
+                buffer = buffer[cut:]
+                first = False
+                started = time.perf_counter()
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+    if buffer.strip():
+        yield buffer.strip() + " "
@@ -10,7 +10,9 @@ DEFAULT_TRANSCRIPTOR = "groq"
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
 VOICE_ID = 'eBbWyvt9h7JOW9HmCqZx'
 MODEL_ID = 'eleven_turbo_v2'
-WEBSOCKET_URI = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id={MODEL_ID}"
+TTS_OUTPUT_FORMAT = "pcm_16000"  # raw 16-bit mono PCM, played in-process without decoding
+TTS_SAMPLE_RATE = 16000  # must match TTS_OUTPUT_FORMAT
+WEBSOCKET_URI = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id={MODEL_ID}&output_format={TTS_OUTPUT_FORMAT}"
 
 # THRESHOLD_SILENCE = 1  # seconds of silence to detect end of speech
 THRESHOLD_SILENCE = 0.5 # seconds of silence to detect end of speech
@@ -18,5 +20,81 @@ FRAME_DURATION_MS = 30  # duration of each audio frame in milliseconds
 SAMPLE_RATE = 16000  # sample rate in Hz
 FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION_MS / 1000)  # frame size in samples
 SPEECH_THRESHOLD = 500  # amplitude threshold for speech detection
+VAD_ENERGY_GATE = 50  # frames with RMS below this are silence without asking webrtcvad
 MIN_AUDIO_LENGTH = 0.3  # minimum audio length in seconds
 RECORD_DURATION = 5  # duration of each audio recording in seconds
+FRAME_BUFFER_CAPACITY = 64  # frames kept between the capture callback and the listening loop (~2 s)
+
+TRANSCRIPTION_WORKERS = 4  # concurrent transcription requests per executor
+TRANSCRIPTION_QUEUE_SIZE = 8  # chunks allowed to wait for a transcription worker
+TRANSCRIPTION_OVERFLOW_POLICY = "block"  # "block", "drop_oldest" or "drop_newest" when the queue is full
+
+CHUNK_ENCODER = "wav"  # "wav", "flac" (lossless) or "opus" (lossy, smallest) for chunk uploads
+OPUS_COMPRESSION_LEVEL = 0.9  # 0 = highest Opus bitrate, 1 = lowest
+
+SPECULATION_DELAY = 0.2  # seconds after a chunk's transcript before speculating on the LLM response
+SPECULATION_CANCEL_FRAMES = 5  # consecutive voiced frames that mean the user kept talking
+
+TTS_KEEPALIVE_INTERVAL = 15  # seconds between keepalives on an idle TTS socket (ElevenLabs closes after 20 s)
+
+TTS_JITTER_BUFFER_MS = 60  # audio queued before playback of an utterance starts
+PLAYBACK_FRAMES_PER_BUFFER = 320  # output device buffer in samples (20 ms at 16 kHz)
+
+TTS_CACHE_DIR = "~/.cache/garvis/tts"  # content-addressed audio files for recurring phrases
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024  # least recently used entries are evicted beyond this
+
+TTS_CHUNKING_POLICY = "latency"  # how LLM text is batched into TTS messages: latency, sentence or splitter
+TTS_FIRST_CHUNK_CHARS = 24  # the first message goes out once this much text is buffered...
+TTS_FIRST_CHUNK_WAIT = 0.3  # ...or this many seconds after the first token, whichever comes first
+TTS_MIN_CHUNK_CHARS = 60  # later messages split at a clause only once this much text is buffered
+TTS_MAX_CHUNK_CHARS = 180  # past this, split at the last word boundary
+TTS_MAX_CHUNK_WAIT = 0.6  # seconds a partial batch may wait for more tokens
+
+PLAYBACK_LEVEL_WINDOW = 8  # device buffers of output level kept for echo gating (160 ms)
+BARGE_IN_ECHO_GAIN = 0.6  # during playback, mic frames must be louder than this times the output RMS to count as the user
+BARGE_IN_MIN_FRAMES = 5  # voiced frames that start an interruption phrase (150 ms)
+BARGE_IN_SILENCE_FRAMES = 10  # frames of silence that end it (300 ms)
+BARGE_IN_MAX_FRAMES = 100  # longest phrase checked (3 s)
+BARGE_IN_PHRASES = ("stop", "wait", "hold on", "pause", "enough", "be quiet", "shut up", "listen",
+                    "excuse me", "one moment", "one second", "hang on", "never mind")  # plus the assistant's name
+
+PHRASE_FUZZY_THRESHOLD = 0.8  # keyword stage: minimum similarity to a route utterance
+PHRASE_EMBEDDING_THRESHOLD = 0.75  # embedding stage: minimum cosine similarity
+PHRASE_INDEX_DIR = "~/.cache/garvis/phrases"  # persisted utterance vectors
+
+HISTORY_TOKEN_BUDGET = 1500  # estimated tokens of past turns sent verbatim before older ones are summarized
+HISTORY_KEEP_RECENT = 4  # messages always kept verbatim (the last two exchanges)
+HISTORY_SUMMARY_TOKENS = 150  # length limit of the rolling summary
+
+LLM_CACHE_MAX_ENTRIES = 256  # cached answers kept by CachedLLM (least recently used evicted)
+LLM_CACHE_TTL = 3600  # seconds before a cached answer expires
+LLM_CACHE_WINDOW = 3  # trailing conversation messages that must match for a hit
+
+LLM_HEDGE_DELAY = 0.5  # seconds without a first token from the primary LLM before HedgedLLM also asks the secondary
+
+LLM_FAST_MODEL = "llama3-8b-8192"  # RoutedLLM: model for simple turns
+LLM_STRONG_MODEL = "llama3-70b-8192"  # RoutedLLM: model for turns scored as complex
+LLM_ROUTE_THRESHOLD = 0.5  # complexity score from which a turn goes to the strong model
+
+INTENT_DEBOUNCE = 0.1  # seconds to wait for more transcript before classifying the end of a turn
+INTENT_CACHE_SIZE = 256  # classified transcripts remembered (least recently used evicted)
+
+EVENT_QUEUE_SIZE = 256  # undelivered events kept per subscriber; the oldest droppable ones are dropped beyond this
+EVENT_DROPPABLE = ("log", "audio_power")  # events a full queue may drop; all others are always delivered
+EVENT_LAG_WINDOW = 1000  # recent deliveries kept for each subscriber's lag percentiles
+EVENT_COALESCE = {"audio_power": "latest", "transcription_partial": "latest", "llm_update": "batch"}  # for the on_* callbacks
+
+TRACE_ENABLED = True  # per-turn stage timestamps and latency histograms (a dict write per stage)
+TRACE_PATH = None  # e.g. "~/.cache/garvis/turns.jsonl" to export every turn as a JSON line
+
+SERVER_HOST = "127.0.0.1"  # server.py: interface the websocket endpoint binds to
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 64  # concurrent conversations; further connections are refused
+SERVER_TRANSCRIPTION_WORKERS = 16  # transcription threads shared by all sessions
+SERVER_EVENTS = ("transcription_start", "transcription_stop", "transcription_update", "llm_start", "llm_update",
+                 "llm_stop", "tts_start", "tts_stop", "turn_trace")  # events forwarded to clients as JSON
+SERVER_PROCESSES = 1  # server processes sharing the port (SO_REUSEPORT), one GIL each
+SERVER_AUDIO_OFFLOAD = 0  # processes for the sessions' frame analysis and chunk encoding (AudioOffload); 0 keeps them in the server
+
+AUDIO_OFFLOAD_BATCH_MS = 5  # analysis requests of all sessions gathered this long into one job per worker
+AUDIO_OFFLOAD_ATTACHED = 256  # shared frame rings a worker keeps mapped (least recently used let go)
@@ -3,17 +3,28 @@ import json, time
 import asyncio
 import base64
 import websockets
-import subprocess
 
 from groq import Groq as Groqq
 from openai import OpenAI as OpenAII
 
 from .audio_processor_async import AudioProcessor
+from .audio_source import AudioSource
+from .speculation import SpeculativeResponder
+from .tts import TTSConnectionManager
+from .playback import PCMPlayer
+from .chunking import create_chunking_policy
+from .barge_in import BargeInMonitor
+from .history import ConversationHistory
+from .worker import ResponseWorker
+from .transcription import TranscriptionExecutor
+from .events import EventBus
+from .tracing import Tracer
+from .tts_cache import TTSCache, SentenceAligner, PendingSentence
 from .listening_strategy import *
 from .config import *
 from .listening_strategy import *
 from .llm import *
-from .utils import websocker_text_iterator, create_mpv_process
+from .utils import websocker_text_iterator, sentence_iterator
 
 class Garvis:
     def __init__(self, 
@@ -21,127 +32,189 @@ class Garvis:
                  llm: LLM = AsyncOpenAI(),
                  listening_strategy: ListeningStrategy = None, 
                  transcriptor=DEFAULT_TRANSCRIPTOR, 
+                 audio_source: AudioSource = None,
+                 chunk_encoder=CHUNK_ENCODER,
+                 speculative: bool = False,
+                 tts_manager: TTSConnectionManager = None,
+                 player: PCMPlayer = None,
+                 tts_cache: TTSCache = None,
+                 chunking_policy=TTS_CHUNKING_POLICY,
+                 barge_in: bool = False,
+                 history: ConversationHistory = None,
+                 events: EventBus = None,
+                 tracer: Tracer = None,
+                 worker: ResponseWorker = None,
+                 transcription_executor: TranscriptionExecutor = None,
                  verbose: bool = False):
         self.assistant_name = assistant_name
         self.llm = llm
+        self.verbose = verbose
+        # Producers only publish; handlers, including the on_* callbacks below, run on their subscriber's thread or loop
+        self.events = events or EventBus()
+        self.tracer = tracer or Tracer(log=self.log)
+        self.tracer.on_turn = lambda record: self.events.publish("turn_trace", record)
         strategy = listening_strategy or ContinuousUntilSilenceStrategy(verbose=verbose)
-        self.audio_processor = AudioProcessor(self, strategy=strategy, verbose=verbose, transcriptor=transcriptor)
+        self.audio_processor = AudioProcessor(self, strategy=strategy, verbose=verbose, transcriptor=transcriptor, source=audio_source,
+                                              transcription_executor=transcription_executor, encoder=chunk_encoder)
         self.collected_text = []
-        self.history = []
         self.transcription_lock = threading.Lock()
         self.current_user_message = None
-        self.mpv_process = None
+        self.player = player or PCMPlayer()
+        self.player.on_first_sample = lambda turn_id: self.trace("first_sample", turn_id)
         self.stop_streaming = False
-        self.verbose = verbose
         self.llm = llm
         self.system_message = get_system_message(self.assistant_name)
+        # LLM requests, TTS sockets and speculation all live on this one loop, so connections are reused across turns
+        self.worker = worker or ResponseWorker(log=self.log)
+        self.speculation = SpeculativeResponder(self) if speculative else None
+        if self.speculation:
+            self.speculation.loop = self.worker.loop
+        self.tts = tts_manager or TTSConnectionManager(log=self.log, loop=self.worker.loop)
+        self.tts_cache = tts_cache
+        self.chunking_policy = create_chunking_policy(chunking_policy)
+        self.barge_in = BargeInMonitor(self) if barge_in else None
+        self.turn = 0
+        self.history = history or ConversationHistory(llm=llm, log=self.log)
+        self.history.loop = self.history.loop or self.worker.loop
 
         self.on_log = None
         self.on_transcription_start = None
         self.on_transcription_stop = None
         self.on_transcription_update = None
+        self.on_transcription_partial = None
         self.on_llm_update = None
         self.on_llm_start = None
         self.on_llm_stop = None
         self.on_tts_stop = None
         self.on_tts_start = None
         self.audio_processor.on_audio_power = self.on_audio_power
+        self.callbacks = self.events.subscribe(self.dispatch_callback, coalesce=EVENT_COALESCE, name="callbacks")
+
+    def dispatch_callback(self, event):
+        # Bridges bus events to the on_* attributes; audio power keeps its home on the audio processor
+        if event.name == "audio_power":
+            callback = self.audio_processor.on_audio_power
+        else:
+            callback = getattr(self, f"on_{event.name}", None)
+        if callback:
+            callback(*event.args)
 
     def log(self, message):
-        if self.on_log and self.verbose:
-            self.on_log(message)
+        if self.verbose:
+            self.events.publish("log", message)
+
+    def trace(self, stage, turn_id, at=None):
+        # Marks a stage of the turn a response belongs to; fixed phrases (speak) belong to none
+        if turn_id is not None:
+            self.tracer.mark(stage, at, turn_id=turn_id)
 
     def transcription_start(self):
-        if self.on_transcription_start:
-            self.on_transcription_start()
+        self.tracer.begin_turn()
+        self.events.publish("transcription_start")
 
     def transcription_stop(self):
-        asyncio.create_task(self.process_collected_text())
+        turn_id = self.tracer.turn_id
+        self.tracer.mark("transcription_stop", turn_id=turn_id)
+        asyncio.create_task(self.process_collected_text(turn_id))
         # To stop the ongoing TTS if any
         self.stop_tts()
-        if self.on_transcription_stop:
-            self.on_transcription_stop()
+        self.events.publish("transcription_stop")
+
+    def transcription_update(self, index, text, final=True):
+        if not final:
+            # Partial transcript of a chunk still being transcribed; the final update replaces it
+            self.events.publish("transcription_partial", index, text)
+            return
 
-    def transcription_update(self, index, text):
         # Append transcription to collected text
         with self.transcription_lock:
+            # Chunks arrive in index order from the transcription executor
             self.collected_text.append({"index": index, "text": text})
-            self.collected_text.sort(key=lambda x: x["index"])
                         
-            if self.on_transcription_update:
-                self.on_transcription_update(index, text)
-                # asyncio.create_task(self.on_transcription_update(index, text))                
+            self.events.publish("transcription_update", index, text)
+
+        if self.speculation:
+            self.speculation.schedule(self.collected_transcript())
+
+    def speech_resumed(self):
+        # The user kept talking after a chunk boundary; any speculation is now stale
+        if self.speculation:
+            self.worker.call_soon(self.speculation.cancel)
 
     def llm_update(self, text):
-        if self.on_llm_update:
-            self.on_llm_update(text)
+        self.events.publish("llm_update", text)
         
     def llm_start(self):
-        if self.on_llm_start:
-            self.on_llm_start()
+        self.events.publish("llm_start")
             
     def llm_stop(self):
-        if self.on_llm_stop:
-            self.on_llm_stop()
+        self.events.publish("llm_stop")
             
     def tts_start(self):
-        if self.on_tts_start:
-            self.on_tts_start()
+        if self.barge_in:
+            self.barge_in.start()
+        self.events.publish("tts_start")
 
     def tts_stop(self):
-        if self.on_tts_stop:
-            self.on_tts_stop()
+        if self.barge_in:
+            self.barge_in.stop()
+        self.events.publish("tts_stop")
 
     def on_audio_power(self, power):
         # Implement this in the consuming class if needed
         pass
 
-    async def process_collected_text(self):
+    def collected_transcript(self):
         with self.transcription_lock:
-            all_text = ", ".join([chunk["text"].strip() for chunk in self.collected_text])
-        
-        await self.get_llm_response(all_text)
+            return ", ".join([chunk["text"].strip() for chunk in self.collected_text])
+
+    async def process_collected_text(self, turn_id=None):
+        all_text = self.collected_transcript()
+        if not all_text.strip():
+            # Nothing but silence or noise: no LLM call, and no turn in the latency stats
+            self.log("Nothing was transcribed. Not responding.")
+            self.tracer.discard_turn(turn_id)
+            return
+
+        await self.get_llm_response(all_text, turn_id)
 
     def stop_talking(self, raise_event=False):
-        self.restart_mpv(raise_event=raise_event)
-        # self.stop_tts(raise_event=raise_event)
-        
-    def stop_tts(self, raise_event=True):
-        if self.mpv_process and self.mpv_process.poll() is None:
-            # self.stop_streaming = True
-            self.mpv_process.terminate()  # Send a SIGTERM signal to the process
-            try:
-                self.mpv_process.wait(timeout=2)  # Wait for the process to terminate
-            except subprocess.TimeoutExpired:
-                self.mpv_process.kill()  # Force kill if it does not terminate in time
-            finally:
-                self.mpv_process = None
-                
-    
-    def restart_mpv(self, raise_event=True):
         self.stop_tts(raise_event=raise_event)
-        time.sleep(0.1)
+        
+    def stop_tts(self, raise_event=False):
+        # Drops whatever is queued for playback and cancels the rest of the current response.
+        # Returns when playback was flushed.
+        self.turn += 1
+        flushed_at = self.player.flush()
+        self.worker.cancel()
+        if self.speculation:
+            self.worker.call_soon(self.speculation.abandon)
         raise_event and self.tts_stop()
+        return flushed_at
+
+    def interrupt(self):
+        # Barge-in: silence playback now and abandon the rest of the current response
+        return self.stop_tts()
 
-    async def text_to_speech_input_streaming(self, text_iterator):
-        async with websockets.connect(WEBSOCKET_URI) as websocket:
-            await websocket.send(json.dumps({
-                "text": " ",
-                "voice_settings": {"stability": 0.5, "similarity_boost": 0.8},
-                "xi_api_key": ELEVENLABS_API_KEY,
-            }))
+    async def text_to_speech_input_streaming(self, text_iterator, turn_id=None):
+        if self.tts_cache:
+            return await self.text_to_speech_cached(text_iterator, turn_id=turn_id)
 
+        connection = await self.tts.acquire()
+        self.log(f"TTS socket acquired ({'warm' if connection.warm else 'cold'}).")
+        listen_task = None
+        try:
             async def listen():
                 first_chunk = True
                 while True:
                     try:
-                        message = await websocket.recv()
+                        message = await connection.recv()
                         data = json.loads(message)
                         if data.get("audio"):
                             if first_chunk:
                                 first_chunk = False
-                                if self.on_tts_start:
-                                    self.on_tts_start()
+                                self.trace("tts_first_audio", turn_id)
+                                self.tts_start()
                             audio_data = base64.b64decode(data["audio"])
                             yield audio_data
                         elif data.get('isFinal'):
@@ -151,79 +224,230 @@ class Garvis:
                         break
 
             async def stream(audio_stream):
-                self.mpv_process = create_mpv_process()
+                generation = self.player.begin(turn_id)
                 self.log("Started streaming audio")
-                
-                # if mvp process is None wait a bit
-                if not self.mpv_process:
-                    await asyncio.sleep(0.5)
-                    
-                if not self.mpv_process:
-                    self.log("Failed to start mpv process")
-                    return
-                
+
                 async for chunk in audio_stream:
-                    if chunk:
-                        try:
-                            if not self.mpv_process:
-                                break
-                            self.mpv_process.stdin.write(chunk)
-                            self.mpv_process.stdin.flush()
-                        except BrokenPipeError:
-                            break
+                    if chunk and not self.player.write(chunk, generation):
+                        break
 
-                try:
-                    if self.mpv_process:
-                        if self.mpv_process.stdin:
-                            self.mpv_process.stdin.close()
-                        self.mpv_process.wait()
-                        
-                except Exception as e:
-                    pass
-                finally:
-                    self.restart_mpv()
+                if self.player.generation == generation:
+                    self.player.end()
+                    await self.player.drain()
+                self.log(f"Playback stats: {self.player.stats()}")
+                self.tts_stop()
 
             listen_task = asyncio.create_task(stream(listen()))
 
-            async for text in websocker_text_iterator(text_iterator):
-                await websocket.send(json.dumps({"text": text, "try_trigger_generation": True}))
+            async for text in websocker_text_iterator(text_iterator, self.chunking_policy):
+                await connection.send({"text": text, "try_trigger_generation": True})
+                self.trace("tts_first_send", turn_id)
 
-            await websocket.send(json.dumps({"text": ""}))
+            await connection.send({"text": ""})
 
             await listen_task
+        finally:
+            await connection.close()
+            if listen_task is not None and not listen_task.done():
+                # Cancelled mid-response
+                listen_task.cancel()
+                self.tts_stop()
 
-    async def get_llm_response(self, text):
-        self.history.append({"role": "user", "content": text})
+    async def speak(self, text):
+        # Says a fixed phrase (greeting, confirmation, ...), straight from the TTS cache when possible
+        async def utterance():
+            yield text
 
-        def llm_task():
-            asyncio.run(self.process_llm_response())
+        if self.tts_cache:
+            await self.text_to_speech_cached(utterance(), utterance=text)
+        else:
+            await self.text_to_speech_input_streaming(utterance())
 
-        threading.Thread(target=llm_task).start()
+    async def text_to_speech_cached(self, text_iterator, utterance=None, turn_id=None):
+        # Plays cached sentences from disk and synthesizes only the misses, in order.
+        # The socket is opened on the first miss, so a fully cached reply needs no network.
+        cache = self.tts_cache
+        segments = asyncio.Queue()
+        parts = []
+        aligner = SentenceAligner(on_sentence=lambda sentence: cache.put(sentence.text, sentence.audio))
+        connection = None
+        receiver = None
 
-    async def process_llm_response(self):
-        # self.history.append({"role": "user", "content": text})
-        stream = await self.llm.acompletion(
-            messages=[
-                {"role": "system", "content": self.system_message},
-                *self.history
-            ],
-        )
+        async def receive():
+            while True:
+                try:
+                    data = json.loads(await connection.recv())
+                except websockets.exceptions.ConnectionClosed:
+                    self.log("Connection closed")
+                    break
+                if data.get("audio"):
+                    aligner.feed(base64.b64decode(data["audio"]), data.get("alignment"))
+                elif data.get("isFinal"):
+                    break
+            aligner.close()
+
+        async def play():
+            generation = self.player.begin(turn_id)
+            started = False
+            while True:
+                segment = await segments.get()
+                if segment is None:
+                    break
+                chunks = segment.chunks if isinstance(segment, PendingSentence) else None
+                while True:
+                    audio = segment if chunks is None else await chunks.get()
+                    if audio is None:
+                        break
+                    if not started:
+                        started = True
+                        self.trace("tts_first_audio", turn_id)
+                        self.tts_start()
+                    if not self.player.write(audio, generation):
+                        return
+                    if chunks is None:
+                        break
+
+            if self.player.generation == generation:
+                self.player.end()
+                await self.player.drain()
+            self.log(f"Playback stats: {self.player.stats()}, TTS cache: {cache.stats()}")
+            self.tts_stop()
+
+        player_task = asyncio.create_task(play())
+        try:
+            audio = cache.get(utterance) if utterance else None
+            if audio is not None:
+                segments.put_nowait(audio)
+                parts.append(audio)
+            else:
+                async for sentence in sentence_iterator(text_iterator):
+                    audio = cache.get(sentence)
+                    if audio is not None:
+                        segments.put_nowait(audio)
+                        parts.append(audio)
+                        continue
+                    if connection is None:
+                        connection = await self.tts.acquire()
+                        self.log(f"TTS socket acquired ({'warm' if connection.warm else 'cold'}).")
+                        receiver = asyncio.create_task(receive())
+                    pending = aligner.add(sentence)
+                    segments.put_nowait(pending)
+                    parts.append(pending)
+                    await connection.send({"text": sentence + " ", "flush": True})
+                    self.trace("tts_first_send", turn_id)
+            segments.put_nowait(None)
+
+            if connection is not None:
+                await connection.send({"text": ""})
+                await receiver
+            await player_task
+
+            if utterance and len(parts) > 1 and all(not isinstance(part, PendingSentence) or part.cacheable for part in parts):
+                cache.put(utterance, b"".join(part.audio if isinstance(part, PendingSentence) else part for part in parts))
+        finally:
+            if connection is not None:
+                await connection.close()
+            if not player_task.done():
+                # Cancelled mid-response
+                player_task.cancel()
+                self.tts_stop()
+            for part in parts:
+                if not isinstance(part, PendingSentence):
+                    part.close()
+
+    def build_messages(self, text=None):
+        messages = [{"role": "system", "content": self.system_message}, *self.history.messages()]
+        if text is not None:
+            messages.append({"role": "user", "content": text})
+        return messages
+
+    async def get_llm_response(self, text, turn_id=None):
+        # Open the TTS socket while the LLM works on the first token
+        self.tts.prewarm()
+        # A new turn supersedes whatever response is still running
+        self.worker.cancel()
+        return self.worker.submit(self.respond, text, turn_id)
+
+    async def respond(self, text, turn_id=None):
+        # Runs on the worker loop; `turn_id` is the traced turn this answers, if any
+        speculative_stream = self.speculation.take(text) if self.speculation else None
+        self.history.append({"role": "user", "content": text})
+        if speculative_stream:
+            self.log("Speculative response committed.")
+        try:
+            await self.process_llm_response(speculative_stream, turn_id)
+        finally:
+            if turn_id is not None:
+                self.tracer.end_turn(turn_id)
+
+    async def process_llm_response(self, stream=None, turn_id=None):
+        messages = self.build_messages()
+        self.log(f"Prompt: ~{self.history.record_prompt(messages)} tokens.")
+        start = time.perf_counter()
+        # A speculative stream was requested earlier; this marks when the turn committed to it
+        self.trace("llm_request", turn_id, start)
+        if stream is None:
+            stream = await self.llm.acompletion(
+                messages=messages,
+            )
 
         self.llm_start()
 
+        turn = self.turn
+        chunks = []
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            self.history.append({"role": "assistant", "content": "".join(chunks)})
+            self.llm_stop()
+            # Summarize old turns now, while the reply is being spoken
+            self.history.compact()
+
         async def text_iterator():
-            chunks = []
             async for chunk in stream:
+                if self.turn != turn:
+                    self.log("Response interrupted.")
+                    await close_stream(stream)
+                    break
                 response_text = chunk.choices[0].delta.content
                 if response_text:
+                    if not chunks:
+                        self.trace("first_token", turn_id)
+                        self.log(f"Time to first token: {1000 * (time.perf_counter() - start):.0f} ms.")
                     self.llm_update(response_text)
                     chunks.append(response_text)
                     yield response_text
-            self.history.append({"role": "assistant", "content": " ".join(chunks)})
-            self.llm_stop()
+            finish()
 
-        await self.text_to_speech_input_streaming(text_iterator())
+        try:
+            await self.text_to_speech_input_streaming(text_iterator(), turn_id)
+        finally:
+            # Also on cancellation, so history keeps what was said
+            finish()
+
+    async def close(self):
+        # Releases the session's threads, sockets and audio devices. Call from outside the worker loop.
+        self.audio_processor.listening = False
+        self.stop_tts()
+        await self.tts.close()
+        # An async LLM client's connections belong to the worker loop, so close them before it goes.
+        # A shared loop (and the LLM on it) outlives the session.
+        close_client = getattr(getattr(self.llm, "client", None), "close", None)
+        if self.worker.owns_loop and asyncio.iscoroutinefunction(close_client):
+            await self.worker.run(close_client())
+        self.worker.stop()
+        self.audio_processor.transcription_executor.close()
+        self.audio_processor.source.close()
+        self.player.close()
+        self.events.close()
 
     async def listen(self):
         self.collected_text = []
+        self.tts.prewarm()
+        if self.speculation:
+            self.worker.call_soon(self.speculation.cancel)
         await self.audio_processor.toggle_listen()
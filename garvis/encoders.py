@@ -0,0 +1,127 @@
+import io
+import time
+import wave
+import threading
+
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from .config import *
+
+EncodedChunk = namedtuple("EncodedChunk", ["file", "filename", "mime_type"])
+
+
+class ChunkEncoder(ABC):
+    """
+    Turns an int16 sample view into an in-memory upload for the transcription
+    backends, and keeps running totals of bytes saved and time spent encoding.
+    """
+    name = None
+    extension = None
+    mime_type = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.encode_seconds = 0.0
+
+    @abstractmethod
+    def write(self, in_memory_file, samples, sample_rate, sample_width):
+        pass
+
+    def encode(self, samples, sample_rate=SAMPLE_RATE, sample_width=2):
+        in_memory_file = io.BytesIO()
+        start = time.perf_counter()
+        self.write(in_memory_file, samples, sample_rate, sample_width)
+        elapsed = time.perf_counter() - start
+        in_memory_file.seek(0)
+
+        with self._lock:
+            self.chunks += 1
+            self.raw_bytes += samples.nbytes
+            self.encoded_bytes += in_memory_file.getbuffer().nbytes
+            self.encode_seconds += elapsed
+        return EncodedChunk(in_memory_file, f"audio.{self.extension}", self.mime_type)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "encoder": self.name,
+                "chunks": self.chunks,
+                "raw_bytes": self.raw_bytes,
+                "encoded_bytes": self.encoded_bytes,
+                "bytes_saved": self.raw_bytes - self.encoded_bytes,
+                "compression_ratio": self.raw_bytes / self.encoded_bytes if self.encoded_bytes else 0.0,
+                "avg_encode_ms": 1000 * self.encode_seconds / self.chunks if self.chunks else 0.0,
+            }
+
+
+class WavEncoder(ChunkEncoder):
+    name = "wav"
+    extension = "wav"
+    mime_type = "audio/wav"
+
+    def write(self, in_memory_file, samples, sample_rate, sample_width):
+        wf = wave.open(in_memory_file, 'wb')
+        wf.setnchannels(1)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples)
+        wf.close()
+
+
+class SoundFileEncoder(ChunkEncoder):
+    # FLAC and Opus go through libsndfile, which is an optional dependency.
+    format = None
+    subtype = None
+
+    def __init__(self, **options):
+        super().__init__()
+        try:
+            import soundfile
+        except ImportError:
+            raise ImportError(
+                f"The '{self.name}' chunk encoder needs the soundfile package. "
+                "Install it with: pip install soundfile"
+            )
+        self._soundfile = soundfile
+        self.options = options
+
+    def write(self, in_memory_file, samples, sample_rate, sample_width):
+        self._soundfile.write(in_memory_file, samples, sample_rate, format=self.format, subtype=self.subtype, **self.options)
+
+
+class FlacEncoder(SoundFileEncoder):
+    name = "flac"
+    extension = "flac"
+    mime_type = "audio/flac"
+    format = "FLAC"
+    subtype = "PCM_16"
+
+
+class OpusEncoder(SoundFileEncoder):
+    name = "opus"
+    extension = "ogg"
+    mime_type = "audio/ogg"
+    format = "OGG"
+    subtype = "OPUS"
+
+    def __init__(self, compression_level=OPUS_COMPRESSION_LEVEL, **options):
+        # compression_level runs from 0 (highest bitrate) to 1 (lowest bitrate)
+        super().__init__(compression_level=compression_level, **options)
+
+
+ENCODERS = {
+    "wav": WavEncoder,
+    "flac": FlacEncoder,
+    "opus": OpusEncoder,
+}
+
+
+def create_encoder(encoder):
+    if isinstance(encoder, ChunkEncoder):
+        return encoder
+    if encoder not in ENCODERS:
+        raise ValueError(f"Unknown chunk encoder {encoder!r}. Choose one of {list(ENCODERS)}.")
+    return ENCODERS[encoder]()
@@ -0,0 +1,202 @@
+import time
+import asyncio
+import threading
+import traceback
+
+from collections import deque, namedtuple
+from .config import *
+from .metrics import latency_summary
+
+Event = namedtuple("Event", ["name", "args", "published_at"])
+
+
+class Subscription:
+    """
+    One subscriber of an EventBus: a bounded queue and the handler it feeds.
+
+    `handler(event)` runs on `loop` if given (coroutine handlers are awaited in
+    order), otherwise on a thread of its own, never on the publisher's thread.
+    `coalesce` maps event names to "latest" (a queued event of that name is
+    overwritten by newer values, e.g. audio power) or "batch" (consecutive events
+    of that name are merged into one by concatenating their first argument, e.g.
+    LLM tokens). When the queue is full the oldest `droppable` event (log lines,
+    audio power) is dropped to make room. Other events, such as the start and end
+    of a transcription, are never dropped: the queue grows past `maxsize` instead.
+    """
+    def __init__(self, handler, events=None, loop=None, maxsize=EVENT_QUEUE_SIZE, coalesce=None, name=None, log=None,
+                 droppable=EVENT_DROPPABLE):
+        self.handler = handler
+        self.events = set(events) if events else None
+        self.loop = loop
+        self.maxsize = maxsize
+        self.coalesce = coalesce or {}
+        self.droppable = set(droppable)
+        self.name = name or getattr(handler, "__qualname__", repr(handler))
+        self.log = log or (lambda message: None)
+        self._queue = deque()  # [name, args, published_at] entries, mutable for coalescing
+        self._latest = {}  # name -> its queued entry, for "latest" events
+        self._cond = threading.Condition()
+        self._scheduled = False
+        self.closed = False
+
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.lag_seconds = deque(maxlen=EVENT_LAG_WINDOW)
+
+        self._thread = None
+        if loop is None:
+            self._thread = threading.Thread(target=self._run, name=f"garvis-events-{self.name}", daemon=True)
+            self._thread.start()
+
+    def wants(self, name):
+        return self.events is None or name in self.events
+
+    def offer(self, name, args, published_at):
+        # Called by the publisher: never blocks on the handler
+        mode = self.coalesce.get(name)
+        with self._cond:
+            if self.closed:
+                return
+            if mode == "latest" and name in self._latest:
+                self._latest[name][1] = args
+                self.coalesced += 1
+                return
+            if mode == "batch" and self._queue and self._queue[-1][0] == name:
+                last = self._queue[-1]
+                last[1] = (last[1][0] + args[0],) + tuple(args[1:])
+                self.coalesced += 1
+                return
+            if len(self._queue) >= self.maxsize:
+                index = next((i for i, entry in enumerate(self._queue) if entry[0] in self.droppable), None)
+                if index is not None:
+                    self._forget(self._queue[index])
+                    del self._queue[index]
+                    self.dropped += 1
+                elif name in self.droppable:
+                    self.dropped += 1
+                    return
+            entry = [name, args, published_at]
+            self._queue.append(entry)
+            if mode == "latest":
+                self._latest[name] = entry
+            self.max_depth = max(self.max_depth, len(self._queue))
+            if self._thread is not None:
+                self._cond.notify()
+                return
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self._schedule)
+
+    def _forget(self, entry):
+        if self._latest.get(entry[0]) is entry:
+            del self._latest[entry[0]]
+
+    def _pop(self):
+        entry = self._queue.popleft()
+        self._forget(entry)
+        self.lag_seconds.append(time.perf_counter() - entry[2])
+        return Event(*entry)
+
+    def _deliver(self, event):
+        try:
+            return self.handler(event)
+        except Exception:
+            self.failed += 1
+            self.log(f"Event handler {self.name} failed on {event.name}:\n{traceback.format_exc()}")
+        finally:
+            self.delivered += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                event = self._pop()
+            self._deliver(event)
+
+    def _schedule(self):
+        asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        while True:
+            with self._cond:
+                if not self._queue or self.closed:
+                    self._scheduled = False
+                    return
+                event = self._pop()
+            result = self._deliver(event)
+            if asyncio.iscoroutine(result):
+                try:
+                    await result
+                except Exception:
+                    self.failed += 1
+                    self.log(f"Event handler {self.name} failed on {event.name}:\n{traceback.format_exc()}")
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._queue.clear()
+            self._latest.clear()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+            lags = list(self.lag_seconds)
+        return {
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queued": depth,
+            "max_depth": self.max_depth,
+            **latency_summary(lags, "lag_"),
+        }
+
+
+class EventBus:
+    """
+    Fan-out of Garvis events (transcription, LLM, TTS, audio power, log) to
+    subscribers. `publish()` is safe from any thread and only appends to each
+    subscriber's queue, so a slow handler delays its own events but never the
+    capture loop, the transcription threads or the response worker.
+    """
+    def __init__(self, log=None):
+        self.log = log or (lambda message: None)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, handler, events=None, loop=None, maxsize=EVENT_QUEUE_SIZE, coalesce=None, name=None,
+                  droppable=EVENT_DROPPABLE):
+        subscription = Subscription(handler, events, loop, maxsize, coalesce, name, self.log, droppable)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+        subscription.close()
+
+    def publish(self, name, *args):
+        published_at = time.perf_counter()
+        self.published += 1
+        for subscription in self._subscribers:
+            if subscription.wants(name):
+                subscription.offer(name, args, published_at)
+
+    def close(self):
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscription in subscribers:
+            subscription.close()
+
+    def stats(self):
+        return {subscription.name: subscription.stats() for subscription in self._subscribers}
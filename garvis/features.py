@@ -0,0 +1,61 @@
+import math
+import numpy as np
+
+from collections import namedtuple
+from .config import *
+
+FrameFeatures = namedtuple("FrameFeatures", ["rms", "peak", "voiced"])
+
+# Compact per-frame record kept alongside the utterance samples (7 bytes per 30 ms frame).
+FEATURES_DTYPE = np.dtype([("rms", np.float32), ("peak", np.int16), ("voiced", np.bool_)])
+
+
+class FrameFeatureExtractor:
+    """
+    Computes energy, peak and the VAD decision for a frame in one pass, so power
+    metering, speech gating and chunking all read the same numbers instead of
+    re-scanning the audio. Frames whose RMS is below `energy_gate` are treated as
+    silence without calling webrtcvad.
+    """
+    def __init__(self, vad, sample_rate=SAMPLE_RATE, energy_gate=VAD_ENERGY_GATE):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.energy_gate = energy_gate
+        self.frames = 0
+        self.vad_calls = 0
+
+    def extract(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16)
+        as_float = samples.astype(np.float32)
+        rms = math.sqrt(float(np.dot(as_float, as_float)) / len(samples)) if len(samples) else 0.0
+        peak = max(int(samples.max()), -int(samples.min())) if len(samples) else 0
+
+        self.frames += 1
+        voiced = False
+        if rms >= self.energy_gate:
+            self.vad_calls += 1
+            voiced = self.vad.is_speech(frame, self.sample_rate)
+        return FrameFeatures(rms, min(peak, 32767), voiced)
+
+    def extract_many(self, frames):
+        # Energy and peak for a (n_frames, FRAME_SIZE) int16 block in one vectorized pass;
+        # the VAD still runs per frame, and only on frames above the energy gate.
+        frames = np.asarray(frames, dtype=np.int16).reshape(-1, FRAME_SIZE)
+        as_float = frames.astype(np.float32)
+        features = np.empty(len(frames), dtype=FEATURES_DTYPE)
+        features["rms"] = np.sqrt(np.einsum("ij,ij->i", as_float, as_float) / FRAME_SIZE)
+        features["peak"] = np.minimum(np.maximum(frames.max(axis=1).astype(np.int32), -frames.min(axis=1).astype(np.int32)), 32767)
+        features["voiced"] = False
+
+        self.frames += len(frames)
+        for i in np.flatnonzero(features["rms"] >= self.energy_gate):
+            self.vad_calls += 1
+            features["voiced"][i] = self.vad.is_speech(frames[i].tobytes(), self.sample_rate)
+        return features
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "vad_calls": self.vad_calls,
+            "vad_skipped": self.frames - self.vad_calls,
+        }
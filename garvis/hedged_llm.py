@@ -0,0 +1,130 @@
+import time
+import asyncio
+
+from collections import Counter
+from .config import *
+from .llm import LLM, close_stream
+from .metrics import latency_summary
+
+
+class HedgedLLM(LLM):
+    """
+    Races two async LLMs, e.g. AsyncGroq with AsyncOpenAI as the fallback.
+
+    Each request goes to `primary`. If it has not produced a first token after
+    `hedge_delay` seconds, or fails (a rate limit, say), the same request also
+    goes to `secondary`. The reply streams from whichever backend gets a token
+    out first; the other request is cancelled and its stream closed. The call
+    only raises if both fail. Each backend uses its own model and params; per-call
+    overrides are passed to both.
+
+    Anything else (client, intentify, update_params, ...) is the primary's.
+    """
+    def __init__(self, primary, secondary, hedge_delay=LLM_HEDGE_DELAY, log=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_delay = hedge_delay
+        self.log = log or (lambda message: None)
+
+        self.requests = 0
+        self.hedges = 0
+        self.fallbacks = 0
+        self.wins = Counter()
+        self.failures = Counter()
+        self.first_token_seconds = []
+
+    def __getattr__(self, name):
+        if name in ("primary", "secondary"):
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def completion(self, messages, **kwargs):
+        raise NotImplementedError("HedgedLLM is async only")
+
+    async def _attempt(self, backend, messages, kwargs):
+        # Returns once the backend has a first token: (response, chunk iterator, chunks read so far)
+        response = await backend.acompletion(messages, **kwargs)
+        if not {**backend.llm_params, **kwargs}.get("stream"):
+            return response, None, None
+        chunks = response.__aiter__()
+        head = []
+        try:
+            async for chunk in chunks:
+                head.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+        except BaseException:
+            # Lost the race while waiting for the first token (cancelled), or the stream broke
+            await close_stream(response)
+            raise
+        return response, chunks, head
+
+    async def acompletion(self, messages, **kwargs):
+        start = time.perf_counter()
+        self.requests += 1
+        tasks = {asyncio.ensure_future(self._attempt(self.primary, messages, kwargs)): "primary"}
+        hedged = False
+        winner = error = None
+        try:
+            while tasks and winner is None:
+                timeout = None if hedged else max(0.0, self.hedge_delay - (time.perf_counter() - start))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = (name, task.result())
+                        else:
+                            self._discard(task)
+                        continue
+                    error = task.exception()
+                    self.failures[name] += 1
+                    self.log(f"{name.capitalize()} LLM failed: {type(error).__name__}: {error}")
+                    if not hedged:
+                        self.fallbacks += 1
+                if winner is None and not hedged:
+                    hedged = True
+                    if error is None:
+                        self.hedges += 1
+                    tasks[asyncio.ensure_future(self._attempt(self.secondary, messages, kwargs))] = "secondary"
+        finally:
+            for task in tasks:
+                task.cancel()
+                self._discard(task)
+
+        if winner is None:
+            raise error
+        name, (response, chunks, head) = winner
+        self.wins[name] += 1
+        self.first_token_seconds.append(time.perf_counter() - start)
+        if chunks is None:
+            return response
+        return self._relay(response, chunks, head)
+
+    def _discard(self, task):
+        # Closes the stream of an attempt that lost the race, whenever it finishes
+        def close(task):
+            if not task.cancelled() and task.exception() is None:
+                asyncio.ensure_future(close_stream(task.result()[0]))
+        task.add_done_callback(close)
+
+    async def _relay(self, response, chunks, head):
+        try:
+            for chunk in head:
+                yield chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await close_stream(response)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "hedged": self.hedges,
+            "fallbacks": self.fallbacks,
+            "primary_wins": self.wins["primary"],
+            "secondary_wins": self.wins["secondary"],
+            "primary_failures": self.failures["primary"],
+            "secondary_failures": self.failures["secondary"],
+            **latency_summary(self.first_token_seconds, "first_token_"),
+        }
@@ -0,0 +1,166 @@
+import re
+import time
+import asyncio
+import threading
+import traceback
+
+from .config import *
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators the chat format adds per message
+
+
+def estimate_tokens(text):
+    # Close to BPE counts for English without a tokenizer: a token per word or symbol,
+    # plus one for every further 6 characters of long words.
+    return sum(1 + (len(piece) - 1) // 6 for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+def estimate_message_tokens(messages, estimator=estimate_tokens):
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimator(message["content"]) for message in messages)
+
+
+class ConversationHistory:
+    """
+    Chat history kept under a token budget.
+
+    Recent turns stay verbatim. Once they exceed `budget` tokens, the oldest turns
+    are folded into a rolling summary, always leaving at least `keep_recent`
+    messages. The summary is written by `llm` in the background after the
+    assistant's reply (on `loop` if given, else on a thread of its own), off the
+    path of the next request; until it is ready the turns being folded are still
+    sent as they are. Without an LLM, or if the summary fails, the folded turns
+    are shortened locally instead.
+
+    It behaves like the list it replaces (`append`, `len`, indexing, iteration over
+    the verbatim turns); `messages()` is what goes into a request.
+    """
+    def __init__(self, llm=None, budget=HISTORY_TOKEN_BUDGET, keep_recent=HISTORY_KEEP_RECENT,
+                 summary_tokens=HISTORY_SUMMARY_TOKENS, estimator=estimate_tokens, log=None, loop=None):
+        self.llm = llm
+        self.loop = loop
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.estimator = estimator
+        self.log = log or (lambda message: None)
+        self.turns = []
+        self.summary = ""
+        self._lock = threading.Lock()
+        self._summarizing = False
+
+        self.prompt_tokens = []
+        self.unbounded_tokens = []
+        self.folded_tokens = 0
+        self.summaries = 0
+        self.summary_seconds = []
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(list(self.turns))
+
+    def __getitem__(self, index):
+        return self.turns[index]
+
+    def append(self, message):
+        with self._lock:
+            self.turns.append(message)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
+
+    def messages(self):
+        with self._lock:
+            summary = [{"role": "system", "content": f"Summary of the conversation so far: {self.summary}"}] if self.summary else []
+            return summary + list(self.turns)
+
+    def tokens(self, messages):
+        return estimate_message_tokens(messages, self.estimator)
+
+    def record_prompt(self, messages):
+        # Called with each request's messages; returns its estimated prompt tokens
+        tokens = self.tokens(messages)
+        summary = self.tokens(messages[1:2]) if self.summary and len(messages) > 1 else 0
+        self.prompt_tokens.append(tokens)
+        self.unbounded_tokens.append(tokens - summary + self.folded_tokens)
+        return tokens
+
+    def compact(self):
+        # Call between turns. Picks the oldest turns over budget and summarizes them in the background.
+        with self._lock:
+            if self._summarizing or self.tokens(self.turns) <= self.budget:
+                return
+            total = self.tokens(self.turns)
+            count = 0
+            while total > self.budget - self.summary_tokens and len(self.turns) - count > self.keep_recent:
+                total -= self.tokens(self.turns[count:count + 1])
+                count += 1
+            # Fold whole exchanges, so the verbatim part starts with the user
+            while count < len(self.turns) - 1 and self.turns[count]["role"] != "user":
+                count += 1
+            if count == 0:
+                return
+            folded = self.turns[:count]
+            summary = self.summary
+            self._summarizing = True
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._summarize(summary, folded), self.loop)
+        else:
+            threading.Thread(target=asyncio.run, args=(self._summarize(summary, folded),), daemon=True).start()
+
+    async def _summarize(self, summary, folded):
+        start = time.perf_counter()
+        try:
+            if self.llm is None:
+                raise RuntimeError("No LLM for summaries")
+            new_summary = await self.asummarize(summary, folded)
+        except Exception:
+            if self.llm is not None:
+                self.log(f"History summary failed, shortening locally:\n{traceback.format_exc()}")
+            new_summary = self.shorten(summary, folded)
+        with self._lock:
+            self.summary = new_summary.strip()
+            if self.turns[:len(folded)] == folded:
+                del self.turns[:len(folded)]
+            self.folded_tokens += self.tokens(folded)
+            self.summaries += 1
+            self.summary_seconds.append(time.perf_counter() - start)
+            self._summarizing = False
+        self.log(f"History compacted: {len(folded)} messages folded into a {self.estimator(self.summary)}-token summary.")
+
+    async def asummarize(self, summary, folded):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in folded)
+        response = await self.llm.acompletion(
+            messages=[
+                {"role": "system", "content": f"You summarize conversations between a user and a voice assistant in at most {self.summary_tokens} tokens. Keep names, facts, decisions and open questions. Reply with the summary only."},
+                {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            stream=False,
+            max_tokens=self.summary_tokens,
+        )
+        return response.choices[0].message.content
+
+    def shorten(self, summary, folded):
+        # Local fallback: the first sentence of each folded message, newest kept when over the limit
+        sentences = [summary] if summary else []
+        for message in folded:
+            first = re.split(r"(?<=[.!?])\s", message["content"].strip(), maxsplit=1)[0]
+            sentences.append(f"{message['role']}: {first}")
+        while len(sentences) > 1 and self.estimator(" ".join(sentences)) > self.summary_tokens:
+            sentences.pop(0)
+        return " ".join(sentences)
+
+    def stats(self):
+        prompts, unbounded = self.prompt_tokens, self.unbounded_tokens
+        return {
+            "turns": len(prompts),
+            "last_prompt_tokens": prompts[-1] if prompts else 0,
+            "avg_prompt_tokens": sum(prompts) / len(prompts) if prompts else 0.0,
+            "saved_tokens": sum(unbounded) - sum(prompts),
+            "summaries": self.summaries,
+            "avg_summary_ms": 1000 * sum(self.summary_seconds) / len(self.summary_seconds) if self.summary_seconds else 0.0,
+        }
@@ -0,0 +1,124 @@
+import re
+import time
+import asyncio
+import threading
+import traceback
+
+from collections import OrderedDict
+from .config import *
+from .phrase_matcher import normalize
+
+PARTIAL_END = re.compile(r"\b(and|or|but|so|because|then|the|a|an|to|of|in|on|at|with|for|from|about|if|that|"
+                         r"which|um|uh|like|my|your|is|are|was)$")
+CLOSING = re.compile(r"^(ok|okay|thanks|thank you|got it|i see|cool|great|alright|all right|never mind|that's all|"
+                     r"sounds good|nice|good)$")
+
+
+def last_sentences(text, count=3):
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence.strip()]
+    return " ".join(sentences[-count:])
+
+
+def heuristic_intent(text):
+    # Local first pass: a class when the wording makes it obvious, None when it takes the LLM
+    text = text.strip()
+    words = normalize(text)
+    if not words:
+        return None
+    if text.endswith("?"):
+        return "QUESTION"
+    if CLOSING.match(normalize(re.split(r"(?<=[.!?])\s+", text)[-1])):
+        return "DEFAULT"
+    if text.endswith((",", "...", "-", ":")) or PARTIAL_END.search(words):
+        return "PARTIAL"
+    return None
+
+
+class IntentEvaluator:
+    """
+    Decides whether the user finished their turn, off the transcription thread.
+
+    `submit()` hands over the latest transcript; only that one gets classified.
+    A burst of submissions within `debounce` seconds is evaluated once, and an
+    evaluation still waiting on the LLM is cancelled when newer text arrives.
+    The local `heuristic` settles clear cases; only ambiguous ones are escalated
+    to `llm.aintentify`. Results are cached per normalized text.
+    """
+    def __init__(self, llm, debounce=INTENT_DEBOUNCE, cache_size=INTENT_CACHE_SIZE, heuristic=heuristic_intent, log=None):
+        self.llm = llm
+        self.debounce = debounce
+        self.cache_size = cache_size
+        self.heuristic = heuristic
+        self.log = log or (lambda message: None)
+        self._cache = OrderedDict()
+        self._task = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.evaluated = 0
+        self.superseded = 0
+        self.cache_hits = 0
+        self.heuristic_hits = 0
+        self.escalated = 0
+        self.llm_seconds = []
+
+    def submit(self, text, loop, on_intent):
+        # Thread-safe. Calls on_intent(text, intent) on `loop` once `text` is classified,
+        # unless newer text was submitted in the meantime.
+        self.submitted += 1
+        loop.call_soon_threadsafe(self._schedule, text, on_intent)
+
+    def _schedule(self, text, on_intent):
+        self.cancel()
+        self._task = asyncio.ensure_future(self._evaluate(text, on_intent))
+
+    def cancel(self):
+        # Call on the evaluator's loop
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.superseded += 1
+        self._task = None
+
+    async def _evaluate(self, text, on_intent):
+        await asyncio.sleep(self.debounce)
+        try:
+            intent = await self.classify(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.log(f"Intent classification failed:\n{traceback.format_exc()}")
+            return
+        self.evaluated += 1
+        on_intent(text, intent)
+
+    async def classify(self, text):
+        key = normalize(text)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key]
+        intent = self.heuristic(text) if self.heuristic else None
+        if intent is not None:
+            self.heuristic_hits += 1
+        else:
+            self.escalated += 1
+            start = time.perf_counter()
+            intent = await self.llm.aintentify(text)
+            self.llm_seconds.append(time.perf_counter() - start)
+        with self._lock:
+            self._cache[key] = intent
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return intent
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "evaluated": self.evaluated,
+            "superseded": self.superseded,
+            "cache_hits": self.cache_hits,
+            "heuristic_hits": self.heuristic_hits,
+            "escalated": self.escalated,
+            "avg_llm_ms": 1000 * sum(self.llm_seconds) / len(self.llm_seconds) if self.llm_seconds else 0.0,
+        }
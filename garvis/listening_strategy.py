@@ -1,8 +1,15 @@
 import asyncio
-import time
-import numpy as np
+import math
 
 from abc import ABC, abstractmethod
+from .config import INTENT_DEBOUNCE
+from .llm import Groq as GroqLLM  # not as Groq: the audio processor star-imports this module next to groq.Groq
+from .intent import IntentEvaluator, last_sentences
+
+# Star-imported by the audio processor and Garvis: only the strategies, so helper
+# imports like the Groq LLM above never shadow names of the importing module
+__all__ = ["ListeningStrategy", "RealTimeStrategy", "FixedDurationStrategy", "RealTimeWithSilenceStrategy",
+           "IntentBaseRealTimeStrategy", "ContinuousUntilSilenceStrategy"]
 
 class ListeningStrategy(ABC):
 
@@ -14,11 +21,21 @@ class ListeningStrategy(ABC):
     def listen(self, audio_processor):
         pass
     
-    def calculate_audio_power(self, audio_data):
-        audio_array = np.frombuffer(audio_data, dtype=np.int16)
-        power = np.linalg.norm(audio_array) / len(audio_array)
+    def calculate_audio_power(self, features, frame_size):
+        # Same scale as the former norm(frame) / len(frame), derived from the frame RMS
+        power = features.rms / math.sqrt(frame_size)
         normalized_power = power / 100  # Normalizing the power value
-        return normalized_power 
+        return normalized_power
+
+    async def next_frame(self, audio_processor):
+        # Reads one frame, analyzes it once, meters it and appends it to the utterance.
+        data = await audio_processor.read_frame()
+        if data is None:
+            return None
+        features = audio_processor.analyze_frame(data)
+        audio_processor.audio_power(self.calculate_audio_power(features, audio_processor.FRAME_SIZE))
+        audio_processor.audio_frames.append(data, features)
+        return features
 
 class RealTimeStrategy(ListeningStrategy):
     def __init__(self, stop_criteria=None, *args, **kwargs):
@@ -29,66 +46,56 @@ class RealTimeStrategy(ListeningStrategy):
     
     def callback(self, audio_processor, index, text) -> bool:
         if self.last_text:
-            audio_processor.audio_frames = []
-            asyncio.create_task(audio_processor.toggle_listen())
+            audio_processor.audio_frames.clear()
+            asyncio.run_coroutine_threadsafe(audio_processor.toggle_listen(), audio_processor.loop)
             return False # There is no text to be passed to the transcription_update method
         elif text and self.stop_criteria and self.stop_criteria(text):
-            audio_processor.audio_frames = []
-            asyncio.create_task(audio_processor.toggle_listen())
+            audio_processor.audio_frames.clear()
+            asyncio.run_coroutine_threadsafe(audio_processor.toggle_listen(), audio_processor.loop)
             return False # There is no text to be passed to the transcription_update method
             
         return True # There is text to be passed to the transcription_update method
 
     async def listen(self, audio_processor):
-        audio_processor.audio_frames = []
+        audio_processor.audio_frames.clear()
         silence_start = None
         start_time = None
         last_speech = None
 
         while audio_processor.listening:
-            try:
-                if audio_processor.stream.is_active():
-                    data = audio_processor.stream.read(audio_processor.FRAME_SIZE, exception_on_overflow=False)
-                    audio_power = self.calculate_audio_power(data)
-                    audio_processor.on_audio_power(audio_power)
-                    
-                    audio_processor.audio_frames.append(data)
-                    
-                    now_time = time.time()
-
-                    if start_time is None:
-                        start_time = now_time
-
-                    is_speech = audio_processor.vad.is_speech(data, audio_processor.SAMPLE_RATE)
-                    if not is_speech:
-                        if silence_start is None:
-                            silence_start = now_time
-                        elif now_time - silence_start > self.threshold_silence:
-                            audio_length = now_time - start_time
-                            if audio_length >= audio_processor.MIN_AUDIO_LENGTH:
-                                audio_processor.log("Silence detected. Processing audio...")
-                                audio_processor.chunk_index += 1
-                                await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.copy(), False, self.callback)
-                                silence_start = None
-                                start_time = None
-                                audio_processor.audio_frames = []
-                            else:
-                                audio_processor.log("Audio length less than minimum threshold. Continuing to capture audio.")
-                    else:
-                        last_speech = now_time
+            features = await self.next_frame(audio_processor)
+            if features is None:
+                break
+            
+            now_time = audio_processor.audio_time
+
+            if start_time is None:
+                start_time = now_time
+
+            is_speech = features.voiced
+            if not is_speech:
+                if silence_start is None:
+                    silence_start = now_time
+                elif now_time - silence_start > self.threshold_silence:
+                    audio_length = now_time - start_time
+                    if audio_length >= audio_processor.MIN_AUDIO_LENGTH:
+                        audio_processor.log("Silence detected. Processing audio...")
+                        audio_processor.chunk_index += 1
+                        await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.detach(), False, self.callback)
                         silence_start = None
-                        
-                    if last_speech and now_time - last_speech > self.threshold_end:
-                        audio_processor.log("Extended silence detected. Stopping listening.")
-                        self.last_text = True
-                        await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.copy(), True, self.callback)
-                        return
-            except IOError as e:
-                if e.errno == -9981:
-                    audio_processor.log("Buffer overflow. Dropping frames.")
-                    continue
-                else:
-                    raise
+                        start_time = None
+                    else:
+                        audio_processor.log("Audio length less than minimum threshold. Continuing to capture audio.")
+            else:
+                last_speech = now_time
+                silence_start = None
+                
+            if last_speech and now_time - last_speech > self.threshold_end:
+                audio_processor.log("Extended silence detected. Stopping listening.")
+                self.last_text = True
+                audio_processor.chunk_index += 1
+                await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.detach(), True, self.callback)
+                return
 
 class FixedDurationStrategy(ListeningStrategy):
     def __init__(self, recording_timespan=10):
@@ -96,31 +103,20 @@ class FixedDurationStrategy(ListeningStrategy):
         pass
 
     async def listen(self, audio_processor):
-        audio_processor.audio_frames = []
-        start_time = time.time()
+        audio_processor.audio_frames.clear()
+        start_time = audio_processor.audio_time
 
         while audio_processor.listening:
-            try:
-                if audio_processor.stream.is_active():
-                    data = audio_processor.stream.read(audio_processor.FRAME_SIZE, exception_on_overflow=False)
-                    audio_power = self.calculate_audio_power(data)
-                    audio_processor.on_audio_power(audio_power)
-
-                    audio_processor.audio_frames.append(data)
+            features = await self.next_frame(audio_processor)
+            if features is None:
+                break
 
-                if time.time() - start_time > self.recording_timespan:
-                    audio_processor.log(f"Listening duration of {self.recording_timespan} seconds completed. Processing audio...")
-                    audio_processor.chunk_index += 1
-                    await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.copy(), True, self.callback)
-                    start_time = time.time()
-                    audio_processor.audio_frames = []
-                    return
-            except IOError as e:
-                if e.errno == -9981:
-                    audio_processor.log("Buffer overflow. Dropping frames.")
-                    continue
-                else:
-                    raise
+            if audio_processor.audio_time - start_time > self.recording_timespan:
+                audio_processor.log(f"Listening duration of {self.recording_timespan} seconds completed. Processing audio...")
+                audio_processor.chunk_index += 1
+                await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.detach(), True, self.callback)
+                start_time = audio_processor.audio_time
+                return
 
 class RealTimeWithSilenceStrategy(ListeningStrategy):
     def __init__(self, *args, **kwargs):
@@ -129,103 +125,112 @@ class RealTimeWithSilenceStrategy(ListeningStrategy):
         pass
 
     async def listen(self, audio_processor):
-        audio_processor.audio_frames = []
+        audio_processor.audio_frames.clear()
         silence_start = None
         start_time = None
-        last_spoken_time = time.time()
+        last_spoken_time = audio_processor.audio_time
 
         while audio_processor.listening:
-            try:
-                if audio_processor.stream.is_active():
-                    data = audio_processor.stream.read(audio_processor.FRAME_SIZE, exception_on_overflow=False)
-                    audio_power = self.calculate_audio_power(data)
-                    audio_processor.on_audio_power(audio_power)
-                    
-                    audio_processor.audio_frames.append(data)
-
-                    if start_time is None:
-                        start_time = time.time()
-
-                    is_speech = audio_processor.vad.is_speech(data, audio_processor.SAMPLE_RATE)
-                    current_time = time.time()
-
-                    if not is_speech:
-                        if silence_start is None:
-                            silence_start = current_time
-                        elif current_time - silence_start > self.threshold_silence:
-                            audio_length = current_time - start_time
-                            if audio_length >= audio_processor.MIN_AUDIO_LENGTH:
-                                audio_processor.log("Silence detected. Processing audio...")
-                                audio_processor.chunk_index += 1
-                                audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.copy(), False, self.callback)
-                                silence_start = None
-                                start_time = None
-                                audio_processor.audio_frames = []
-                            else:
-                                # audio_processor.log("Audio length less than minimum threshold. Continuing to capture audio.")
-                                pass
-                    else:
+            features = await self.next_frame(audio_processor)
+            if features is None:
+                break
+
+            if start_time is None:
+                start_time = audio_processor.audio_time
+
+            is_speech = features.voiced
+            current_time = audio_processor.audio_time
+
+            if not is_speech:
+                if silence_start is None:
+                    silence_start = current_time
+                elif current_time - silence_start > self.threshold_silence:
+                    audio_length = current_time - start_time
+                    if audio_length >= audio_processor.MIN_AUDIO_LENGTH:
+                        audio_processor.log("Silence detected. Processing audio...")
+                        audio_processor.chunk_index += 1
+                        await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.detach(), False, self.callback)
                         silence_start = None
-                        last_spoken_time = current_time
-
-                    # Check if we need to stop listening due to extended silence
-                    if current_time - last_spoken_time > self.threshold_end:
-                        audio_processor.log("Extended silence detected. Stopping listening.")
-                        await audio_processor.toggle_listen()
-                        return
-            except IOError as e:
-                if e.errno == -9981:
-                    audio_processor.log("Buffer overflow. Dropping frames.")
-                    continue
-                else:
-                    raise
+                        start_time = None
+                    else:
+                        # audio_processor.log("Audio length less than minimum threshold. Continuing to capture audio.")
+                        pass
+            else:
+                silence_start = None
+                last_spoken_time = current_time
+
+            # Check if we need to stop listening due to extended silence
+            if current_time - last_spoken_time > self.threshold_end:
+                audio_processor.log("Extended silence detected. Stopping listening.")
+                await audio_processor.toggle_listen()
+                return
 
 class IntentBaseRealTimeStrategy(RealTimeStrategy):
-    def __init__(self, ending_class = "QUESTION", last_n_sentence = 3, llm=None):
-        super().__init__(self.stop_criteria)
-        self.llm = llm or Groq()
+    """
+    Real-time listening that also stops as soon as the transcript so far reads like
+    a finished turn of `ending_class`. The check runs in an IntentEvaluator on the
+    listening loop, so transcription never waits on it: each chunk just submits the
+    last `last_n_sentence` sentences of the transcript.
+    """
+    def __init__(self, ending_class = "QUESTION", last_n_sentence = 3, llm=None, debounce=INTENT_DEBOUNCE, *args, **kwargs):
+        super().__init__(None, *args, **kwargs)
+        self.llm = llm or GroqLLM()
         self.end_class = ending_class
-    
-    def stop_criteria(self, text):
-        sentences = text.split(".")
-        last_3_sentences = sentences[-3:]
-        intent = self.llm.intentify(". ".join(last_3_sentences))
-        print(f"Intent: {intent}")
-        return intent == self.end_class
-                   
+        self.last_n_sentence = last_n_sentence
+        self.evaluator = IntentEvaluator(self.llm, debounce=debounce)
+
+    async def listen(self, audio_processor):
+        # The strategy is created before it meets its audio processor; from here on,
+        # failed intent checks are reported in the Garvis log
+        self.evaluator.log = audio_processor.log
+        await super().listen(audio_processor)
+
+    def callback(self, audio_processor, index, text) -> bool:
+        if self.last_text:
+            audio_processor.loop.call_soon_threadsafe(self.evaluator.cancel)
+        elif text:
+            transcript = last_sentences(audio_processor.garvis.collected_transcript(), self.last_n_sentence)
+            self.evaluator.submit(transcript, audio_processor.loop,
+                                  lambda text, intent: self.on_intent(audio_processor, text, intent))
+        return super().callback(audio_processor, index, text)
+
+    def on_intent(self, audio_processor, text, intent):
+        # Runs on the listening loop, for the latest transcript only
+        audio_processor.log(f"Intent: {intent}")
+        if intent == self.end_class and audio_processor.listening:
+            audio_processor.audio_frames.clear()
+            asyncio.ensure_future(audio_processor.toggle_listen())
+
 class ContinuousUntilSilenceStrategy(ListeningStrategy):
     def __init__(self, *args, **kwargs):
         self.threshold_silence = kwargs.get("threshold_silence", 0.1)
+        # With wait_for_speech, silence before the first voiced frame is dropped instead of ending the turn
+        self.wait_for_speech = kwargs.get("wait_for_speech", False)
         pass
     
     async def listen(self, audio_processor):
-        audio_processor.audio_frames = []
+        audio_processor.audio_frames.clear()
         silence_start = None
+        heard_speech = False
 
         while audio_processor.listening:
-            try:
-                if audio_processor.stream.is_active():
-                    data = audio_processor.stream.read(audio_processor.FRAME_SIZE, exception_on_overflow=False)
-                    audio_power = self.calculate_audio_power(data)
-                    audio_processor.on_audio_power(audio_power)
-                    audio_processor.audio_frames.append(data)
-
-                    is_speech = audio_processor.vad.is_speech(data, audio_processor.SAMPLE_RATE)
-                    if not is_speech:
-                        if silence_start is None:
-                            silence_start = time.time()
-                        elif (time.time() - silence_start) > self.threshold_silence:
-                            audio_processor.log("Silence detected. Processing audio...")
-                            audio_processor.chunk_index += 1
-                            await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.copy(), True, self.callback)
-                            silence_start = None
-                            audio_processor.audio_frames = []
-                            return
-                    else:
-                        silence_start = None
-            except IOError as e:
-                if e.errno == -9981:
-                    audio_processor.log("Buffer overflow. Dropping frames.")
-                    continue
-                else:
-                    raise
\ No newline at end of file
+            features = await self.next_frame(audio_processor)
+            if features is None:
+                break
+
+            is_speech = features.voiced
+            heard_speech = heard_speech or is_speech
+            if self.wait_for_speech and not heard_speech:
+                audio_processor.audio_frames.clear()
+                continue
+            if not is_speech:
+                if silence_start is None:
+                    silence_start = audio_processor.audio_time
+                elif (audio_processor.audio_time - silence_start) > self.threshold_silence:
+                    audio_processor.log("Silence detected. Processing audio...")
+                    audio_processor.chunk_index += 1
+                    await audio_processor.process_audio(audio_processor.chunk_index, audio_processor.audio_frames.detach(), True, self.callback)
+                    silence_start = None
+                    return
+            else:
+                silence_start = None
\ No newline at end of file
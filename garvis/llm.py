@@ -2,6 +2,24 @@ from abc import ABC, abstractmethod
 from groq import Groq as Groqq, AsyncGroq as AsyncGroqq
 from openai import OpenAI as OpenAII, AsyncOpenAI as AsyncOpenAII
 import json
+import asyncio
+from types import SimpleNamespace
+
+def make_chunk(text):
+    # Minimal stand-in for a streamed chat completion chunk: chunk.choices[0].delta.content
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+async def replay_stream(texts):
+    for text in texts:
+        yield make_chunk(text)
+
+async def close_stream(stream):
+    # Stops a completion stream early: provider streams have close(), async generators aclose()
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
 
 class LLM(ABC):
     def __init__(self, model, temperature=0.7, max_tokens=100, top_p=0.9, stream=True, model_params=None):
@@ -34,8 +52,8 @@ class LLM(ABC):
     def update_params(self, **kwargs):
         self.llm_params.update(kwargs)
         
-    def intentify(self, text):
-        completion = self.client.chat.completions.create(
+    def intent_request(self, text):
+        return dict(
             model= self.intent_model,
             messages=[
                 {
@@ -55,6 +73,19 @@ class LLM(ABC):
             stop=None,
         )
 
+    def intentify(self, text):
+        completion = self.client.chat.completions.create(**self.intent_request(text))
+
+        response = completion.choices[0].message.content
+        return json.loads(response).get("class", "DEFAULT")
+
+    async def aintentify(self, text):
+        # Async clients are awaited; sync ones run on a thread so the caller's loop keeps going
+        if isinstance(self.client, (AsyncGroqq, AsyncOpenAII)):
+            completion = await self.client.chat.completions.create(**self.intent_request(text))
+        else:
+            completion = await asyncio.to_thread(self.client.chat.completions.create, **self.intent_request(text))
+
         response = completion.choices[0].message.content
         return json.loads(response).get("class", "DEFAULT")
 
@@ -65,12 +96,12 @@ class Groq(LLM):
         self.intent_model = "llama3-70b-8192"
     
     def completion(self, messages, **kwargs):
-        # Update self.llm_params with kwargs
-        self.llm_params.update(kwargs)
+        # Per-call overrides; self.llm_params stays as configured
+        params = {**self.llm_params, **kwargs}
         
         return self.client.chat.completions.create(
             messages=messages,
-            **self.llm_params,
+            **params,
             # stream=True
             # model=kwargs.get('model', self.model),
             # temperature=kwargs.get('temperature', self.temperature),
@@ -90,12 +121,12 @@ class AsyncGroq(LLM):
         self.intent_model = "llama3-70b-8192"
     
     async def acompletion(self, messages, **kwargs):
-        # Update self.llm_params with kwargs
-        self.llm_params.update(kwargs)
+        # Per-call overrides; self.llm_params stays as configured
+        params = {**self.llm_params, **kwargs}
     
         return await self.client.chat.completions.create(
             messages=messages,
-            **self.llm_params,
+            **params,
         )
 
 class OpenAI(LLM):
@@ -104,10 +135,10 @@ class OpenAI(LLM):
         self.client = OpenAII()
     
     def completion(self, messages, **kwargs):
-        self.llm_params.update(kwargs)
+        params = {**self.llm_params, **kwargs}
         return self.client.chat.completions.create(
             messages=messages,
-            **self.llm_params
+            **params
         )
         
 class AsyncOpenAI(LLM):
@@ -116,10 +147,10 @@ class AsyncOpenAI(LLM):
         self.client = AsyncOpenAII()
     
     async def acompletion(self, messages, **kwargs):
-        self.llm_params.update(kwargs)
+        params = {**self.llm_params, **kwargs}
         return await self.client.chat.completions.create(
             messages=messages,
-            **self.llm_params
+            **params
         )
         
 class Ollama(OpenAI):
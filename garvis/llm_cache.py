@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+from .config import *
+from .llm import LLM, make_chunk, replay_stream, close_stream
+from .phrase_matcher import normalize
+
+
+class CachedLLM(LLM):
+    """
+    Wraps another LLM and answers repeated questions from a cache.
+
+    The key is the model params plus the system prompt and the last `window`
+    conversation messages, normalized (case, punctuation and spacing ignored), so
+    "What time is it?" and "what time is it" hit the same entry. Streamed answers
+    are recorded as they pass through and stored once complete; a hit replays them
+    as a synthetic stream of the same shape. Entries expire after `ttl` seconds and
+    the least recently used are evicted beyond `max_entries`. With `path`, the
+    cache is saved to that JSON file and reloaded on start.
+
+    Non-streamed calls (e.g. history summaries) go straight to the wrapped LLM.
+    Anything else (client, intentify, update_params, ...) is the wrapped LLM's.
+    """
+    def __init__(self, llm, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL, window=LLM_CACHE_WINDOW, path=None):
+        self.llm = llm
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.window = window
+        self.path = os.path.expanduser(path) if path else None
+        self._entries = OrderedDict()  # key -> (stored at, tokens)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.tokens_served = 0
+
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def key(self, messages, params):
+        params = {name: value for name, value in params.items() if name != "stream"}
+        system = [message["content"] for message in messages[:1] if message["role"] == "system"]
+        conversation = [message for message in messages if message["role"] != "system"][-self.window:]
+        material = json.dumps({
+            "params": params,
+            "system": system,
+            "window": [[message["role"], normalize(message["content"])] for message in conversation],
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.tokens_served += len(entry[1])
+            return entry[1]
+
+    def put(self, key, tokens):
+        with self._lock:
+            self._entries[key] = (time.time(), list(tokens))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.path:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, stored_at, tokens in entries:
+            if now - stored_at <= self.ttl:
+                self._entries[key] = (stored_at, tokens)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([[key, stored_at, tokens] for key, (stored_at, tokens) in self._entries.items()], f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._save()
+
+    def completion(self, messages, **kwargs):
+        params = {**self.llm.llm_params, **kwargs}
+        if not params.get("stream"):
+            return self.llm.completion(messages, **kwargs)
+        key = self.key(messages, params)
+        tokens = self.get(key)
+        if tokens is not None:
+            return (make_chunk(text) for text in tokens)
+        return self._record(key, self.llm.completion(messages, **kwargs))
+
+    async def acompletion(self, messages, **kwargs):
+        params = {**self.llm.llm_params, **kwargs}
+        if not params.get("stream"):
+            return await self.llm.acompletion(messages, **kwargs)
+        key = self.key(messages, params)
+        tokens = self.get(key)
+        if tokens is not None:
+            return replay_stream(tokens)
+        return self._arecord(key, await self.llm.acompletion(messages, **kwargs))
+
+    def _record(self, key, stream):
+        tokens = []
+        for chunk in stream:
+            text = chunk.choices[0].delta.content
+            if text:
+                tokens.append(text)
+            yield chunk
+        if tokens:
+            self.put(key, tokens)
+
+    async def _arecord(self, key, stream):
+        # Only complete answers are stored; an interrupted one closes the underlying stream
+        tokens = []
+        complete = False
+        try:
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content
+                if text:
+                    tokens.append(text)
+                yield chunk
+            complete = True
+        finally:
+            if complete and tokens:
+                self.put(key, tokens)
+            elif not complete:
+                await close_stream(stream)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "tokens_served": self.tokens_served,
+            }
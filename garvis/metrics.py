@@ -0,0 +1,63 @@
+import math
+import numpy as np
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def latency_summary(seconds, prefix=""):
+    # Tail latency of a list of durations in seconds, reported in ms
+    return {
+        f"{prefix}count": len(seconds),
+        f"{prefix}p50_ms": 1000 * percentile(seconds, 50),
+        f"{prefix}p95_ms": 1000 * percentile(seconds, 95),
+        f"{prefix}p99_ms": 1000 * percentile(seconds, 99),
+        f"{prefix}max_ms": 1000 * max(seconds) if len(seconds) else 0.0,
+    }
+
+
+class Histogram:
+    """
+    Latency histogram with log-spaced buckets (5% wide from 0.5 ms to 60 s), so
+    recording is O(1) with no stored samples and percentiles are within a bucket.
+    """
+    def __init__(self, low=0.0005, high=60.0, growth=1.05):
+        self.low = low
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.counts = [0] * (int(math.ceil(math.log(high / low) / self._log_growth)) + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= self.low:
+            index = 0
+        else:
+            index = min(int(math.log(seconds / self.low) / self._log_growth) + 1, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                # Upper edge of the bucket, but never past the largest value seen
+                return min(self.low * self.growth ** index, self.max)
+        return self.max
+
+    def summary(self, prefix=""):
+        return {
+            f"{prefix}count": self.count,
+            f"{prefix}p50_ms": 1000 * self.percentile(50),
+            f"{prefix}p95_ms": 1000 * self.percentile(95),
+            f"{prefix}p99_ms": 1000 * self.percentile(99),
+            f"{prefix}max_ms": 1000 * self.max,
+        }
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import threading
+
+from collections import defaultdict
+from .config import *
+from .llm import LLM
+from .metrics import latency_summary
+
+STRONG_CUES = re.compile(r"\b(why|how|explain|compare|difference|between|pros|cons|plan|design|analy[sz]e|summari[sz]e|"
+                         r"translate|write|draft|code|debug|calculate|prove|step by step|in detail|what if|should i)\b")
+SIMPLE_CUES = re.compile(r"^(hi|hello|hey|thanks|thank you|ok|okay|yes|no|sure|good|great|cool|bye|goodbye|"
+                         r"what time|what day|who are you|how are you)\b")
+
+
+class ComplexityClassifier:
+    """
+    Cheap local score of how hard a turn is, from 0 (trivial) to 1, computed from
+    the last user message (length, question type, numbers) and how deep the
+    conversation is. `features()` returns the inputs, so they can be logged and
+    the weights refit from data.
+    """
+    def __init__(self, long_words=40, deep_turns=12):
+        self.long_words = long_words
+        self.deep_turns = deep_turns
+
+    def features(self, messages):
+        user = [message["content"] for message in messages if message["role"] == "user"]
+        text = (user[-1] if user else "").lower().strip()
+        return {
+            "words": len(text.split()),
+            "strong_cues": len(STRONG_CUES.findall(text)),
+            "simple": bool(SIMPLE_CUES.match(text)),
+            "numbers": len(re.findall(r"\d+", text)),
+            "questions": text.count("?"),
+            "turns": sum(1 for message in messages if message["role"] != "system"),
+        }
+
+    def score(self, features):
+        score = 0.45 * min(features["words"] / self.long_words, 1.0)
+        score += 0.3 * min(features["strong_cues"], 1) + 0.1 * (features["strong_cues"] > 1)
+        score += 0.1 * min(features["numbers"], 2) / 2 + 0.05 * min(features["questions"], 2) / 2
+        score += 0.15 * min(features["turns"] / self.deep_turns, 1.0)
+        if features["simple"]:
+            score -= 0.3
+        return max(0.0, min(score, 1.0))
+
+    def __call__(self, messages):
+        features = self.features(messages)
+        return self.score(features), features
+
+
+class RoutedLLM(LLM):
+    """
+    Sends each request to a fast or a strong model depending on how complex the
+    turn looks to a local `classifier`: turns scoring `threshold` or more go to
+    `strong_model`, the rest to `fast_model`, both through the wrapped `llm` (so
+    they share its client and connections). Each decision is logged with its
+    score, features and the observed time to first token and to the last token;
+    with `path` they are also appended there as JSON lines, for tuning the
+    threshold. A `model` passed per call skips the routing.
+
+    Anything else (client, intentify, update_params, ...) is the wrapped LLM's.
+    """
+    def __init__(self, llm, fast_model=LLM_FAST_MODEL, strong_model=LLM_STRONG_MODEL,
+                 threshold=LLM_ROUTE_THRESHOLD, classifier=None, log=None, path=None):
+        self.llm = llm
+        self.models = {"fast": fast_model, "strong": strong_model}
+        self.threshold = threshold
+        self.classifier = classifier or ComplexityClassifier()
+        self.log = log or (lambda message: None)
+        self.path = os.path.expanduser(path) if path else None
+        self._lock = threading.Lock()
+
+        self.routes = defaultdict(int)
+        self.first_token_seconds = defaultdict(list)
+        self.total_seconds = defaultdict(list)
+        self.classify_seconds = []
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def route(self, messages):
+        start = time.perf_counter()
+        score, features = self.classifier(messages)
+        self.classify_seconds.append(time.perf_counter() - start)
+        return ("strong" if score >= self.threshold else "fast"), score, features
+
+    def completion(self, messages, **kwargs):
+        if "model" in kwargs:
+            return self.llm.completion(messages, **kwargs)
+        route, score, features = self.route(messages)
+        start = time.perf_counter()
+        response = self.llm.completion(messages, model=self.models[route], **kwargs)
+        if not {**self.llm.llm_params, **kwargs}.get("stream"):
+            elapsed = time.perf_counter() - start
+            self.record(route, score, features, elapsed, elapsed)
+            return response
+        return self._time(route, score, features, start, response)
+
+    async def acompletion(self, messages, **kwargs):
+        if "model" in kwargs:
+            return await self.llm.acompletion(messages, **kwargs)
+        route, score, features = self.route(messages)
+        start = time.perf_counter()
+        response = await self.llm.acompletion(messages, model=self.models[route], **kwargs)
+        if not {**self.llm.llm_params, **kwargs}.get("stream"):
+            elapsed = time.perf_counter() - start
+            self.record(route, score, features, elapsed, elapsed)
+            return response
+        return self._atime(route, score, features, start, response)
+
+    def _time(self, route, score, features, start, stream):
+        first_token = None
+        for chunk in stream:
+            if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                first_token = time.perf_counter() - start
+            yield chunk
+        self.record(route, score, features, first_token, time.perf_counter() - start)
+
+    async def _atime(self, route, score, features, start, stream):
+        first_token = None
+        complete = False
+        try:
+            async for chunk in stream:
+                if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                    first_token = time.perf_counter() - start
+                yield chunk
+            complete = True
+        finally:
+            self.record(route, score, features, first_token, time.perf_counter() - start if complete else None)
+
+    def record(self, route, score, features, first_token, total):
+        # total is None for replies cut off before the end (interrupted turns)
+        self.routes[route] += 1
+        if first_token is not None:
+            self.first_token_seconds[route].append(first_token)
+        if total is not None:
+            self.total_seconds[route].append(total)
+        ttft = f"{1000 * first_token:.0f} ms" if first_token is not None else "n/a"
+        self.log(f"Routed to {route} model {self.models[route]} (score {score:.2f}), first token after {ttft}.")
+        if self.path:
+            entry = {"time": time.time(), "route": route, "model": self.models[route], "score": round(score, 3),
+                     "features": features, "first_token": first_token, "total": total}
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def stats(self):
+        stats = {
+            "avg_classify_us": 1e6 * sum(self.classify_seconds) / len(self.classify_seconds) if self.classify_seconds else 0.0,
+        }
+        for route in self.models:
+            stats[f"{route}_requests"] = self.routes[route]
+            stats.update(latency_summary(self.first_token_seconds[route], f"{route}_first_token_"))
+        return stats
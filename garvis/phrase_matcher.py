@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import zlib
+import difflib
+import hashlib
+import threading
+import numpy as np
+
+from collections import namedtuple
+from .config import *
+
+RouteMatch = namedtuple("RouteMatch", ["name", "score", "stage"])
+NO_MATCH = RouteMatch(None, 0.0, None)
+
+
+class Route:
+    """A named group of example utterances, as in semantic-router."""
+    def __init__(self, name, utterances, score_threshold=None):
+        self.name = name
+        self.utterances = list(utterances)
+        self.score_threshold = score_threshold
+
+
+def normalize(text):
+    return " ".join(re.findall(r"[\w']+", text.lower()))
+
+
+class HashingEncoder:
+    """
+    Local, dependency-free sentence encoder: counts of hashed character n-grams.
+    Good enough to catch rephrasings and transcription slips of short commands.
+    """
+    def __init__(self, dim=512, n=3):
+        self.dim = dim
+        self.n = n
+        self.name = f"hashing-{dim}-{n}"
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f" {normalize(text)} "
+            for i in range(len(padded) - self.n + 1):
+                vectors[row, zlib.crc32(padded[i:i + self.n].encode()) % self.dim] += 1.0
+        return vectors
+
+
+class OpenAIEmbeddingEncoder:
+    """Remote embeddings (what semantic-router's OpenAIEncoder does). The client is created on first use."""
+    def __init__(self, model="text-embedding-3-small", client=None):
+        self.model = model
+        self.client = client
+        self.name = f"openai-{model}"
+
+    def encode(self, texts):
+        if self.client is None:
+            from openai import OpenAI
+            self.client = OpenAI()
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+class PhraseMatcher:
+    """
+    Local replacement for semantic-router's RouteLayer: `matcher(text).name` is the
+    best matching route's name, or None.
+
+    Stage one is a normalized keyword index over the route utterances: queries are
+    compared only with utterances sharing a word, by exact match, whole-word
+    containment or fuzzy ratio. Only if nothing clears the threshold does stage two
+    run, if an encoder is configured: utterance vectors are computed once, saved
+    under `cache_dir`, and scored against the query with one NumPy matrix product.
+    `encoder_factory` is only called when stage two is first needed.
+    """
+    def __init__(self, routes, fuzzy_threshold=PHRASE_FUZZY_THRESHOLD, encoder_factory=None,
+                 embedding_threshold=PHRASE_EMBEDDING_THRESHOLD, cache_dir=PHRASE_INDEX_DIR):
+        self.routes = list(routes)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.encoder_factory = encoder_factory
+        self.embedding_threshold = embedding_threshold
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.encoder = None
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        self._utterances = []  # (normalized utterance, route index), grouped by route
+        self._index = {}  # word -> utterance positions
+        self._route_starts = []
+        for route_index, route in enumerate(self.routes):
+            self._route_starts.append(len(self._utterances))
+            for utterance in route.utterances:
+                text = normalize(utterance)
+                for word in set(text.split()):
+                    self._index.setdefault(word, []).append(len(self._utterances))
+                self._utterances.append((text, route_index))
+
+        self.queries = 0
+        self.keyword_hits = 0
+        self.embedding_hits = 0
+        self.query_seconds = 0.0
+
+    def threshold(self, route, default):
+        return route.score_threshold if route.score_threshold is not None else default
+
+    def __call__(self, text):
+        start = time.perf_counter()
+        match = self.match_keywords(text)
+        if match.name is not None:
+            self.keyword_hits += 1
+        elif self.encoder_factory is not None:
+            match = self.match_embeddings(text)
+            if match.name is not None:
+                self.embedding_hits += 1
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - start
+        return match
+
+    def match_keywords(self, text):
+        query = normalize(text)
+        if not query:
+            return NO_MATCH
+        candidates = set()
+        for word in query.split():
+            candidates.update(self._index.get(word, ()))
+
+        padded = f" {query} "
+        best = NO_MATCH
+        for position in candidates:
+            utterance, route_index = self._utterances[position]
+            route = self.routes[route_index]
+            if utterance == query:
+                score = 1.0
+            elif f" {utterance} " in padded:
+                # The whole phrase was said, with extra words around it
+                score = 0.85 + 0.15 * len(utterance) / len(query)
+            else:
+                matcher = difflib.SequenceMatcher(None, query, utterance)
+                # quick_ratio() is a cheap upper bound of ratio()
+                score = matcher.quick_ratio()
+                if score >= max(self.threshold(route, self.fuzzy_threshold), best.score):
+                    score = matcher.ratio()
+            if score >= self.threshold(route, self.fuzzy_threshold) and score > best.score:
+                best = RouteMatch(route.name, score, "keyword")
+        return best
+
+    def index_key(self):
+        material = "\0".join([self.encoder.name] + [utterance for utterance, _ in self._utterances])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def load_vectors(self):
+        with self._lock:
+            if self._vectors is not None:
+                return self._vectors
+            self.encoder = self.encoder or self.encoder_factory()
+            path = os.path.join(self.cache_dir, f"{self.index_key()}.npy") if self.cache_dir else None
+            if path and os.path.exists(path):
+                vectors = np.load(path)
+            else:
+                vectors = self.encoder.encode([utterance for utterance, _ in self._utterances])
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+                if path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    np.save(path, vectors)
+            self._vectors = vectors
+            return vectors
+
+    def match_embeddings(self, text):
+        if not normalize(text):
+            return NO_MATCH
+        vectors = self.load_vectors()
+        query = self.encoder.encode([text])[0]
+        query /= max(np.linalg.norm(query), 1e-9)
+        scores = np.maximum.reduceat(vectors @ query, self._route_starts)
+
+        best = NO_MATCH
+        for route, score in zip(self.routes, scores):
+            if score >= self.threshold(route, self.embedding_threshold) and score > best.score:
+                best = RouteMatch(route.name, float(score), "embedding")
+        return best
+
+    def stats(self):
+        return {
+            "queries": self.queries,
+            "keyword_hits": self.keyword_hits,
+            "embedding_hits": self.embedding_hits,
+            "avg_query_ms": 1000 * self.query_seconds / self.queries if self.queries else 0.0,
+        }
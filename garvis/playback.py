@@ -0,0 +1,230 @@
+import time
+import asyncio
+import threading
+import numpy as np
+
+from types import SimpleNamespace
+from collections import deque
+
+from .config import *
+
+
+class PCMPlayer:
+    """
+    Long-lived PyAudio output stream fed with raw 16-bit mono PCM.
+
+    Incoming audio goes into a small jitter buffer; playback of an utterance starts
+    once `jitter_buffer_ms` of audio is queued (or the utterance has ended), and
+    from then on every device callback that finds too little audio counts as an
+    underrun and is padded with silence. `flush()` drops everything queued so
+    stop and barge-in take effect on the next device buffer.
+
+    Each utterance is bracketed by `begin()` and `end()`. `begin()` returns a
+    generation number that `flush()` bumps, so a writer can notice it was stopped.
+    The `tag` given to `begin()` is passed to `on_first_sample` once the utterance
+    becomes audible.
+
+    The RMS of the last few device buffers is kept in `output_rms` so a barge-in
+    monitor can tell the user's voice from the assistant's own echo.
+    """
+    def __init__(self, sample_rate=TTS_SAMPLE_RATE, jitter_buffer_ms=TTS_JITTER_BUFFER_MS,
+                 frames_per_buffer=PLAYBACK_FRAMES_PER_BUFFER):
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.jitter_bytes = int(sample_rate * jitter_buffer_ms / 1000) * 2
+        self.generation = 0
+
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._playing = False
+        self._ended = True
+        self._begin_time = None
+        self._first_sample_pending = False
+        self._tag = None
+        self._flushed_at = None
+        self._output_levels = deque(maxlen=PLAYBACK_LEVEL_WINDOW)
+        self._pyaudio = None
+        self._audio = None
+        self._stream = None
+
+        self.underruns = 0
+        self.bytes_played = 0
+        self.first_sample_latencies = []
+        self.flush_to_silence = []
+        self.on_first_sample = None  # called with the utterance's tag from the audio thread when it becomes audible
+
+    def open(self):
+        if self._stream is not None:
+            return
+        import pyaudio
+        self._pyaudio = pyaudio
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16,
+                                        channels=1,
+                                        rate=self.sample_rate,
+                                        output=True,
+                                        frames_per_buffer=self.frames_per_buffer,
+                                        stream_callback=self._playback_callback)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+
+    def begin(self, tag=None):
+        self.open()
+        with self._lock:
+            self._buffer.clear()
+            self._playing = False
+            self._ended = False
+            self._begin_time = time.perf_counter()
+            self._first_sample_pending = True
+            self._tag = tag
+            return self.generation
+
+    def write(self, pcm, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._buffer += pcm
+            return True
+
+    def end(self):
+        with self._lock:
+            self._ended = True
+
+    def flush(self):
+        with self._lock:
+            self.generation += 1
+            self._buffer.clear()
+            self._playing = False
+            self._ended = True
+            self._first_sample_pending = False
+            self._flushed_at = time.perf_counter()
+            return self._flushed_at
+
+    @property
+    def output_rms(self):
+        # Loudest of the recently played device buffers; the mic hears them with some delay
+        with self._lock:
+            return max(self._output_levels, default=0.0)
+
+    @property
+    def idle(self):
+        with self._lock:
+            return self._ended and len(self._buffer) < 2
+
+    async def drain(self, poll_interval=0.02):
+        while not self.idle:
+            await asyncio.sleep(poll_interval)
+
+    def _playback_callback(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread
+        wanted = frame_count * 2
+        first_sample = False
+        tag = None
+        with self._lock:
+            if not self._playing and (len(self._buffer) >= self.jitter_bytes or (self._ended and self._buffer)):
+                self._playing = True
+            if self._playing:
+                available = len(self._buffer) - len(self._buffer) % 2
+                n = min(wanted, available)
+                data = bytes(self._buffer[:n])
+                del self._buffer[:n]
+                if n < wanted and not self._ended:
+                    self.underruns += 1
+                if n and self._first_sample_pending:
+                    self._first_sample_pending = False
+                    self.first_sample_latencies.append(time.perf_counter() - self._begin_time)
+                    first_sample = True
+                    tag = self._tag
+                self.bytes_played += n
+                if self._ended and len(self._buffer) < 2:
+                    self._playing = False
+            else:
+                data = b""
+            if self._flushed_at is not None and not data:
+                self.flush_to_silence.append(time.perf_counter() - self._flushed_at)
+                self._flushed_at = None
+            samples = np.frombuffer(data, dtype=np.int16)
+            self._output_levels.append(float(np.sqrt(np.mean(samples.astype(np.float32) ** 2))) if len(samples) else 0.0)
+        if first_sample and self.on_first_sample:
+            self.on_first_sample(tag)
+        return (data + bytes(wanted - len(data)), self._pyaudio.paContinue)
+
+    def stats(self):
+        latencies = self.first_sample_latencies
+        return {
+            "underruns": self.underruns,
+            "bytes_played": self.bytes_played,
+            "last_first_sample_ms": 1000 * latencies[-1] if latencies else None,
+            "avg_first_sample_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+            "avg_flush_to_silence_ms": 1000 * sum(self.flush_to_silence) / len(self.flush_to_silence) if self.flush_to_silence else None,
+        }
+
+
+class HeadlessPlayer(PCMPlayer):
+    """
+    PCMPlayer without an audio device, for benchmarks and servers: device buffers
+    are pulled at the real playback rate, so jitter buffering, underruns and stats
+    behave as with a speaker. Played audio goes to `sink(pcm)` if given. The
+    pacing runs on a thread of its own, or as a task on `loop` if given (then
+    `sink` is called on that loop); that task only runs while an utterance plays,
+    so idle sessions cost nothing.
+    """
+    def __init__(self, sink=None, loop=None, **kwargs):
+        super().__init__(**kwargs)
+        self.sink = sink
+        self.loop = loop
+        self._thread = None
+        self._task = None
+        self._running = False
+
+    def open(self):
+        if self._running:
+            return
+        self._pyaudio = SimpleNamespace(paContinue=0)
+        self._running = True
+        if self.loop is not None:
+            self._task = asyncio.run_coroutine_threadsafe(self._pace(), self.loop)
+            return
+        self._thread = threading.Thread(target=self._run, name="garvis-headless-playback", daemon=True)
+        self._thread.start()
+
+    def _tick(self):
+        played = self.bytes_played
+        data, _ = self._playback_callback(None, self.frames_per_buffer, None, 0)
+        if self.sink and self.bytes_played > played:
+            self.sink(data[:self.bytes_played - played])
+
+    def _run(self):
+        interval = self.frames_per_buffer / self.sample_rate
+        due = time.perf_counter()
+        while self._running:
+            self._tick()
+            due += interval
+            time.sleep(max(0.0, due - time.perf_counter()))
+
+    async def _pace(self):
+        # Started by begin() through open(); ends one tick after playback went idle
+        interval = self.frames_per_buffer / self.sample_rate
+        due = time.perf_counter()
+        while self._running:
+            self._tick()
+            if self.idle:
+                break
+            due += interval
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        self._running = False
+        self._task = None
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Preallocated single-producer / single-consumer ring of int16 audio frames.
+
+    The capture callback is the only writer of `_head` and the reader is the only
+    writer of `_tail`, so the two sides never need a lock. When the reader falls
+    behind and the ring is full, new frames are dropped and counted instead of
+    overwriting audio the reader has not seen yet. The frames live in `buffer`
+    (e.g. shared memory, zero-filled) when one is given.
+    """
+    def __init__(self, frame_size, capacity=64, buffer=None):
+        self.frame_size = frame_size
+        self.capacity = capacity
+        if buffer is None:
+            self._frames = np.zeros((capacity, frame_size), dtype=np.int16)
+        else:
+            self._frames = np.ndarray((capacity, frame_size), dtype=np.int16, buffer=buffer)
+        self._head = 0  # total frames written
+        self._tail = 0  # total frames read
+        self.dropped_frames = 0
+
+    def __len__(self):
+        return self._head - self._tail
+
+    @property
+    def written(self):
+        # Frames pushed so far: the index the next frame gets
+        return self._head
+
+    def push(self, data):
+        if self._head - self._tail >= self.capacity:
+            self.dropped_frames += 1
+            return False
+
+        frame = np.frombuffer(data, dtype=np.int16)
+        slot = self._frames[self._head % self.capacity]
+        n = min(len(frame), self.frame_size)
+        slot[:n] = frame[:n]
+        slot[n:] = 0
+        self._head += 1
+        return True
+
+    def pop(self):
+        if self._head == self._tail:
+            return None
+        data = self._frames[self._tail % self.capacity].tobytes()
+        self._tail += 1
+        return data
+
+    def clear(self):
+        # Only called from the reader side, so moving the tail is safe.
+        self._tail = self._head
@@ -1,10 +1,6 @@
-from semantic_router import Route
-import os
-from semantic_router.encoders import OpenAIEncoder
-from semantic_router.layer import RouteLayer
+from .phrase_matcher import Route, PhraseMatcher, HashingEncoder
 
 # Define the semantic routes for detecting stop commands
-encoder = OpenAIEncoder()
 garvis_stop = Route(
     name="garvis-stop",
     utterances=[
@@ -74,7 +70,7 @@ garvis_stop_without_name = Route(
 
 # Create a combined list of routes
 routes = [garvis_stop, garvis_stop_implicit, garvis_stop_without_name]
-rl = RouteLayer(encoder=encoder, routes=routes)
+rl = PhraseMatcher(routes, encoder_factory=HashingEncoder)
 
 def is_call_garvis(text):
     route = rl(text)
@@ -101,9 +97,8 @@ user_endings = Route(
 
 # Place the route in a list
 user_endings_routes = [user_endings]
-# Initialize the encoder and route layer
-user_endings_encoder = OpenAIEncoder()
-user_endings_rl = RouteLayer(encoder=user_endings_encoder, routes=user_endings_routes)
+# Initialize the route layer; the encoder is only built if the keyword stage finds nothing
+user_endings_rl = PhraseMatcher(user_endings_routes, encoder_factory=HashingEncoder)
 
 # Function to detect if the user has ended their conversation
 def detect_end_of_conversation(transcribed_text):
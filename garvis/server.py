@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import traceback
+import resource
+import websockets
+import multiprocessing
+import concurrent.futures
+
+from .config import *
+from .core_async import Garvis
+from .audio_source import StreamSource
+from .audio_offload import AudioOffload
+from .playback import HeadlessPlayer
+from .listening_strategy import ContinuousUntilSilenceStrategy
+from .transcription import TranscriptionExecutor
+from .tts import TTSConnectionManager
+from .worker import ResponseWorker
+from .tracing import STAGES
+from .metrics import Histogram
+from .llm import AsyncOpenAI, AsyncGroq, AsyncOllama
+
+LLMS = {"openai": AsyncOpenAI, "groq": AsyncGroq, "ollama": AsyncOllama}
+
+
+class Session:
+    """
+    One client connection. It has a Garvis of its own (conversation history,
+    listening strategy state, chunk numbering, tracer, event bus), fed with the
+    client's audio and running on the server's loop.
+
+    Listening restarts as soon as a capture ends, so the user can talk over a
+    reply; the next turn then stops it, as in the desktop app.
+    """
+    def __init__(self, server, websocket, session_id):
+        self.server = server
+        self.websocket = websocket
+        self.id = session_id
+        self.source = StreamSource(offload=server.offload)
+        self.outbox = asyncio.Queue()
+        self.stopped = asyncio.Event()
+        self.garvis = server.create_garvis(self)
+        # The on_* bridge has no use here: events go to the client instead
+        self.garvis.events.unsubscribe(self.garvis.callbacks)
+        self.garvis.events.subscribe(self.forward, events=SERVER_EVENTS, loop=server.loop,
+                                     coalesce={"llm_update": "batch"}, name=f"session-{session_id}")
+        if server.verbose:
+            self.garvis.events.subscribe(lambda event: server.log(f"Session {session_id}: {event.args[0]}"),
+                                         events=["log"], loop=server.loop, name=f"session-{session_id}-log")
+
+    def log(self, message):
+        self.garvis.log(message)
+
+    def send_audio(self, pcm):
+        # HeadlessPlayer sink, called on the server loop at the playback rate
+        self.outbox.put_nowait(pcm)
+
+    def send_json(self, message):
+        self.outbox.put_nowait(json.dumps(message))
+
+    def forward(self, event):
+        if event.name == "transcription_stop":
+            self.stopped.set()
+        elif event.name == "turn_trace":
+            self.server.record_turn(event.args[0])
+        self.send_json({"type": event.name, "args": event.args})
+
+    def control(self, message):
+        kind = message.get("type")
+        if kind == "interrupt":
+            self.garvis.interrupt()
+        elif kind == "end":
+            self.source.finish()
+        elif kind == "stats":
+            self.send_json({"type": "stats", "stats": self.server.stats()})
+
+    async def _send(self):
+        while True:
+            await self.websocket.send(await self.outbox.get())
+
+    async def _converse(self):
+        while not self.source.exhausted:
+            self.stopped.clear()
+            # Returns once the strategy has handed over its closing chunk; the capture
+            # ends when that chunk is transcribed (or found to hold no speech)
+            await self.garvis.listen()
+            await self.stopped.wait()
+
+    async def run(self):
+        self.send_json({"type": "session", "id": self.id, "sample_rate": SAMPLE_RATE, "output_sample_rate": TTS_SAMPLE_RATE})
+        tasks = [asyncio.create_task(self._send()), asyncio.create_task(self._converse())]
+        try:
+            async for message in self.websocket:
+                if isinstance(message, bytes):
+                    self.source.feed(message)
+                else:
+                    self.control(json.loads(message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.source.finish()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.garvis.close()
+
+
+class GarvisServer:
+    """
+    Serves many concurrent Garvis conversations over websockets.
+
+    A client sends 16-bit mono PCM at SAMPLE_RATE as binary messages and gets
+    the reply as binary PCM at TTS_SAMPLE_RATE, paced at the playback rate, plus
+    the SERVER_EVENTS as JSON text messages ({"type": name, "args": [...]}, the
+    first one being {"type": "session", ...}). Text messages from the client
+    control the session: {"type": "interrupt"} stops the reply, {"type": "end"}
+    marks the end of its audio and {"type": "stats"} asks for `stats()`.
+
+    Sessions share one event loop (LLM requests, TTS sockets and listening loops
+    of all sessions run on it, as one ResponseWorker queue each), the `llm` and
+    its connection pool, the transcription thread pool and clients, and the
+    optional `tts_cache`. Each session keeps its own history, strategy state,
+    chunk index, tracer and TTS socket. Beyond `max_sessions` connections are
+    refused with close code 1013 (try again later).
+
+    One server is one process and one GIL. `reuse_port` lets several servers
+    share the port (`python -m garvis.server --processes N`): the kernel spreads
+    new connections across them, and each session stays whole in the process
+    that owns its socket. Separately, `offload_processes` moves the sessions'
+    frame analysis (VAD, energy, peak) and chunk encoding to an AudioOffload
+    process pool that reads the audio from shared memory. That lowers this
+    process' CPU per frame; the sockets, the listening logic and the responses
+    stay here. How either scales with cores is unmeasured (bench_server_load.py
+    --cores). With both, each server process has a pool of its own.
+    """
+    def __init__(self, llm, host=SERVER_HOST, port=SERVER_PORT, transcriptor=DEFAULT_TRANSCRIPTOR, tts_uri=None,
+                 tts_cache=None, max_sessions=SERVER_MAX_SESSIONS, transcription_workers=SERVER_TRANSCRIPTION_WORKERS,
+                 chunk_encoder=CHUNK_ENCODER, offload_processes=SERVER_AUDIO_OFFLOAD, reuse_port=False, verbose=False,
+                 log=None, **garvis_options):
+        self.llm = llm
+        self.host = host
+        self.port = port
+        self.transcriptor = transcriptor
+        self.tts_uri = tts_uri
+        self.tts_cache = tts_cache
+        self.max_sessions = max_sessions
+        self.transcription_workers = transcription_workers
+        self.reuse_port = reuse_port
+        self.verbose = verbose
+        self.log = log or (lambda message: None)
+        self.garvis_options = garvis_options
+        self.loop = None
+        self.sessions = {}
+        self._next_id = 0
+        self._server = None
+        self.transcription_pool = concurrent.futures.ThreadPoolExecutor(transcription_workers, thread_name_prefix="garvis-transcriber")
+        self.transcription_clients = {}
+        self.offload = AudioOffload(offload_processes) if offload_processes else None
+        self.chunk_encoder = self.offload.encoder(chunk_encoder) if self.offload else chunk_encoder
+
+        self.refused = 0
+        self.finished = 0
+        self.turns = 0
+        self.histograms = {stage: Histogram() for stage in STAGES if stage != "speech_end"}
+
+    def create_garvis(self, session):
+        return Garvis(llm=self.llm,
+                      listening_strategy=ContinuousUntilSilenceStrategy(wait_for_speech=True),
+                      transcriptor=self.transcriptor,
+                      audio_source=session.source,
+                      chunk_encoder=self.chunk_encoder,
+                      tts_manager=TTSConnectionManager(uri=self.tts_uri, loop=self.loop, log=session.log),
+                      player=HeadlessPlayer(sink=session.send_audio, loop=self.loop),
+                      tts_cache=self.tts_cache,
+                      worker=ResponseWorker(loop=self.loop, log=session.log),
+                      transcription_executor=TranscriptionExecutor(max_workers=self.transcription_workers, log=session.log,
+                                                                   pool=self.transcription_pool, clients=self.transcription_clients),
+                      verbose=self.verbose,
+                      **self.garvis_options)
+
+    def record_turn(self, record):
+        self.turns += 1
+        for stage, ms in record["stages_ms"].items():
+            if stage in self.histograms and ms >= 0:
+                self.histograms[stage].add(ms / 1000)
+
+    async def handle(self, websocket):
+        if len(self.sessions) >= self.max_sessions:
+            self.refused += 1
+            await websocket.close(1013, "Too many sessions")
+            return
+        self._next_id += 1
+        session = Session(self, websocket, self._next_id)
+        self.sessions[session.id] = session
+        self.log(f"Session {session.id} connected ({len(self.sessions)} active).")
+        try:
+            await session.run()
+        except Exception:
+            self.log(f"Session {session.id} failed:\n{traceback.format_exc()}")
+        finally:
+            del self.sessions[session.id]
+            self.finished += 1
+            self.log(f"Session {session.id} closed ({len(self.sessions)} active).")
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        # Audio does not deflate well, so per-message compression would only cost CPU
+        self._server = await websockets.serve(self.handle, self.host, self.port, compression=None, max_size=None,
+                                              reuse_port=self.reuse_port or None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.log(f"Serving Garvis on ws://{self.host}:{self.port} (pid {os.getpid()})")
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self.transcription_pool.shutdown(wait=False)
+        if self.offload:
+            self.offload.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    def stats(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "sessions": len(self.sessions),
+            "finished": self.finished,
+            "refused": self.refused,
+            "turns": self.turns,
+            "cpu_seconds": usage.ru_utime + usage.ru_stime,
+            "max_rss_mb": usage.ru_maxrss / 1024,
+            **({f"offload_{key}": value for key, value in self.offload.stats().items()} if self.offload else {}),
+            "time": time.time(),
+            **{f"{stage}_{key}": value for stage, histogram in self.histograms.items() if histogram.count
+               for key, value in histogram.summary().items() if key != "count"},
+        }
+
+
+def log_line(message):
+    # One write per line, so the lines of processes sharing stdout do not interleave
+    sys.stdout.write(f"{message}\n")
+    sys.stdout.flush()
+
+
+def serve(args, reuse_port=False):
+    llm = LLMS[args.llm](**({"model": args.model} if args.model else {}))
+    if args.llm_base_url:
+        llm.client.base_url = args.llm_base_url
+    server = GarvisServer(llm, host=args.host, port=args.port, transcriptor=args.transcriptor, tts_uri=args.tts_uri,
+                          max_sessions=args.max_sessions, transcription_workers=args.transcription_workers,
+                          offload_processes=args.audio_offload, reuse_port=reuse_port, verbose=args.verbose, log=log_line)
+    # SIGTERM stops the server like Ctrl-C, so it closes its offload pool on the way out
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Garvis conversations over websockets.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--processes", type=int, default=SERVER_PROCESSES, help="server processes sharing the port")
+    parser.add_argument("--max-sessions", type=int, default=SERVER_MAX_SESSIONS, help="per process")
+    parser.add_argument("--transcription-workers", type=int, default=SERVER_TRANSCRIPTION_WORKERS, help="per process")
+    parser.add_argument("--audio-offload", type=int, default=SERVER_AUDIO_OFFLOAD,
+                        help="processes for frame analysis and chunk encoding, per server process (0: none)")
+    parser.add_argument("--transcriptor", default=DEFAULT_TRANSCRIPTOR)
+    parser.add_argument("--llm", choices=sorted(LLMS), default="openai")
+    parser.add_argument("--model", help="model name for --llm (default: its own)")
+    parser.add_argument("--llm-base-url", help="OpenAI-compatible endpoint for --llm")
+    parser.add_argument("--tts-uri", help="TTS stream-input websocket (default: ElevenLabs)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        serve(args)
+        return
+    # Supervisor: the workers bind the same port. They are not daemonic, so each may have an offload
+    # pool of its own; a SIGTERM to the supervisor is passed on to them.
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=serve, args=(args, True), name=f"garvis-server-{i}")
+               for i in range(args.processes)]
+
+    def terminate(*_):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, terminate)
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import asyncio
+import traceback
+
+from .config import *
+from .llm import make_chunk, close_stream
+
+
+class SpeculativeResponder:
+    """
+    Starts the LLM on the provisional transcript before end-of-turn is confirmed.
+
+    `schedule(text)` (callable from any thread) restarts the speculation for the
+    transcript so far; after `delay` seconds without new speech the request is sent
+    and its tokens are buffered, not spoken. When the turn ends, `take(text)` returns
+    a stream over the buffered and still-arriving tokens if the speculation was for
+    the same text, otherwise it cancels it and the caller falls back to a normal
+    request. Tokens generated by cancelled or mismatched speculations are counted
+    as wasted. Once committed, the request runs until the stream is fully replayed;
+    closing the stream or `abandon()` (on an interrupt) cancels it, and tokens it
+    had buffered but not replayed are counted as wasted as well.
+    """
+    def __init__(self, garvis, delay=SPECULATION_DELAY):
+        self.garvis = garvis
+        self.delay = delay
+        self.loop = None
+        self._task = None
+        self._text = None
+        self._tokens = []
+        self._requested = False
+        self._updated = None
+        self._committed = None
+
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.committed_tokens = 0
+        self.wasted_tokens = 0
+
+    def schedule(self, text):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._restart, text)
+
+    def _restart(self, text):
+        if self._task and self._text == text:
+            return
+        self.cancel()
+        self._text = text
+        self._tokens = []
+        self._requested = False
+        self._updated = asyncio.Event()
+        self._task = self.loop.create_task(self._run(text, self.garvis.build_messages(text)))
+
+    async def _run(self, text, messages):
+        await asyncio.sleep(self.delay)
+        self._requested = True
+        self.attempts += 1
+        self.garvis.log(f"Speculating on: {text}")
+        stream = await self.garvis.llm.acompletion(messages=messages)
+        try:
+            async for chunk in stream:
+                response_text = chunk.choices[0].delta.content
+                if response_text:
+                    self._tokens.append(response_text)
+                    self._updated.set()
+        finally:
+            self._updated.set()
+            await close_stream(stream)
+
+    def cancel(self):
+        if self._task is None:
+            return
+        if self._requested:
+            self.misses += 1
+            self.wasted_tokens += len(self._tokens)
+        self._task.cancel()
+        self._task = None
+        self._text = None
+
+    def take(self, text):
+        # Must be called on self.loop. Returns a stream for a hit, or None.
+        task = self._task
+        if task is None:
+            return None
+        if self._text != text or not self._requested or (task.done() and (task.cancelled() or task.exception())):
+            if task.done() and not task.cancelled() and task.exception():
+                self.garvis.log("Speculative request failed:\n" + "".join(traceback.format_exception(task.exception())))
+            self.cancel()
+            return None
+
+        self.hits += 1
+        self._task = None
+        self._text = None
+        self.abandon()
+        self._committed = {"task": task, "tokens": self._tokens, "sent": 0, "settled": False}
+        return self._replay(self._committed, self._updated)
+
+    def abandon(self):
+        # Must be called on self.loop. Stops the committed request, e.g. when its reply is interrupted.
+        if self._committed is not None:
+            self._settle(self._committed)
+
+    def _settle(self, committed):
+        if committed["settled"]:
+            return
+        committed["settled"] = True
+        if not committed["task"].done():
+            committed["task"].cancel()
+        self.committed_tokens += committed["sent"]
+        self.wasted_tokens += len(committed["tokens"]) - committed["sent"]
+        if self._committed is committed:
+            self._committed = None
+
+    async def _replay(self, committed, updated):
+        task, tokens = committed["task"], committed["tokens"]
+        try:
+            while not committed["settled"]:
+                while committed["sent"] < len(tokens):
+                    committed["sent"] += 1
+                    yield make_chunk(tokens[committed["sent"] - 1])
+                if task.done():
+                    break
+                updated.clear()
+                if committed["sent"] < len(tokens):
+                    continue
+                await updated.wait()
+        finally:
+            self._settle(committed)
+
+    def stats(self):
+        decided = self.hits + self.misses
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "committed_tokens": self.committed_tokens,
+            "wasted_tokens": self.wasted_tokens,
+        }
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import threading
+
+from .config import *
+from .metrics import Histogram
+
+# In pipeline order. The first three repeat per chunk; a turn keeps their last occurrence, every other stage its first.
+STAGES = ("speech_end", "chunk_dispatch", "transcript", "transcription_stop", "llm_request", "first_token",
+          "tts_first_send", "tts_first_audio", "first_sample")
+LAST_WINS = {"speech_end", "chunk_dispatch", "transcript"}
+
+
+class Tracer:
+    """
+    Timestamps the stages of each turn, from the user's last voiced frame to the
+    first sample played back, wherever they happen (listening loop, transcription
+    threads, response worker, audio callback).
+
+    `begin_turn()` opens a turn and returns its ID; `mark(stage, turn_id=...)` is a
+    clock read and a dict write, cheap enough to stay on; `end_turn(turn_id)`
+    closes the turn, adds each stage's offset from `speech_end` to its histogram,
+    with `path` appends the turn to that file as a JSON line, and passes the record
+    to `on_turn`. Turns overlap: the reply to one may still be running when the
+    user starts the next, so marks name their turn (the latest one by default),
+    and a mark for a turn already closed is dropped. `begin_turn()` leaves the
+    previous turn to its reply and ends any older one still open.
+    """
+    def __init__(self, path=TRACE_PATH, enabled=TRACE_ENABLED, log=None):
+        self.path = os.path.expanduser(path) if path else None
+        self.enabled = enabled
+        self.log = log or (lambda message: None)
+        self.on_turn = None  # called with the record of every turn ended
+        self.turn_id = 0
+        self._turns = {}  # turn ID -> (started at, marks) of the open turns
+        self._lock = threading.Lock()
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def begin_turn(self):
+        with self._lock:
+            abandoned = [turn_id for turn_id in self._turns if turn_id < self.turn_id]
+        for turn_id in abandoned:
+            self.end_turn(turn_id)
+        with self._lock:
+            self.turn_id += 1
+            if self.enabled:
+                self._turns[self.turn_id] = (time.time(), {})
+            return self.turn_id
+
+    def mark(self, stage, at=None, turn_id=None):
+        turn = self._turns.get(self.turn_id if turn_id is None else turn_id)
+        if turn is None:
+            return
+        marks = turn[1]
+        if stage in marks and stage not in LAST_WINS:
+            return
+        marks[stage] = time.perf_counter() if at is None else at
+
+    def discard_turn(self, turn_id=None):
+        # Drops a turn (by default the latest) without recording it, e.g. when nothing was said
+        with self._lock:
+            self._turns.pop(self.turn_id if turn_id is None else turn_id, None)
+
+    def end_turn(self, turn_id=None):
+        # Without an ID, closes the latest turn if still open
+        with self._lock:
+            turn_id = self.turn_id if turn_id is None else turn_id
+            started_at, marks = self._turns.pop(turn_id, (None, None))
+            if not marks:
+                return None
+            origin = marks.get("speech_end", min(marks.values()))
+            offsets = {stage: marks[stage] - origin for stage in STAGES if stage in marks}
+            for stage, offset in offsets.items():
+                if stage != "speech_end":
+                    self.histograms[stage].add(offset)
+            record = {"turn": turn_id, "time": started_at,
+                      "stages_ms": {stage: round(1000 * offset, 1) for stage, offset in offsets.items()}}
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        self.log(f"Turn {record['turn']}: " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in record["stages_ms"].items()))
+        if self.on_turn:
+            self.on_turn(record)
+        return record
+
+    def stats(self):
+        # p50/p95/p99 of every stage, measured from the end of speech
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items() if histogram.count}
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import traceback
+
+from collections import deque
+from .config import *
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+CLIENTS_LOCK = threading.Lock()  # module-wide, as `clients` dicts may be shared by executors
+
+
+class TranscriptionExecutor:
+    """
+    Persistent, size-limited pool of transcription workers.
+
+    Jobs are numbered in submission order and their results are delivered strictly
+    in that order, whatever order the backends answer in. At most `max_pending`
+    jobs wait for a worker; when the queue is full `overflow_policy` decides whether
+    `submit` waits ("block"), the oldest waiting chunk is dropped ("drop_oldest") or
+    the new chunk is dropped ("drop_newest"). Dropped and failed jobs still advance
+    the delivery order, so one lost chunk never holds back the ones after it.
+
+    Backend clients are created once per executor through `client()` and shared
+    by all workers, so their connection pools are reused across chunks.
+
+    Many executors, e.g. one per server session, can share a `pool`
+    (a concurrent.futures.ThreadPoolExecutor that runs the jobs instead of the
+    executor's own threads) and a `clients` dict. Each still delivers its own
+    results in its own order and applies its own queue limit.
+    """
+    def __init__(self, max_workers=TRANSCRIPTION_WORKERS, max_pending=TRANSCRIPTION_QUEUE_SIZE,
+                 overflow_policy=TRANSCRIPTION_OVERFLOW_POLICY, log=None, pool=None, clients=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy!r}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.overflow_policy = overflow_policy
+        self.log = log or (lambda message: None)
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._slots = threading.Semaphore(max_pending)
+        self._workers = []
+        self._pool = pool
+        self._closed = False
+
+        self._seq_lock = threading.Lock()
+        self._next_seq = 0
+        self._delivery_lock = threading.Lock()
+        self._next_delivery = 0
+        self._ready = {}
+
+        self._clients = {} if clients is None else clients
+
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def client(self, name, factory):
+        with CLIENTS_LOCK:
+            if name not in self._clients:
+                self._clients[name] = factory()
+            return self._clients[name]
+
+    async def submit(self, fn, on_result=None):
+        """
+        Queues `fn()` for a worker. `on_result(result)` is called with its return
+        value (or None if the job was dropped or raised) in submission order.
+        """
+        self._ensure_workers()
+        with self._seq_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self.submitted += 1
+        job = (seq, fn, on_result)
+
+        if self.overflow_policy == "block":
+            if not self._slots.acquire(blocking=False):
+                acquiring = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+                try:
+                    await asyncio.shield(acquiring)
+                except asyncio.CancelledError:
+                    # The thread still takes the slot: give it back once it has, and let
+                    # the job's number pass so later results are not held back
+                    acquiring.add_done_callback(lambda _: self._slots.release())
+                    self.dropped += 1
+                    self.log(f"Transcription job {seq} cancelled while waiting for a queue slot.")
+                    self._complete(job, None)
+                    raise
+            self._enqueue(job)
+            return True
+
+        dropped = None
+        with self._condition:
+            if len(self._queue) >= self.max_pending:
+                if self.overflow_policy == "drop_oldest":
+                    dropped = self._queue.popleft()
+                else:
+                    dropped = job
+            if dropped is not job:
+                self._push(job)
+
+        if dropped is not None:
+            self.dropped += 1
+            self.log(f"Transcription queue full. Dropped chunk job {dropped[0]} ({self.overflow_policy}).")
+            self._complete(dropped, None)
+        return dropped is not job
+
+    def _enqueue(self, job):
+        with self._condition:
+            self._push(job)
+
+    def _push(self, job):
+        # Caller holds self._condition
+        self._queue.append(job)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        if self._pool is not None:
+            # One pool task per queued job; a task whose job was dropped meanwhile finds the queue empty
+            self._pool.submit(self._run_next)
+            return
+        self._condition.notify()
+
+    def _ensure_workers(self):
+        if self._workers or self._pool is not None:
+            return
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"garvis-transcriber-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._queue:
+                    return
+                job = self._queue.popleft()
+            self._run(job)
+
+    def _run_next(self):
+        with self._condition:
+            if not self._queue:
+                return
+            job = self._queue.popleft()
+        self._run(job)
+
+    def _run(self, job):
+        if self.overflow_policy == "block":
+            self._slots.release()
+
+        result = None
+        try:
+            result = job[1]()
+        except Exception:
+            self.failed += 1
+            self.log(f"Transcription job {job[0]} failed:\n{traceback.format_exc()}")
+        self._complete(job, result)
+
+    def _complete(self, job, result):
+        # Deliver every consecutive result that is ready, in submission order.
+        with self._delivery_lock:
+            self._ready[job[0]] = (job, result)
+            while self._next_delivery in self._ready:
+                (seq, _, on_result), result = self._ready.pop(self._next_delivery)
+                self._next_delivery += 1
+                self.delivered += 1
+                if on_result:
+                    try:
+                        on_result(result)
+                    except Exception:
+                        self.log(f"Transcription result handler for job {seq} failed:\n{traceback.format_exc()}")
+
+    def stats(self):
+        with self._condition:
+            queued = len(self._queue)
+        return {
+            "submitted": self.submitted,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queued": queued,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
@@ -0,0 +1,188 @@
+import json
+import time
+import asyncio
+import threading
+import traceback
+import websockets
+
+from .config import *
+
+
+def is_open(websocket):
+    state = getattr(websocket, "state", None)
+    return getattr(state, "name", None) == "OPEN"
+
+
+class TTSConnection:
+    """
+    One ElevenLabs stream-input socket, already past the BOS / voice settings message.
+    Sends and receives run on the manager's loop, so a turn may use it from any loop.
+    """
+    def __init__(self, manager, websocket, warm):
+        self.manager = manager
+        self.websocket = websocket
+        self.warm = warm
+
+    async def send(self, payload):
+        await self.manager.run(self.websocket.send(json.dumps(payload)))
+
+    async def recv(self):
+        return await self.manager.run(self.websocket.recv())
+
+    async def close(self):
+        await self.manager.run(self.websocket.close())
+
+
+class TTSConnectionManager:
+    """
+    Keeps a warm, pre-initialized TTS websocket ready for the next turn.
+
+    `prewarm()` starts opening a socket in the background (call it as soon as a
+    turn is known to be coming, e.g. when the LLM request goes out). While idle,
+    the warm socket gets a keepalive " " every `keepalive_interval` seconds and is
+    replaced automatically when the server closes it. `acquire()` hands the warm
+    socket over, or opens one on the spot if none is ready, and immediately starts
+    warming the next one.
+
+    All sockets live on one I/O loop (a private background loop unless `loop` is
+    given), because websockets are bound to the loop that opened them.
+    """
+    def __init__(self, uri=None, api_key=None, voice_settings=None,
+                 keepalive_interval=TTS_KEEPALIVE_INTERVAL, prewarm=True, loop=None, log=None):
+        self.uri = uri or WEBSOCKET_URI
+        self.api_key = api_key or ELEVENLABS_API_KEY
+        self.voice_settings = voice_settings or {"stability": 0.5, "similarity_boost": 0.8}
+        self.keepalive_interval = keepalive_interval
+        self.keep_warm = prewarm
+        self.loop = loop
+        self.log = log or (lambda message: None)
+        self._warm = None
+        self._ready = None
+        self._ready_changed = None
+        self._loop_lock = threading.Lock()
+
+        self.cold_opens = 0
+        self.warm_hits = 0
+        self.replaced = 0
+        self.keepalives = 0
+        self.handshake_seconds = []
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="garvis-tts-io", daemon=True).start()
+        return self.loop
+
+    async def run(self, coro):
+        # Runs `coro` on the manager's loop and awaits it from whatever loop we are on.
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _open(self):
+        start = time.perf_counter()
+        websocket = await websockets.connect(self.uri)
+        await websocket.send(json.dumps({
+            "text": " ",
+            "voice_settings": self.voice_settings,
+            "xi_api_key": self.api_key,
+        }))
+        self.handshake_seconds.append(time.perf_counter() - start)
+        return websocket
+
+    def prewarm(self):
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._start_warming)
+
+    def _start_warming(self):
+        if self._warm is None:
+            self._ready_changed = self._ready_changed or asyncio.Event()
+            self._warm = self.loop.create_task(self._keep_warm())
+
+    async def _keep_warm(self):
+        # Owns the idle socket until acquire() takes it: keepalive, and replace on close.
+        websocket = None
+        closed = None  # one wait_closed() task per socket, waited on across keepalives
+        try:
+            while True:
+                if websocket is None or not is_open(websocket):
+                    if websocket is not None:
+                        self.replaced += 1
+                        self.log("Warm TTS socket was closed by the server. Replacing it.")
+                    websocket = await self._open()
+                    closed = asyncio.ensure_future(websocket.wait_closed())
+                    self._ready = websocket
+                    self._ready_changed.set()
+                done, _ = await asyncio.wait({closed}, timeout=self.keepalive_interval)
+                if not done:
+                    try:
+                        await websocket.send(json.dumps({"text": " "}))
+                        self.keepalives += 1
+                    except websockets.exceptions.ConnectionClosed:
+                        pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.log(f"Failed to warm a TTS socket:\n{traceback.format_exc()}")
+            if websocket is not None and is_open(websocket):
+                await websocket.close()
+            self._ready = None
+        finally:
+            if closed is not None:
+                closed.cancel()
+
+    async def _acquire(self):
+        task, self._warm = self._warm, None
+        if task is not None:
+            # If the warm socket is still connecting, wait for that handshake rather than start another
+            while self._ready is None and not task.done():
+                self._ready_changed.clear()
+                waiter = asyncio.ensure_future(self._ready_changed.wait())
+                await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+            task.cancel()
+        websocket, self._ready = self._ready, None
+
+        if websocket is not None and is_open(websocket):
+            self.warm_hits += 1
+            warm = True
+        else:
+            websocket = await self._open()
+            self.cold_opens += 1
+            warm = False
+
+        if self.keep_warm:
+            self._start_warming()
+        return websocket, warm
+
+    async def acquire(self):
+        websocket, warm = await self.run(self._acquire())
+        return TTSConnection(self, websocket, warm)
+
+    async def _close(self):
+        task, self._warm = self._warm, None
+        if task is not None:
+            task.cancel()
+        websocket, self._ready = self._ready, None
+        if websocket is not None and is_open(websocket):
+            await websocket.close()
+
+    async def close(self):
+        if self.loop is not None:
+            await self.run(self._close())
+
+    def stats(self):
+        handshakes = self.handshake_seconds
+        return {
+            "cold_opens": self.cold_opens,
+            "warm_hits": self.warm_hits,
+            "replaced": self.replaced,
+            "keepalives": self.keepalives,
+            "avg_handshake_ms": 1000 * sum(handshakes) / len(handshakes) if handshakes else 0.0,
+        }
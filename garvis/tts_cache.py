@@ -0,0 +1,198 @@
+import os
+import mmap
+import asyncio
+import hashlib
+import threading
+
+from collections import OrderedDict, deque
+from .config import *
+
+
+def normalize_text(text):
+    # Case and spacing do not change what gets spoken; punctuation does (prosody), so it stays.
+    return " ".join(text.lower().split())
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized speech.
+
+    Entries are keyed by the normalized text plus voice, model and output format,
+    stored one file per entry and read back through `mmap`, so a hit plays straight
+    from the page cache. The directory is kept under `max_bytes` by evicting the
+    least recently used entries; recency survives restarts through file mtimes.
+    """
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES,
+                 voice_id=VOICE_ID, model_id=MODEL_ID, output_format=TTS_OUTPUT_FORMAT):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pcm"):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.size += size
+
+    def key(self, text):
+        material = "\0".join((self.voice_id, self.model_id, self.output_format, normalize_text(text)))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pcm")
+
+    def get(self, text):
+        """
+        Returns a read-only mmap of the cached audio (close it when done), or None.
+        """
+        key = self.key(text)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.size -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += len(audio)
+        return audio
+
+    def put(self, text, audio):
+        if not audio:
+            return
+        key = self.key(text)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.size -= self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self.size += len(audio)
+            self.bytes_stored += len(audio)
+            evicted = []
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self.size -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+                "entries": len(self._entries),
+                "size": self.size,
+                "evictions": self.evictions,
+            }
+
+
+def spoken_length(text):
+    return sum(1 for char in text if not char.isspace())
+
+
+class PendingSentence:
+    """
+    Audio of one sentence sent to the TTS socket, filled in as it arrives.
+    `chunks` yields the audio for playback and ends with None once the sentence is complete.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.expected = spoken_length(text)
+        self.received = 0
+        self.cacheable = True
+        self.audio = bytearray()
+        self.chunks = asyncio.Queue()
+        self.done = False
+
+    def feed(self, audio):
+        self.audio += audio
+        self.chunks.put_nowait(audio)
+
+    def finish(self):
+        self.done = True
+        self.chunks.put_nowait(None)
+
+
+class SentenceAligner:
+    """
+    Maps audio messages from the TTS socket back to the sentences that were sent, in
+    order, by counting the characters in each message's alignment. A message that
+    straddles two sentences cannot be split cleanly, so neither of them is cached;
+    neither is anything left unfinished when the socket closes.
+    """
+    def __init__(self, on_sentence=None):
+        self.pending = deque()
+        self.on_sentence = on_sentence or (lambda sentence: None)
+
+    def add(self, text):
+        sentence = PendingSentence(text)
+        self.pending.append(sentence)
+        return sentence
+
+    def feed(self, audio, alignment=None):
+        if not self.pending:
+            return
+        current = self.pending[0]
+        current.feed(audio)
+        if not alignment:
+            return
+        current.received += spoken_length("".join(alignment.get("chars", [])))
+        while self.pending and self.pending[0].received >= self.pending[0].expected:
+            finished = self.pending.popleft()
+            overflow = finished.received - finished.expected
+            if overflow and self.pending:
+                finished.cacheable = False
+                self.pending[0].cacheable = False
+                self.pending[0].received += overflow
+            self._finish(finished)
+
+    def close(self):
+        while self.pending:
+            sentence = self.pending.popleft()
+            sentence.cacheable = False
+            self._finish(sentence)
+
+    def _finish(self, sentence):
+        sentence.finish()
+        if sentence.cacheable:
+            self.on_sentence(sentence)
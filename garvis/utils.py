@@ -1,7 +1,8 @@
-import subprocess
-import importlib.util
+import importlib
 import inspect
 import os
+import json
+import re
 from pathlib import Path
 import requests
 from requests_toolbelt.multipart.encoder import MultipartEncoder
@@ -12,22 +13,25 @@ import asyncio
 import sys
 import tty
 import termios
-import shutil 
 import sys
 import threading
 from dotenv import load_dotenv
+from .config import TTS_CHUNKING_POLICY
+from .chunking import chunk_text, create_chunking_policy
 load_dotenv()
 
 lock = threading.Lock()
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+def load_package_module(file_path):
+    # As a module of this package, so its relative imports resolve
+    return importlib.import_module(f".{Path(file_path).stem}", __package__)
+
 def get_listening_strategies(file_path='listening_strategy.py'):
     strategies = []
 
     # Load the module
-    spec = importlib.util.spec_from_file_location("listening_strategy", Path(__location__, file_path))
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    module = load_package_module(file_path)
 
     # Iterate through the members of the module
     for name, obj in inspect.getmembers(module, inspect.isclass):
@@ -38,9 +42,7 @@ def get_listening_strategies(file_path='listening_strategy.py'):
 
 def create_instance(class_name, file_path='listening_strategy.py'):
     # Load the module
-    spec = importlib.util.spec_from_file_location("listening_strategy", Path(__location__, file_path))
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    module = load_package_module(file_path)
 
     # Get the class from the module
     cls = getattr(module, class_name)
@@ -112,24 +114,26 @@ def get_keypress_sync():
     finally:
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
-def call_transcribe_stream(audio_bytes: BytesIO, initial_prompt: str = ""):
+def call_transcribe_stream(audio_bytes: BytesIO, initial_prompt: str = "", session: requests.Session = None,
+                           filename: str = "audio.wav", mime_type: str = "audio/wav"):
     url = os.environ.get("COLAB_URL", None)
     if not url:
         raise ValueError("COLAB_URL environment variable is not set.")
     url = url + "transcribe_stream"
     m = MultipartEncoder(
         fields={
-            'audio': ('audio.wav', audio_bytes, 'audio/wav'),
+            'audio': (filename, audio_bytes, mime_type),
             'initial_prompt': initial_prompt
         }
     )
-    response = requests.post(url, data=m, headers={'Content-Type': m.content_type}, stream=True)
+    response = (session or requests).post(url, data=m, headers={'Content-Type': m.content_type}, stream=True)
     
     for line in response.iter_lines():
         if line:
             yield line.decode('utf-8')
 
-def call_transcribe(audio_bytes: BytesIO, initial_prompt: str = ""):
+def call_transcribe(audio_bytes: BytesIO, initial_prompt: str = "", session: requests.Session = None,
+                    filename: str = "audio.wav", mime_type: str = "audio/wav"):
     url = os.environ.get("COLAB_URL", None)
     if not url:
         raise ValueError("COLAB_URL environment variable is not set.")
@@ -137,29 +141,48 @@ def call_transcribe(audio_bytes: BytesIO, initial_prompt: str = ""):
     
     m = MultipartEncoder(
         fields={
-            'audio': ('audio.wav', audio_bytes, 'audio/wav'),
+            'audio': (filename, audio_bytes, mime_type),
             'initial_prompt': initial_prompt
         }
     )
-    response = requests.post(url, data=m, headers={'Content-Type': m.content_type})
+    response = (session or requests).post(url, data=m, headers={'Content-Type': m.content_type})
     
     return response.json()
 
-async def acall_transcribe_stream(audio_bytes: BytesIO, initial_prompt: str = ""):
+def parse_transcribe_stream_line(line: str):
+    # One line of transcribe_stream output: a JSON segment, a JSON list/dict of segments, or plain text.
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return [line.strip()] if line.strip() else []
+    if isinstance(data, dict):
+        data = data.get("segments", [data])
+    if not isinstance(data, list):
+        data = [data]
+    texts = []
+    for segment in data:
+        text = segment.get("text", "") if isinstance(segment, dict) else str(segment)
+        if text.strip():
+            texts.append(text.strip())
+    return texts
+
+async def acall_transcribe_stream(audio_bytes: BytesIO, initial_prompt: str = "",
+                                  filename: str = "audio.wav", mime_type: str = "audio/wav"):
     url = os.environ.get("COLAB_URL", None)
     if not url:
         raise ValueError("COLAB_URL environment variable is not set.")
     url = url + "transcribe_stream"
     async with aiohttp.ClientSession() as session:
         async with session.post(url, data={
-            'audio': ('audio.wav', audio_bytes, 'audio/wav'),
+            'audio': (filename, audio_bytes, mime_type),
             'initial_prompt': initial_prompt
         }) as response:
             async for line in response.content:
                 if line:
                     yield line.decode('utf-8')
 
-async def acall_transcribe(audio_bytes: BytesIO, initial_prompt: str = ""):
+async def acall_transcribe(audio_bytes: BytesIO, initial_prompt: str = "",
+                          filename: str = "audio.wav", mime_type: str = "audio/wav"):
     url = os.environ.get("COLAB_URL", None)
     if not url:
         raise ValueError("COLAB_URL environment variable is not set.")
@@ -167,8 +190,8 @@ async def acall_transcribe(audio_bytes: BytesIO, initial_prompt: str = ""):
     async with aiohttp.ClientSession() as session:
         with MultipartWriter('form-data') as mpwriter:
             part = mpwriter.append(audio_bytes)
-            part.set_content_disposition('form-data', name='audio', filename='audio.wav')
-            part.headers[aiohttp.hdrs.CONTENT_TYPE] = 'audio/wav'
+            part.set_content_disposition('form-data', name='audio', filename=filename)
+            part.headers[aiohttp.hdrs.CONTENT_TYPE] = mime_type
             if initial_prompt:
                 part = mpwriter.append(initial_prompt)
                 part.set_content_disposition('form-data', name='initial_prompt')
@@ -176,37 +199,27 @@ async def acall_transcribe(audio_bytes: BytesIO, initial_prompt: str = ""):
             async with session.post(url, data=mpwriter) as response:
                 return await response.json()
 
-async def websocker_text_iterator(chunks):
-    splitters = (".", ",", "?", "!", ";", ":", "—", "-", "(", ")", "[", "]", " ")
+async def websocker_text_iterator(chunks, policy=None):
+    # Batches LLM tokens into TTS socket messages; see chunking.py for the policies
+    async for text in chunk_text(chunks, create_chunking_policy(policy or TTS_CHUNKING_POLICY)):
+        yield text
+        
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+async def sentence_iterator(chunks):
+    # Regroups streamed text into whole sentences, e.g. for per-sentence caching
     buffer = ""
 
     async for text in chunks:
         if text:
-            if buffer.endswith(splitters):
-                yield buffer + " "
-                buffer = text
-            elif text.startswith(splitters):
-                yield buffer + text[0] + " "
-                buffer = text[1:]
-            else:
-                buffer += text
-
-    if buffer:
-        yield buffer + " "
-        
-def is_installed(lib_name):
-    return shutil.which(lib_name) is not None
-
-def create_mpv_process():
-    if not is_installed("mpv"):
-        raise ValueError(
-            "mpv not found, necessary to stream audio. "
-            "Install instructions: https://mpv.io/installation/"
-        )
-
-    mpv_process = subprocess.Popen(
-        ["mpv", "--no-cache", "--no-terminal", "--", "fd://0"],
-        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
-    )    
-    
-    return mpv_process
\ No newline at end of file
+            buffer += text
+            while True:
+                match = SENTENCE_END.search(buffer)
+                if not match:
+                    break
+                sentence, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+                if sentence:
+                    yield sentence
+
+    if buffer.strip():
+        yield buffer.strip()
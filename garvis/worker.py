@@ -0,0 +1,141 @@
+import time
+import asyncio
+import threading
+import traceback
+import concurrent.futures
+
+
+class ResponseWorker:
+    """
+    Long-lived event loop on its own thread for Garvis' LLM and TTS work.
+
+    Keeping every turn on one loop lets the async HTTP clients and TTS sockets keep
+    their pooled connections, which are bound to the loop that opened them. Jobs
+    run one at a time in submission order; `cancel()` cancels the running job and
+    drops the queued ones, e.g. when the user interrupts or starts a new turn.
+    Anything else that must share those connections can be put on `loop` directly.
+
+    With `loop`, the worker runs on that already running loop instead of a thread
+    of its own, so many sessions (see server.py) can share one loop and its
+    connection pools while each keeps its own job queue.
+    """
+    def __init__(self, name="garvis-worker", log=None, loop=None):
+        self.log = log or (lambda message: None)
+        self.owns_loop = loop is None
+        self.loop = loop or asyncio.new_event_loop()
+        self._queue = None
+        self._consumer = None
+        self._current = None
+        self._ready = threading.Event()
+
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.queue_wait_seconds = []
+
+        self._thread = None
+        if not self.owns_loop:
+            self._queue = asyncio.Queue()
+            self.loop.call_soon_threadsafe(self._start_consumer)
+            return
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _start_consumer(self):
+        self._consumer = self.loop.create_task(self._consume())
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.Queue()
+        self._start_consumer()
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        # As asyncio.run does: close the async generators still open (e.g. streamed responses) while the loop runs
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
+
+    async def _consume(self):
+        while True:
+            job, future, queued_at = await self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.queue_wait_seconds.append(time.perf_counter() - queued_at)
+            self._current = asyncio.ensure_future(job())
+            try:
+                result = await self._current
+                self.completed += 1
+                future.set_result(result)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                future.set_exception(concurrent.futures.CancelledError())
+            except Exception as e:
+                self.failed += 1
+                self.log(f"Worker job failed:\n{traceback.format_exc()}")
+                future.set_exception(e)
+            finally:
+                self._current = None
+
+    def submit(self, job, *args):
+        # Queues `job(*args)`, an async function; callable from any thread, including the worker's.
+        # Returns a concurrent.futures.Future for the job's result.
+        future = concurrent.futures.Future()
+        self.submitted += 1
+        self.loop.call_soon_threadsafe(self._enqueue, lambda: job(*args), future, time.perf_counter())
+        return future
+
+    def _enqueue(self, job, future, queued_at):
+        self._queue.put_nowait((job, future, queued_at))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def cancel(self):
+        # Thread-safe: cancels the running job and anything still queued
+        self.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+            self.cancelled += 1
+        if self._current is not None:
+            self._current.cancel()
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    async def run(self, coro):
+        # Awaits `coro` on the worker loop from any loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._cancel)
+        if not self.owns_loop:
+            # A shared loop keeps running; only this worker's consumer goes
+            self.loop.call_soon_threadsafe(lambda: self._consumer and self._consumer.cancel())
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def stats(self):
+        waits = self.queue_wait_seconds
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_wait_ms": 1000 * sum(waits) / len(waits) if waits else 0.0,
+        }
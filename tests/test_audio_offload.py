@@ -0,0 +1,44 @@
+import asyncio
+import numpy as np
+import webrtcvad
+
+from garvis.config import FRAME_SIZE, SAMPLE_RATE
+from garvis.features import FrameFeatureExtractor, FrameFeatures
+from garvis.encoders import WavEncoder
+from garvis.audio_source import StreamSource
+from garvis.audio_offload import AudioOffload
+
+
+def test_offloaded_analysis_and_encoding_match_in_process():
+    rng = np.random.default_rng(0)
+    # Silence, then noise loud enough to reach the VAD, fed in 20 ms pieces like a network client
+    samples = np.concatenate((np.zeros(10 * FRAME_SIZE), rng.normal(0, 3000, 40 * FRAME_SIZE))).astype(np.int16)
+    pcm = samples.tobytes()
+    local = FrameFeatureExtractor(webrtcvad.Vad(1))
+    offload = AudioOffload(processes=2)
+
+    async def run():
+        source = StreamSource(offload=offload)
+        source.start()
+        piece = SAMPLE_RATE * 20 // 1000 * 2
+        for i in range(0, len(pcm), piece):
+            source.feed(pcm[i:i + piece])
+        source.finish()
+        frames = []
+        while (frame := await source.read_frame()) is not None:
+            frames.append((frame, source.frame_features()))
+        source.close()
+        return frames
+
+    try:
+        frames = asyncio.run(run())
+        assert b"".join(frame for frame, _ in frames) == pcm
+        expected = [FrameFeatures._make(record) for record in local.extract_many(samples).tolist()]
+        assert [features for _, features in frames] == expected
+        assert any(features.voiced for _, features in frames)
+
+        encoded = offload.encoder("wav").encode(samples, SAMPLE_RATE)
+        assert encoded.file.getvalue() == WavEncoder().encode(samples, SAMPLE_RATE).file.getvalue()
+        assert offload.stats()["frames"] == len(frames)
+    finally:
+        offload.close()
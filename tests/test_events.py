@@ -0,0 +1,34 @@
+import threading
+
+from garvis.events import EventBus
+
+
+def test_log_flood_never_drops_control_events():
+    bus = EventBus()
+    release, finished = threading.Event(), threading.Event()
+    received = []
+
+    def handler(event):
+        release.wait()  # a slow UI: everything below queues up behind the first event
+        received.append(event.name)
+        if event.name == "transcription_stop":
+            finished.set()
+
+    subscription = bus.subscribe(handler, maxsize=16, name="callbacks")
+    bus.publish("transcription_start")
+    for turn in range(3):
+        for i in range(100):
+            bus.publish("log", f"line {turn}.{i}")
+        bus.publish("transcription_update", f"turn {turn}")
+    for i in range(100):
+        bus.publish("log", f"line {i}")
+    bus.publish("speech_resumed")
+    bus.publish("transcription_stop")
+
+    release.set()
+    assert finished.wait(5)
+    control = [name for name in received if name != "log"]
+    assert control == ["transcription_start"] + ["transcription_update"] * 3 + ["speech_resumed", "transcription_stop"]
+    assert subscription.stats()["max_depth"] <= 16
+    assert subscription.stats()["dropped"] > 0
+    bus.close()
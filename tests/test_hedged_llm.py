@@ -0,0 +1,52 @@
+import asyncio
+
+from garvis.llm import make_chunk
+from garvis.hedged_llm import HedgedLLM
+
+
+class FakeStream:
+    """Provider-style stream: waits `delay` before each chunk and records close()."""
+    def __init__(self, texts, delay):
+        self.texts = texts
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for text in self.texts:
+            await asyncio.sleep(self.delay)
+            yield make_chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBackend:
+    def __init__(self, texts, delay):
+        self.llm_params = {"stream": True}
+        self.texts = texts
+        self.delay = delay
+        self.streams = []
+
+    async def acompletion(self, messages, **kwargs):
+        stream = FakeStream(self.texts, self.delay)
+        self.streams.append(stream)
+        return stream
+
+
+def test_losing_stream_is_closed_when_cancelled_before_first_token():
+    async def run():
+        # The primary has its response but stalls before the first token; the hedge wins
+        primary = FakeBackend(["slow"], delay=5.0)
+        secondary = FakeBackend(["Paris", "."], delay=0.0)
+        hedged = HedgedLLM(primary, secondary, hedge_delay=0.01)
+
+        stream = await hedged.acompletion([{"role": "user", "content": "Capital of France?"}])
+        texts = [chunk.choices[0].delta.content async for chunk in stream]
+        await asyncio.sleep(0)
+
+        assert texts == ["Paris", "."]
+        assert hedged.stats()["secondary_wins"] == 1
+        assert primary.streams[0].closed
+        assert secondary.streams[0].closed
+
+    asyncio.run(run())
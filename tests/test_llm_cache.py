@@ -0,0 +1,92 @@
+import asyncio
+
+from garvis import llm_cache
+from garvis.llm import make_chunk, replay_stream
+from garvis.llm_cache import CachedLLM
+
+
+class FakeLLM:
+    """Answers every question in a few tokens and counts the requests that reach it."""
+    def __init__(self):
+        self.llm_params = {"model": "fake", "stream": True}
+        self.requests = 0
+
+    def answer(self, messages):
+        self.requests += 1
+        return ["Answer to ", messages[-1]["content"], "."]
+
+    def completion(self, messages, **kwargs):
+        return (make_chunk(text) for text in self.answer(messages))
+
+    async def acompletion(self, messages, **kwargs):
+        return replay_stream(self.answer(messages))
+
+
+def ask(llm, question):
+    return "".join(chunk.choices[0].delta.content for chunk in llm.completion([{"role": "user", "content": question}]))
+
+
+def test_streamed_answer_is_replayed_for_the_same_question():
+    backend = FakeLLM()
+    cached = CachedLLM(backend)
+    assert ask(cached, "What time is it?") == "Answer to What time is it?."
+    assert ask(cached, "what time is it") == "Answer to What time is it?."
+    assert backend.requests == 1
+
+    async def aask(question):
+        stream = await cached.acompletion([{"role": "user", "content": question}])
+        return [chunk.choices[0].delta.content async for chunk in stream]
+
+    assert asyncio.run(aask("Capital of France?")) == ["Answer to ", "Capital of France?", "."]
+    assert asyncio.run(aask("capital of france")) == ["Answer to ", "Capital of France?", "."]
+    assert backend.requests == 2
+    assert cached.stats()["hits"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    backend = FakeLLM()
+    cached = CachedLLM(backend, max_entries=2)
+    ask(cached, "one")
+    ask(cached, "two")
+    ask(cached, "one")  # "two" is now the least recently used
+    ask(cached, "three")
+    assert cached.stats()["evictions"] == 1
+    assert backend.requests == 3
+
+    ask(cached, "one")
+    assert backend.requests == 3
+    ask(cached, "two")
+    assert backend.requests == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    backend = FakeLLM()
+    cached = CachedLLM(backend, ttl=60)
+    ask(cached, "hello")
+    now[0] += 59
+    ask(cached, "hello")
+    assert backend.requests == 1
+
+    now[0] += 2
+    ask(cached, "hello")
+    assert backend.requests == 2
+    assert cached.stats()["expired"] == 1
+
+
+def test_cache_survives_a_restart(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    path = tmp_path / "cache" / "llm.json"
+    backend = FakeLLM()
+    ask(CachedLLM(backend, path=str(path)), "hello")
+    assert path.exists()
+
+    reloaded = CachedLLM(backend, ttl=60, path=str(path))
+    assert ask(reloaded, "hello") == "Answer to hello."
+    assert backend.requests == 1
+
+    now[0] += 61  # stale entries are not loaded
+    assert ask(CachedLLM(backend, ttl=60, path=str(path)), "hello") == "Answer to hello."
+    assert backend.requests == 2
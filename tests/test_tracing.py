@@ -0,0 +1,52 @@
+from garvis.tracing import Tracer
+
+
+def test_overlapping_turns_keep_their_own_marks():
+    tracer = Tracer(path=None)
+    published = []
+    tracer.on_turn = published.append
+
+    first = tracer.begin_turn()
+    tracer.mark("speech_end", 10.0)
+    tracer.mark("transcription_stop", 10.2)
+    tracer.mark("llm_request", 10.3, turn_id=first)
+
+    # The user speaks again while the first reply is still on its way
+    second = tracer.begin_turn()
+    tracer.mark("speech_end", 12.0)
+    tracer.mark("first_token", 12.1, turn_id=first)  # the old reply, late
+    tracer.mark("tts_first_audio", 12.2, turn_id=first)
+
+    record = tracer.end_turn(first)
+    assert record["turn"] == first
+    assert record["stages_ms"] == {"speech_end": 0.0, "transcription_stop": 200.0, "llm_request": 300.0,
+                                   "first_token": 2100.0, "tts_first_audio": 2200.0}
+    tracer.mark("first_sample", 12.3, turn_id=first)  # after its turn ended: dropped
+
+    tracer.mark("transcription_stop", 12.5, turn_id=second)
+    tracer.mark("first_token", 12.8, turn_id=second)
+    tracer.mark("first_sample", 13.0, turn_id=second)
+    record = tracer.end_turn(second)
+    assert record["turn"] == second
+    assert record["stages_ms"] == {"speech_end": 0.0, "transcription_stop": 500.0, "first_token": 800.0,
+                                   "first_sample": 1000.0}
+    assert [record["turn"] for record in published] == [first, second]
+    assert tracer.histograms["first_token"].count == 2
+    assert tracer.histograms["first_sample"].count == 1
+
+
+def test_begin_turn_ends_turns_nobody_closed():
+    tracer = Tracer(path=None)
+    published = []
+    tracer.on_turn = published.append
+
+    first = tracer.begin_turn()
+    tracer.mark("speech_end", 1.0)
+    second = tracer.begin_turn()  # the first turn's reply may still end it
+    tracer.mark("speech_end", 2.0)
+    assert published == []
+
+    tracer.begin_turn()
+    assert [record["turn"] for record in published] == [first]
+    assert tracer.end_turn(first) is None
+    assert tracer.end_turn(second)["turn"] == second
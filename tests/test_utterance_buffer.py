@@ -0,0 +1,32 @@
+import numpy as np
+import webrtcvad
+
+from garvis.config import FRAME_SIZE, SAMPLE_RATE
+from garvis.features import FrameFeatureExtractor
+from garvis.audio_processor_async import UtteranceBuffer
+
+
+def test_detached_chunk_keeps_its_frames_while_capture_goes_on():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(-3000, 3000, FRAME_SIZE, dtype=np.int16).tobytes() for _ in range(6)]
+    extractor = FrameFeatureExtractor(webrtcvad.Vad(1))
+    buffer = UtteranceBuffer()
+    for frame in frames[:3]:
+        buffer.append(frame, extractor.extract(frame))
+
+    chunk = buffer.detach()
+    for frame in frames[3:]:
+        buffer.append(frame)  # the next chunk, without features
+    assert len(buffer) == 3 * FRAME_SIZE
+
+    expected = np.frombuffer(b"".join(frames[:3]), dtype=np.int16)
+    assert np.array_equal(chunk.samples, expected)
+    assert chunk.duration == 3 * FRAME_SIZE / SAMPLE_RATE
+    assert chunk.max_peak == max(extractor.extract(frame).peak for frame in frames[:3])
+    assert len(chunk.features) == 3
+
+    rest = np.frombuffer(b"".join(frames[3:]), dtype=np.int16)
+    assert buffer.max_peak == int(np.abs(rest.astype(np.int32)).max())
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.max_peak == 0
+    assert np.array_equal(chunk.samples, expected)
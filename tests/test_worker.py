@@ -0,0 +1,23 @@
+from garvis.worker import ResponseWorker
+
+
+def test_stop_closes_streams_left_open():
+    closed = []
+
+    async def stream():
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            closed.append(True)
+
+    async def job():
+        chunks = stream()
+        first = await chunks.__anext__()
+        job.chunks = chunks  # still open: the reply was cut short and nobody closed it
+        return first
+
+    worker = ResponseWorker()
+    assert worker.submit(job).result(5) == 0
+    worker.stop()
+    assert closed == [True]